@@ -0,0 +1,17 @@
+"""Benchmarks de desempenho. Execute a partir de ``backend/`` com ``python -m benchmarks.<nome>``."""
+
+import os
+
+
+def setup_django(path):
+    """Configura o Django sobre uma base SQLite descartável e aplica as migrações."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    # com DEBUG o Django guarda cada consulta executada
+    os.environ.setdefault("DEBUG", "False")
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
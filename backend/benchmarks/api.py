@@ -0,0 +1,337 @@
+"""Mede os endpoints da API clínica sobre uma clínica gerada por ``seed_clinic``.
+
+Carrega o conjunto ``--dataset`` (small, medium ou large) numa base SQLite
+temporária e chama, pelo cliente de testes do DRF e como um dos
+profissionais gerados, listagem, detalhe e criação de pacientes,
+avaliações, relatórios e sessões, o painel, o relatório geral e os três
+PDFs. Cada repetição usa um registro diferente, então os PDFs não saem do
+cache. Para cada caso registra p50/p95, consultas SQL e o pico de memória
+alocada (numa requisição extra, com ``tracemalloc``) e grava o JSON em
+``--output``.
+
+Com ``--baseline`` o resultado é comparado a um JSON salvo e o comando
+termina com status 1 se algum caso piorar além de ``--tolerance``;
+``--results`` compara um JSON já gerado, sem rodar os casos.
+
+    python -m benchmarks.api --dataset small --output baseline.json
+    python -m benchmarks.api --dataset small --baseline baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from io import StringIO
+
+from benchmarks import setup_django
+
+DATASETS = {
+    "small": {
+        "professionals": 5,
+        "patients": 200,
+        "evaluations": 600,
+        "sessions": 1000,
+        "reports": 150,
+    },
+    "medium": {
+        "professionals": 20,
+        "patients": 5000,
+        "evaluations": 20000,
+        "sessions": 40000,
+        "reports": 2000,
+    },
+    "large": {
+        "professionals": 50,
+        "patients": 50000,
+        "evaluations": 250000,
+        "sessions": 500000,
+        "reports": 20000,
+    },
+}
+# diferenças menores que estas são ruído, qualquer que seja a proporção
+MIN_DELTA_MS = 2.0
+MIN_DELTA_KIB = 256
+
+
+def build_cases(user, rng):
+    """Lista de (nome, método, função índice -> (url, dados))."""
+    from django.db.models import Q
+    from django.urls import reverse
+
+    from clinical.constants import MCHAT_QUESTIONS
+    from clinical.models import ClinicalReport, EvaluationMChat, Patient, SessionRecord
+    from clinical.seeding import valid_cpfs
+
+    patients = list(Patient.objects.filter(professional=user).values_list("id", flat=True))
+    evaluations = list(
+        EvaluationMChat.objects.filter(Q(professional=user) | Q(patient__professional=user))
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    reports = list(
+        ClinicalReport.objects.filter(
+            Q(evaluation__professional=user) | Q(evaluation__patient__professional=user)
+        )
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    sessions = list(
+        SessionRecord.objects.filter(patient__professional=user)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    existing = set(Patient.objects.values_list("cpf", flat=True))
+    cpfs = [cpf for cpf in valid_cpfs(1000, rng.randrange(10**9)) if cpf not in existing]
+
+    def pick(ids, index):
+        # com menos registros que repetições, os primeiros são reaproveitados
+        return ids[index % len(ids)]
+
+    def patient_payload(index):
+        return {
+            "name": f"Paciente Benchmark {index}",
+            "birth_date": "2023-05-01",
+            "guardian_name": "Responsável",
+            "cpf": cpfs[index],
+        }
+
+    def evaluation_payload(index):
+        return {
+            "patient_id": pick(patients, index),
+            "responses": {
+                question["code"]: rng.choice(("sim", "nao")) for question in MCHAT_QUESTIONS
+            },
+        }
+
+    def report_payload(index):
+        return {
+            "evaluation_id": pick(evaluations, index),
+            "title": "Relatório de benchmark",
+            "content": "Conteúdo do relatório.",
+        }
+
+    def session_payload(index):
+        return {
+            "patient_id": pick(patients, index),
+            "session_date": "2025-06-01",
+            "session_type": "intervencao_clinica",
+            "objectives": "Objetivos da sessão.",
+        }
+
+    cases = []
+    for prefix, basename, ids, payload in (
+        ("patients", "patient", patients, patient_payload),
+        ("evaluations", "evaluation", evaluations, evaluation_payload),
+        ("reports", "report", reports, report_payload),
+        ("sessions", "session", sessions, session_payload),
+    ):
+        cases += [
+            (f"{prefix}.list", "get", lambda index, name=basename: (reverse(f"{name}-list"), None)),
+            (
+                f"{prefix}.detail",
+                "get",
+                lambda index, name=basename, ids=ids: (
+                    reverse(f"{name}-detail", args=[pick(ids, index)]),
+                    None,
+                ),
+            ),
+            (
+                f"{prefix}.create",
+                "post",
+                lambda index, name=basename, payload=payload: (
+                    reverse(f"{name}-list"),
+                    payload(index),
+                ),
+            ),
+        ]
+    cases += [
+        ("dashboard.summary", "get", lambda index: (reverse("dashboard-summary"), None)),
+        (
+            "general_report.json",
+            "get",
+            lambda index: (f"{reverse('general-report')}?patient={pick(patients, index)}", None),
+        ),
+        (
+            "general_report.pdf",
+            "post",
+            lambda index: (reverse("general-report"), {"patient_id": pick(patients, index)}),
+        ),
+        (
+            "evaluations.pdf",
+            "get",
+            lambda index: (reverse("evaluation-export-pdf", args=[pick(evaluations, index)]), None),
+        ),
+        (
+            "reports.pdf",
+            "post",
+            lambda index: (reverse("report-generate-pdf", args=[pick(reports, index)]), {}),
+        ),
+    ]
+    return cases
+
+
+def request(client, method, url, data):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        if method == "get":
+            response = client.get(url)
+        else:
+            response = client.post(url, data, format="json")
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        else:
+            response.content
+        elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method.upper()} {url}: status {response.status_code}")
+    return elapsed, len(queries)
+
+
+def run_case(client, method, build, repeat):
+    # a primeira chamada aquece caches de consultas e fontes e não entra na conta
+    request(client, method, *build(0))
+    times = []
+    queries = 0
+    for index in range(1, repeat + 1):
+        elapsed, count = request(client, method, *build(index))
+        times.append(elapsed * 1000)
+        queries = max(queries, count)
+    tracemalloc.start()
+    request(client, method, *build(repeat + 1))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    percentiles = statistics.quantiles(times, n=100, method="inclusive")
+    return {
+        "p50_ms": round(percentiles[49], 3),
+        "p95_ms": round(percentiles[94], 3),
+        "queries": queries,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.setdefault("PDF_CACHE_DIR", os.path.join(directory, "pdf_cache"))
+        setup_django(os.path.join(directory, "api.sqlite3"))
+        from django.contrib.auth import get_user_model
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test.utils import override_settings
+        from rest_framework.test import APIClient
+
+        sizes = DATASETS[args.dataset]
+        started = time.perf_counter()
+        call_command("seed_clinic", seed=args.seed, stdout=StringIO(), **sizes)
+        print(f"{args.dataset}: base gerada em {time.perf_counter() - started:.1f} s")
+
+        user = get_user_model().objects.filter(username__startswith="seed").order_by("id")[0]
+        client = APIClient()
+        client.force_authenticate(user)
+        results = {}
+        with override_settings(MEDIA_ROOT=os.path.join(directory, "media")):
+            for name, method, build in build_cases(user, random.Random(args.seed)):
+                if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                    continue
+                results[name] = run_case(client, method, build, args.repeat)
+                print(format_result(name, results[name]))
+        return {
+            "dataset": args.dataset,
+            "sizes": sizes,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "results": results,
+        }
+
+
+def format_result(name, result):
+    return (
+        f"{name:>22}: p50 {result['p50_ms']:8.1f} ms, p95 {result['p95_ms']:8.1f} ms, "
+        f"{result['queries']:3d} consultas, pico {result['peak_kib'] / 1024:6.1f} MiB"
+    )
+
+
+def compare(baseline, current, tolerance):
+    """Lista de regressões de ``current`` em relação a ``baseline``."""
+    if baseline["dataset"] != current["dataset"]:
+        raise SystemExit(
+            f"Bases diferentes: {baseline['dataset']} (referência) e {current['dataset']}."
+        )
+    regressions = []
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        for key, floor in (
+            ("p50_ms", MIN_DELTA_MS),
+            ("p95_ms", MIN_DELTA_MS),
+            ("peak_kib", MIN_DELTA_KIB),
+        ):
+            if now[key] > before[key] * (1 + tolerance) and now[key] - before[key] >= floor:
+                regressions.append(f"{name}: {key} {before[key]} -> {now[key]}")
+        # a contagem de consultas é determinística: qualquer aumento conta
+        if now["queries"] > before["queries"]:
+            regressions.append(f"{name}: queries {before['queries']} -> {now['queries']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", choices=sorted(DATASETS), default="small")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--only", nargs="+", help="Prefixos dos casos a rodar (ex.: patients reports.pdf)."
+    )
+    parser.add_argument("--output", help="Arquivo JSON para gravar os resultados.")
+    parser.add_argument("--baseline", help="JSON de referência para a comparação.")
+    parser.add_argument(
+        "--results", help="Compara este JSON com --baseline em vez de rodar os casos."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Piora relativa aceita em p50, p95 e memória (0.2 = 20%%).",
+    )
+    args = parser.parse_args()
+    if args.repeat < 2:
+        parser.error("--repeat deve ser ao menos 2.")
+    if args.results and not args.baseline:
+        parser.error("--results exige --baseline.")
+
+    if args.results:
+        with open(args.results, encoding="utf-8") as handle:
+            current = json.load(handle)
+    else:
+        current = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(current, handle, indent=2, ensure_ascii=False)
+            handle.write("\n")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        regressions = compare(baseline, current, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSÃO {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"Sem regressões além de {args.tolerance:.0%} em relação a {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
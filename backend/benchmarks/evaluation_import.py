@@ -0,0 +1,72 @@
+"""Mede a importação em lote de avaliações a partir de CSV.
+
+Gera um CSV sintético com ``--rows`` linhas (q1..q23) e o importa com
+``EvaluationImporter`` sobre uma base SQLite temporária.
+
+    python -m benchmarks.evaluation_import --rows 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks import setup_django
+
+
+def write_csv(path, rows, patient_ids, seed):
+    from clinical.scoring import QUESTION_CODES
+
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        handle.write(",".join(["patient_id", "observations", *QUESTION_CODES]) + "\n")
+        for index in range(rows):
+            bits = rng.getrandbits(len(QUESTION_CODES))
+            answers = ("sim" if bits >> item & 1 else "nao" for item in range(len(QUESTION_CODES)))
+            handle.write(f"{rng.choice(patient_ids)},Campanha {index % 50},{','.join(answers)}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, "import.sqlite3"))
+        from django.contrib.auth import get_user_model
+
+        from clinical.importers import EvaluationImporter, read_rows
+        from clinical.models import EvaluationMChat, Patient
+
+        user = get_user_model().objects.create_user(username="campanha")
+        patients = Patient.objects.bulk_create(
+            Patient(
+                name=f"Paciente {index}",
+                birth_date="2020-01-01",
+                guardian_name="Responsável",
+                cpf=f"{index:011d}",
+                professional=user,
+            )
+            for index in range(1000)
+        )
+        path = os.path.join(directory, "avaliacoes.csv")
+        write_csv(path, args.rows, [patient.id for patient in patients], args.seed)
+
+        started = time.perf_counter()
+        with open(path, encoding="utf-8-sig", newline="") as stream:
+            report = EvaluationImporter(user=user, batch_size=args.batch_size).run(
+                read_rows(stream, path)
+            )
+        elapsed = time.perf_counter() - started
+        assert EvaluationMChat.objects.count() == report["created"] == args.rows
+        print(
+            f"{report['created']} avaliações em {elapsed:.2f} s "
+            f"({report['created'] / elapsed:,.0f} linhas/s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Mede a exportação em streaming de avaliações.
+
+Popula uma base SQLite temporária com ``--rows`` avaliações e consome
+``GET /api/evaluations/export/`` em CSV e JSONL, informando o tempo até o
+primeiro byte, o tempo total e, com ``--memory``, o pico de memória alocada.
+
+    python -m benchmarks.export_stream --rows 500000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Mede o pico de memória (deixa a extração mais lenta).",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, "export.sqlite3"))
+        from rest_framework.test import APIRequestFactory, force_authenticate
+
+        from benchmarks.item_analytics import populate
+        from clinical.views import EvaluationViewSet
+
+        users = populate(args.rows, args.seed)
+        users[0].is_staff = True
+        view = EvaluationViewSet.as_view({"get": "export"})
+        factory = APIRequestFactory()
+        for output in ("csv", "jsonl"):
+            request = factory.get("/api/evaluations/export/", {"output": output})
+            force_authenticate(request, users[0])
+            if args.memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            response = view(request)
+            chunks = iter(response.streaming_content)
+            size = len(next(chunks))
+            first_byte = time.perf_counter() - started
+            for chunk in chunks:
+                size += len(chunk)
+            elapsed = time.perf_counter() - started
+            summary = (
+                f"{output:>5}: primeiro byte {first_byte * 1000:6.1f} ms, "
+                f"total {elapsed:6.1f} s, {size / 1_048_576:7.1f} MiB"
+            )
+            if args.memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                summary += f", pico {peak / 1_048_576:5.1f} MiB"
+            print(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Mede tempo e memória do relatório geral em PDF.
+
+Cria um paciente com ``--sessions`` sessões (anotações longas) e
+``--evaluations`` avaliações numa base SQLite temporária e chama
+``POST /api/reports/general/`` consumindo a resposta, primeiro sem e depois
+com o PDF em cache. Com ``--memory`` informa também o pico de memória alocada.
+
+    python -m benchmarks.general_report --sessions 2000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from benchmarks import setup_django
+
+
+def populate(sessions, evaluations, seed):
+    from django.contrib.auth import get_user_model
+
+    from benchmarks.pdf_wrap import note
+    from clinical.models import EvaluationMChat, Patient, SessionRecord
+
+    rng = random.Random(seed)
+    user = get_user_model().objects.create_user(username="bench", is_staff=True)
+    patient = Patient.objects.create(
+        name="Paciente de Teste",
+        birth_date="2019-01-01",
+        guardian_name="Responsável",
+        cpf="00000000000",
+        professional=user,
+    )
+    EvaluationMChat.objects.bulk_create(
+        EvaluationMChat(
+            patient=patient,
+            professional=user,
+            responses_bits=rng.getrandbits(23),
+            total_score=rng.randint(0, 20),
+            risk_level=rng.choice(["baixo", "moderado", "alto"]),
+            clinical_interpretation=note(rng, 40),
+        )
+        for _ in range(evaluations)
+    )
+    start = date(2015, 1, 1)
+    SessionRecord.objects.bulk_create(
+        SessionRecord(
+            patient=patient,
+            professional=user,
+            session_date=start + timedelta(days=index),
+            session_type="intervencao_clinica",
+            objectives=note(rng, 80),
+            interventions=note(rng, 160),
+            family_guidance=note(rng, 80),
+            next_steps=note(rng, 40),
+        )
+        for index in range(sessions)
+    )
+    return user, patient
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--evaluations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Mede o pico de memória (deixa a geração bem mais lenta).",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.setdefault("PDF_CACHE_DIR", os.path.join(directory, "pdf_cache"))
+        setup_django(os.path.join(directory, "report.sqlite3"))
+        from rest_framework.test import APIRequestFactory, force_authenticate
+
+        from clinical.views import GeneralReportView
+
+        user, patient = populate(args.sessions, args.evaluations, args.seed)
+        view = GeneralReportView.as_view()
+        factory = APIRequestFactory()
+        for label in ("sem cache", "com cache"):
+            request = factory.post(
+                "/api/reports/general/", {"patient_id": patient.id}, format="json"
+            )
+            force_authenticate(request, user)
+            if args.memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            response = view(request)
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            elapsed = time.perf_counter() - started
+            summary = f"{label:>9}: {elapsed:6.2f} s, PDF {size / 1_048_576:5.1f} MiB"
+            if args.memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                summary += f", pico {peak / 1_048_576:6.1f} MiB"
+            print(summary)
+
+
+if __name__ == "__main__":
+    main()
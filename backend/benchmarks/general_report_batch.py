@@ -0,0 +1,96 @@
+"""Mede o ZIP de relatórios gerais (``POST /api/reports/general/batch/``).
+
+Cria ``--patients`` pacientes com ``--sessions`` sessões cada numa base
+SQLite temporária e gera o ZIP sem pool (serial) e com cada quantidade de
+processos de ``--processes``, sempre com o cache de PDFs vazio.
+
+    python -m benchmarks.general_report_batch --patients 200 --processes 2 4
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks import setup_django
+
+
+def populate(patients, sessions, seed):
+    from django.contrib.auth import get_user_model
+
+    from benchmarks.pdf_wrap import note
+    from clinical.models import Patient, SessionRecord
+
+    rng = random.Random(seed)
+    user = get_user_model().objects.create_user(username="bench", is_staff=True)
+    created = Patient.objects.bulk_create(
+        Patient(
+            name=f"Paciente {index:04d}",
+            birth_date="2019-01-01",
+            guardian_name="Responsável",
+            cpf=f"{index:011d}",
+            professional=user,
+        )
+        for index in range(patients)
+    )
+    start = date(2020, 1, 1)
+    SessionRecord.objects.bulk_create(
+        SessionRecord(
+            patient=patient,
+            professional=user,
+            session_date=start + timedelta(days=index),
+            session_type="intervencao_clinica",
+            objectives=note(rng, 60),
+            interventions=note(rng, 120),
+            family_guidance=note(rng, 60),
+            next_steps=note(rng, 30),
+        )
+        for patient in created
+        for index in range(sessions)
+    )
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--processes", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache_dir = os.path.join(directory, "pdf_cache")
+        os.environ["PDF_CACHE_DIR"] = cache_dir
+        setup_django(os.path.join(directory, "batch.sqlite3"))
+        from django.test import override_settings
+        from rest_framework.test import APIRequestFactory, force_authenticate
+
+        from clinical.views import GeneralReportBatchView
+
+        user = populate(args.patients, args.sessions, args.seed)
+        view = GeneralReportBatchView.as_view()
+        factory = APIRequestFactory()
+        serial = None
+        for processes in [0, *args.processes]:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            request = factory.post("/api/reports/general/batch/", {}, format="json")
+            force_authenticate(request, user)
+            with override_settings(PDF_BATCH_PROCESSES=processes):
+                started = time.perf_counter()
+                response = view(request)
+                size = sum(len(chunk) for chunk in response.streaming_content)
+                elapsed = time.perf_counter() - started
+            serial = serial or elapsed
+            label = "serial" if not processes else f"{processes} processos"
+            print(
+                f"{label:>12}: {elapsed:6.2f} s ({serial / elapsed:4.1f}x), "
+                f"ZIP {size / 1_048_576:5.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Mede o endpoint de prevalência por item sobre uma base sintética.
+
+Cria uma base SQLite temporária com ``--rows`` avaliações, reconstrói o
+consolidado (custo único, depois mantido pelos signals) e mede
+``GET /api/analytics/items/`` com os agrupamentos mais usados.
+
+    python -m benchmarks.item_analytics --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks import setup_django
+
+
+def populate(rows, seed):
+    from django.contrib.auth import get_user_model
+    from django.db import connection, transaction
+
+    from clinical.models import EvaluationMChat, Patient
+    from clinical.scoring import score_bits
+
+    rng = random.Random(seed)
+    User = get_user_model()
+    users = [User.objects.create_user(username=f"prof{index}") for index in range(20)]
+    patients = Patient.objects.bulk_create(
+        Patient(
+            name=f"Paciente {index}",
+            birth_date="2020-01-01",
+            guardian_name="Responsável",
+            cpf=f"{index:011d}",
+            professional=users[index % len(users)],
+        )
+        for index in range(rows // 10 or 1)
+    )
+    start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    table = EvaluationMChat._meta.db_table
+    sql = (
+        f"INSERT INTO {table} (patient_id, professional_id, responses_bits, observations, "
+        "total_score, risk_level, clinical_interpretation, follow_up_recommendations, "
+        "is_follow_up, created_at) VALUES (%s, %s, %s, '', %s, %s, '', '', %s, %s)"
+    )
+
+    def generate():
+        for index in range(rows):
+            bits = rng.getrandbits(23)
+            total, level, _ = score_bits(bits)
+            yield (
+                patients[index % len(patients)].id,
+                users[index % len(users)].id,
+                bits,
+                total,
+                level,
+                index % 4 == 0,
+                start + timedelta(minutes=index),
+            )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, generate())
+    return users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, "analytics.sqlite3"))
+        from rest_framework.test import APIRequestFactory, force_authenticate
+
+        from clinical.rollups import rebuild_rollups
+        from clinical.views import ItemAnalyticsView
+
+        users = populate(args.rows, args.seed)
+        started = time.perf_counter()
+        rebuild_rollups()
+        print(f"reconstrução do consolidado: {time.perf_counter() - started:.1f} s")
+
+        users[0].is_staff = True
+        view = ItemAnalyticsView.as_view()
+        factory = APIRequestFactory()
+        for label, user in (("coordenação", users[0]), ("profissional", users[1])):
+            for group_by in ("", "risk_level", "professional,month"):
+                timings = []
+                for _ in range(args.repeat):
+                    request = factory.get("/api/analytics/items/", {"group_by": group_by})
+                    force_authenticate(request, user)
+                    started = time.perf_counter()
+                    response = view(request)
+                    timings.append(time.perf_counter() - started)
+                print(
+                    f"{label:>12} {group_by or '-':>20}: "
+                    f"{len(response.data['groups']):5d} grupos  "
+                    f"melhor {min(timings) * 1000:8.1f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Mede linhas por segundo das listagens com o serializer e com ``.values()``.
+
+Cria ``--rows`` pacientes, avaliações, relatórios e sessões numa base SQLite
+temporária e chama a listagem de cada endpoint (uma página de ``--rows``
+itens, JSON renderizado) pelo serializer do DRF e por ``clinical.rows``, num
+único processo, como um worker do gunicorn.
+
+    python -m benchmarks.list_rows --rows 500
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from unittest import mock
+
+from benchmarks import setup_django
+
+CASES = [
+    ("pacientes", "PatientViewSet", {}),
+    ("avaliacoes", "EvaluationViewSet", {}),
+    ("avaliacoes", "EvaluationViewSet", {"expand": "*"}),
+    ("relatorios", "ClinicalReportViewSet", {}),
+    ("relatorios", "ClinicalReportViewSet", {"expand": "*"}),
+    ("sessoes", "SessionRecordViewSet", {}),
+    ("sessoes", "SessionRecordViewSet", {"expand": "*"}),
+]
+
+
+def populate(rows, seed):
+    from django.contrib.auth import get_user_model
+
+    from benchmarks.pdf_wrap import note
+    from clinical.models import ClinicalReport, EvaluationMChat, Patient, SessionRecord
+
+    rng = random.Random(seed)
+    user = get_user_model().objects.create_user(username="bench", is_staff=True)
+    patients = Patient.objects.bulk_create(
+        Patient(
+            name=f"Paciente {index:05d}",
+            birth_date="2019-01-01",
+            guardian_name="Responsável",
+            cpf=f"{index:011d}",
+            summary_history=note(rng, 30),
+            professional=user,
+        )
+        for index in range(rows)
+    )
+    evaluations = EvaluationMChat.objects.bulk_create(
+        EvaluationMChat(
+            patient=patient,
+            professional=user,
+            responses_bits=rng.getrandbits(23),
+            total_score=rng.randint(0, 20),
+            risk_level=rng.choice(["baixo", "moderado", "alto"]),
+            clinical_interpretation=note(rng, 30),
+        )
+        for patient in patients
+    )
+    ClinicalReport.objects.bulk_create(
+        ClinicalReport(evaluation=evaluation, title="Relatório", content=note(rng, 60))
+        for evaluation in evaluations
+    )
+    SessionRecord.objects.bulk_create(
+        SessionRecord(
+            patient=patient,
+            professional=user,
+            session_date="2024-03-01",
+            objectives=note(rng, 30),
+            interventions=note(rng, 60),
+        )
+        for patient in patients
+    )
+    return user
+
+
+def timed(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, "rows.sqlite3"))
+        from rest_framework.test import APIRequestFactory, force_authenticate
+
+        from clinical import views
+
+        user = populate(args.rows, args.seed)
+        factory = APIRequestFactory()
+
+        def run(view, params):
+            request = factory.get("/api/", {"page_size": args.rows, **params})
+            force_authenticate(request, user)
+            response = view(request)
+            return response.render().content
+
+        for label, name, params in CASES:
+            view = getattr(views, name).as_view({"get": "list"})
+            with mock.patch.object(views, "compile_rows", return_value=None):
+                slow, content = timed(lambda: run(view, params), args.repeat)
+            fast, fast_content = timed(lambda: run(view, params), args.repeat)
+            assert fast_content == content
+            suffix = " (expand=*)" if params else ""
+            print(
+                f"{label + suffix:>23}: serializer {args.rows / slow:8.0f} linhas/s, "
+                f".values() {args.rows / fast:8.0f} linhas/s ({slow / fast:4.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Gerador de carga: usuários virtuais repetindo roteiros de uso da clínica.
+
+Cada usuário virtual é uma thread com a própria conexão HTTP. Ele entra
+pela ``/api/token/`` (``EmailTokenObtainPairView``) com uma das contas de
+``seed_clinic`` e executa roteiros sorteados por peso (painel, lista de
+pacientes, registro de avaliação, download de PDF...). A cada
+``--scripts-per-login`` roteiros, entra de novo. Ao final informa, por
+passo, requisições, vazão, taxa de erro e percentis de latência (com
+``--output``, também em JSON). Usa só a biblioteca padrão e fala com
+qualquer servidor (``runserver``, gunicorn ou o ambiente publicado).
+
+    python manage.py seed_clinic --password carga-123
+    gunicorn core.wsgi:application --workers 4
+    python -m benchmarks.load --users 20 --duration 60 --password carga-123
+"""
+
+import argparse
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+from clinical.constants import MCHAT_QUESTIONS
+
+# roteiro -> (peso, passos)
+SCRIPTS = {
+    "consulta": (5, ("dashboard", "patients", "patient", "evaluations")),
+    "avaliacao": (3, ("patients", "patient", "evaluation_create", "evaluation_pdf")),
+    "sessao": (3, ("patients", "session_create")),
+    "relatorio": (1, ("patients", "general_report_pdf")),
+}
+ANSWERS = ("sim", "nao")
+SESSION_TYPES = ("orientacao_familiar", "intervencao_clinica", "acompanhamento_escolar")
+
+
+class Stats:
+    """Latências e erros por passo, compartilhados entre as threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        self.scripts = Counter()
+
+    def record(self, step, elapsed, error=None):
+        with self.lock:
+            self.latencies[step].append(elapsed)
+            if error:
+                self.errors[step][error] += 1
+
+    def finished(self, script):
+        with self.lock:
+            self.scripts[script] += 1
+
+    def summary(self, duration):
+        steps = {}
+        for step, latencies in sorted(self.latencies.items()):
+            errors = sum(self.errors[step].values())
+            milliseconds = sorted(value * 1000 for value in latencies)
+            if len(milliseconds) > 1:
+                percentiles = statistics.quantiles(milliseconds, n=100, method="inclusive")
+            else:
+                percentiles = milliseconds * 99
+            steps[step] = {
+                "requests": len(latencies),
+                "errors": errors,
+                "error_rate": round(errors / len(latencies), 4),
+                "throughput": round(len(latencies) / duration, 2),
+                "p50_ms": round(percentiles[49], 1),
+                "p95_ms": round(percentiles[94], 1),
+                "p99_ms": round(percentiles[98], 1),
+                "max_ms": round(milliseconds[-1], 1),
+                "error_reasons": dict(self.errors[step]),
+            }
+        total = sum(step["requests"] for step in steps.values())
+        return {
+            "duration": round(duration, 1),
+            "requests": total,
+            "throughput": round(total / duration, 2),
+            "errors": sum(step["errors"] for step in steps.values()),
+            "scripts": dict(self.scripts),
+            "steps": steps,
+        }
+
+
+class VirtualUser:
+    def __init__(self, index, args, stats):
+        parts = urlsplit(args.base_url)
+        connection_class = (
+            http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        )
+        self.connection = connection_class(parts.netloc, timeout=args.timeout)
+        self.prefix = parts.path.rstrip("/")
+        self.email = args.email.format(seed=args.seed, index=index % args.professionals)
+        self.password = args.password
+        self.args = args
+        self.stats = stats
+        self.rng = random.Random(f"{args.seed}-{index}")
+        self.token = None
+        self.patient_ids = []
+        self.patient_id = None
+        self.evaluation_id = None
+
+    def _send(self, method, path, body, headers):
+        for attempt in range(2):
+            try:
+                self.connection.request(method, self.prefix + path, body, headers)
+                response = self.connection.getresponse()
+                return response.status, response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # conexão mantida aberta que o servidor já tinha encerrado
+                self.connection.close()
+                if attempt:
+                    raise
+
+    def call(self, step, method, path, payload=None):
+        """Executa uma requisição do passo; devolve o JSON (ou bytes) ou None se falhar."""
+        headers = {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        body = None
+        if payload is not None:
+            body = json.dumps(payload).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        started = time.perf_counter()
+        try:
+            status, content = self._send(method, path, body, headers)
+        except (OSError, http.client.HTTPException) as exc:
+            self.connection.close()
+            self.stats.record(step, time.perf_counter() - started, type(exc).__name__)
+            return None
+        self.stats.record(
+            step, time.perf_counter() - started, None if status < 400 else f"HTTP {status}"
+        )
+        if status >= 400:
+            return None
+        if content.startswith(b"{") or content.startswith(b"["):
+            return json.loads(content)
+        return content
+
+    def login(self):
+        self.token = None
+        data = self.call(
+            "login", "POST", "/api/token/", {"username": self.email, "password": self.password}
+        )
+        if data:
+            self.token = data["access"]
+        return bool(data)
+
+    def dashboard(self):
+        return self.call("dashboard", "GET", "/api/dashboard/summary/") is not None
+
+    def patients(self):
+        data = self.call("patients", "GET", "/api/patients/")
+        if not data:
+            return False
+        self.patient_ids = [patient["id"] for patient in data["results"]]
+        if not self.patient_ids:
+            return False
+        self.patient_id = self.rng.choice(self.patient_ids)
+        return True
+
+    def patient(self):
+        return self.call("patient", "GET", f"/api/patients/{self.patient_id}/") is not None
+
+    def evaluations(self):
+        path = f"/api/evaluations/?patient={self.patient_id}"
+        return self.call("evaluations", "GET", path) is not None
+
+    def evaluation_create(self):
+        data = self.call(
+            "evaluation_create",
+            "POST",
+            "/api/evaluations/",
+            {
+                "patient_id": self.patient_id,
+                "responses": {
+                    question["code"]: self.rng.choice(ANSWERS) for question in MCHAT_QUESTIONS
+                },
+            },
+        )
+        if data:
+            self.evaluation_id = data["id"]
+        return bool(data)
+
+    def evaluation_pdf(self):
+        path = f"/api/evaluations/{self.evaluation_id}/export_pdf/"
+        return self.call("evaluation_pdf", "GET", path) is not None
+
+    def session_create(self):
+        payload = {
+            "patient_id": self.patient_id,
+            "session_date": time.strftime("%Y-%m-%d"),
+            "session_type": self.rng.choice(SESSION_TYPES),
+            "objectives": "Registro gerado pelo teste de carga.",
+        }
+        return self.call("session_create", "POST", "/api/sessions/", payload) is not None
+
+    def general_report_pdf(self):
+        payload = {"patient_id": self.patient_id}
+        return self.call("general_report_pdf", "POST", "/api/reports/general/", payload) is not None
+
+    def run(self, scripts, stop_at):
+        names = list(scripts)
+        weights = [scripts[name][0] for name in names]
+        done = 0
+        while time.monotonic() < stop_at:
+            if done % self.args.scripts_per_login == 0 and not self.login():
+                # sem token não há roteiro possível; espera um pouco antes de tentar de novo
+                time.sleep(1)
+                continue
+            name = self.rng.choices(names, weights)[0]
+            for step in scripts[name][1]:
+                if time.monotonic() >= stop_at or not getattr(self, step)():
+                    break
+            else:
+                self.stats.finished(name)
+            done += 1
+            if self.args.think_time:
+                time.sleep(self.rng.expovariate(1 / self.args.think_time))
+        self.connection.close()
+
+
+def parse_weights(values):
+    scripts = dict(SCRIPTS)
+    for value in values or ():
+        name, _, weight = value.partition("=")
+        if name not in SCRIPTS or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"Peso inválido: {value}")
+        scripts[name] = (int(weight), SCRIPTS[name][1])
+    return {name: script for name, script in scripts.items() if script[0] > 0}
+
+
+def print_summary(summary):
+    print(
+        f"{summary['requests']} requisições em {summary['duration']} s "
+        f"({summary['throughput']} req/s), {summary['errors']} erro(s); "
+        f"roteiros concluídos: {summary['scripts']}"
+    )
+    print(
+        f"{'passo':>20} {'req':>6} {'req/s':>7} {'erros':>7} "
+        f"{'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8} (ms)"
+    )
+    for step, result in summary["steps"].items():
+        print(
+            f"{step:>20} {result['requests']:6d} {result['throughput']:7.2f} "
+            f"{result['error_rate']:7.1%} {result['p50_ms']:8.1f} {result['p95_ms']:8.1f} "
+            f"{result['p99_ms']:8.1f} {result['max_ms']:8.1f}"
+        )
+        for reason, count in result["error_reasons"].items():
+            print(f"{'':>20} {count} x {reason}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=10, help="Usuários virtuais simultâneos.")
+    parser.add_argument("--duration", type=float, default=60, help="Duração, em segundos.")
+    parser.add_argument(
+        "--ramp-up", type=float, default=5, help="Segundos para iniciar todos os usuários."
+    )
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=0,
+        help="Pausa média, em segundos, entre roteiros (distribuição exponencial).",
+    )
+    parser.add_argument("--scripts-per-login", type=int, default=5)
+    parser.add_argument(
+        "--weight",
+        action="append",
+        metavar="ROTEIRO=PESO",
+        help=f"Altera o peso de um roteiro ({', '.join(SCRIPTS)}); 0 desliga.",
+    )
+    parser.add_argument("--seed", type=int, default=1, help="Semente usada no seed_clinic.")
+    parser.add_argument(
+        "--professionals",
+        type=int,
+        default=20,
+        help="Profissionais gerados pelo seed_clinic (as contas são distribuídas entre eles).",
+    )
+    parser.add_argument("--email", default="seed{seed}_prof{index:04d}@example.com")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="Arquivo JSON para gravar o resumo.")
+    args = parser.parse_args()
+    try:
+        scripts = parse_weights(args.weight)
+    except argparse.ArgumentTypeError as exc:
+        parser.error(str(exc))
+    if not scripts:
+        parser.error("Todos os roteiros estão com peso 0.")
+
+    stats = Stats()
+    started = time.monotonic()
+    stop_at = started + args.ramp_up + args.duration
+    threads = []
+    for index in range(args.users):
+        user = VirtualUser(index, args, stats)
+        thread = threading.Thread(target=user.run, args=(scripts, stop_at), daemon=True)
+        threads.append(thread)
+        thread.start()
+        time.sleep(args.ramp_up / args.users)
+    for thread in threads:
+        thread.join()
+
+    summary = stats.summary(time.monotonic() - started)
+    summary.update(users=args.users, base_url=args.base_url, weights=scripts)
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(summary, handle, indent=2, ensure_ascii=False)
+            handle.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Mede a importação de pacientes com deduplicação por CPF.
+
+Gera um CSV com ``--rows`` pacientes (parte com CPFs repetidos e parte já
+cadastrada) e o importa com ``PatientImporter`` sobre uma base SQLite
+temporária, informando o tempo e o pico de memória do processo.
+
+    python -m benchmarks.patient_import --rows 500000 --mode update
+"""
+
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+
+from benchmarks import setup_django
+
+
+def write_csv(path, rows, seed):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        handle.write("name,birth_date,guardian_name,cpf,contact\n")
+        for index in range(rows):
+            # ~1% de CPFs repetidos, metade com pontuação
+            number = rng.randrange(rows) if rng.random() < 0.01 else index
+            cpf = f"{number:011d}"
+            if index % 2:
+                cpf = f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}"
+            handle.write(f"Paciente {index},2020-01-01,Responsável {index},{cpf},(11) 9999-0000\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--existing", type=int, default=50_000)
+    parser.add_argument("--mode", choices=("skip", "update"), default="skip")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, "patients.sqlite3"))
+        from clinical.importers import PatientImporter, read_rows
+        from clinical.models import Patient
+
+        Patient.objects.bulk_create(
+            (
+                Patient(
+                    name=f"Cadastrado {index}",
+                    birth_date="2019-01-01",
+                    guardian_name="Responsável",
+                    cpf=f"{index * 7:011d}",
+                )
+                for index in range(args.existing)
+            ),
+            batch_size=2000,
+        )
+        path = os.path.join(directory, "pacientes.csv")
+        write_csv(path, args.rows, args.seed)
+
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        with open(path, encoding="utf-8-sig", newline="") as stream:
+            report = PatientImporter(mode=args.mode, batch_size=args.batch_size).run(
+                read_rows(stream, path)
+            )
+        elapsed = time.perf_counter() - started
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(
+            f"{args.rows} linhas em {elapsed:.1f} s ({args.rows / elapsed:,.0f} linhas/s): "
+            f"{report['created']} criados, {report['updated']} atualizados, "
+            f"{report['skipped']} ignorados, {report['error_count']} erros; "
+            f"pico de memória {peak / 1024:.0f} MiB (+{(peak - before) / 1024:.0f} MiB)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Mede a quebra de linhas na geração do relatório geral em PDF.
+
+Monta um paciente fictício com ``--sessions`` sessões de anotações longas e
+compara a quebra de linhas anterior (que mede a linha inteira a cada palavra)
+com ``clinical.pdf.wrap_lines``, isoladamente e no PDF completo.
+
+    python -m benchmarks.pdf_wrap --sessions 500
+"""
+
+import argparse
+import random
+import time
+from unittest import mock
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from clinical import pdf
+
+WORDS = (
+    "paciente apresentou boa interação durante atividades lúdicas com contato visual "
+    "sustentado responde ao nome orientar família rotina estruturada comunicação "
+    "alternativa intervenção mediada pares escola acompanhamento fonoaudiológico"
+).split()
+
+
+def quadratic_wrap(text, width, font, size):
+    """Versão anterior: mede ``test_line`` inteira a cada palavra."""
+    lines = []
+    for paragraph in text.split("\n"):
+        current_line = ""
+        for word in paragraph.split():
+            test_line = f"{current_line} {word}".strip()
+            if stringWidth(test_line, font, size) <= width:
+                current_line = test_line
+            else:
+                if current_line:
+                    lines.append(current_line)
+                current_line = word
+        lines.append(current_line)
+    return lines
+
+
+def note(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def build_context(sessions, words, seed):
+    rng = random.Random(seed)
+    return {
+        "filename": "relatorio-geral.pdf",
+        "patient_name": "Paciente de Teste",
+        "birth_date": "01/01/2019",
+        "guardian_name": "Responsável",
+        "contact": "",
+        "evaluations": [],
+        "sessions": [
+            {
+                "session_date": "10/01/2024",
+                "session_type": "Intervenção clínica",
+                "objectives": note(rng, words),
+                "interventions": note(rng, words * 2),
+                "family_guidance": note(rng, words),
+                "next_steps": note(rng, words // 2),
+            }
+            for _ in range(sessions)
+        ],
+    }
+
+
+def timed(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--words", type=int, default=120, help="Palavras por anotação.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    context = build_context(args.sessions, args.words, args.seed)
+    texts = [value for session in context["sessions"] for value in session.values()]
+    width = pdf.PageLayout.width - 2 * pdf.PageLayout.margin
+
+    for label, wrap in (("anterior", quadratic_wrap), ("atual", pdf.wrap_lines)):
+        pdf.word_width.cache_clear()
+        wrap_time, lines = timed(
+            lambda: [wrap(text, width, "Helvetica", 11) for text in texts], args.repeat
+        )
+        with mock.patch.object(pdf, "wrap_lines", wrap):
+            render_time, content = timed(lambda: pdf.render_general_report(context), args.repeat)
+        print(
+            f"{label:>8}: quebra {wrap_time * 1000:7.1f} ms, PDF {render_time * 1000:7.1f} ms "
+            f"({sum(map(len, lines))} linhas, {len(content) / 1024:.0f} KiB)"
+        )
+    print(f"cache de larguras: {pdf.word_width.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Compara o armazenamento das respostas M-CHAT em JSON e em inteiro de bits.
+
+Cria duas bases SQLite temporárias com o mesmo conjunto de avaliações, uma
+com a coluna ``responses`` em JSON (layout anterior) e outra com
+``responses_bits``, e mede o tamanho da tabela e o tempo de uma varredura
+completa que calcula a taxa de falha por item.
+
+    python -m benchmarks.responses_storage --rows 200000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from clinical.scoring import (
+    NO_RISK_MASK,
+    QUESTION_CODES,
+    decode_responses,
+    encode_responses,
+)
+
+SCHEMA = """
+CREATE TABLE evaluation (
+    id INTEGER PRIMARY KEY,
+    patient_id INTEGER NOT NULL,
+    total_score INTEGER NOT NULL,
+    risk_level VARCHAR(12) NOT NULL,
+    created_at DATETIME NOT NULL,
+    {column}
+)
+"""
+
+
+def generate_rows(count, seed):
+    rng = random.Random(seed)
+    for index in range(count):
+        bits = rng.getrandbits(len(QUESTION_CODES))
+        yield index + 1, rng.randrange(1, 5000), bits
+
+
+def build(path, layout, rows):
+    column = (
+        "responses TEXT NOT NULL"
+        if layout == "json"
+        else "responses_bits INTEGER NOT NULL"
+    )
+    connection = sqlite3.connect(path)
+    connection.execute(SCHEMA.format(column=column))
+    payload = (
+        (
+            row_id,
+            patient_id,
+            0,
+            "baixo",
+            "2024-01-01 00:00:00",
+            json.dumps(decode_responses(bits)) if layout == "json" else bits,
+        )
+        for row_id, patient_id, bits in rows
+    )
+    connection.executemany("INSERT INTO evaluation VALUES (?, ?, ?, ?, ?, ?)", payload)
+    connection.commit()
+    connection.execute("VACUUM")
+    return connection
+
+
+def scan_json(connection):
+    failures = [0] * len(QUESTION_CODES)
+    for (raw,) in connection.execute("SELECT responses FROM evaluation"):
+        bits = encode_responses(json.loads(raw)) ^ NO_RISK_MASK
+        for index in range(len(QUESTION_CODES)):
+            failures[index] += (bits >> index) & 1
+    return failures
+
+
+def scan_bits(connection):
+    # SQLite não tem XOR; (a | m) - (a & m) equivale a a ^ m
+    risky = f"((responses_bits | {NO_RISK_MASK}) - (responses_bits & {NO_RISK_MASK}))"
+    columns = ", ".join(
+        f"SUM(({risky} >> {index}) & 1)" for index in range(len(QUESTION_CODES))
+    )
+    return list(connection.execute(f"SELECT {columns} FROM evaluation").fetchone())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for layout, scan in (("json", scan_json), ("bits", scan_bits)):
+            path = os.path.join(directory, f"{layout}.sqlite3")
+            connection = build(path, layout, generate_rows(args.rows, args.seed))
+            started = time.perf_counter()
+            failures = scan(connection)
+            elapsed = time.perf_counter() - started
+            connection.close()
+            size = os.path.getsize(path)
+            results[layout] = failures
+            print(
+                f"{layout:>5}: {size / 1_048_576:8.2f} MiB "
+                f"({size / args.rows:6.1f} B/linha)  varredura {elapsed * 1000:9.1f} ms"
+            )
+    assert results["json"] == results["bits"], "layouts divergentes"
+
+
+if __name__ == "__main__":
+    main()
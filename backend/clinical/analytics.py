@@ -0,0 +1,109 @@
+from itertools import combinations
+
+from django.db.models import Count, F, Sum
+from django.db.models.lookups import Exact
+
+from .constants import CRITICAL_ITEMS
+from .scoring import ALL_MASK, NO_RISK_MASK, QUESTION_BITS, QUESTION_CODES
+
+GROUP_FIELDS = ("professional", "month", "risk_level")
+
+CRITICAL_CODES = [code for code in QUESTION_CODES if code in CRITICAL_ITEMS]
+CRITICAL_PAIRS = list(combinations(CRITICAL_CODES, 2))
+
+# padrão de bits que indica falha (resposta de risco) em cada pergunta
+FAILURE_PATTERN = ~NO_RISK_MASK & ALL_MASK
+
+
+def item_aggregates():
+    """Agregações SQL das falhas por item e dos pares de itens críticos.
+
+    A soma de cada bit de ``responses_bits`` conta as respostas "sim"; as
+    falhas são derivadas em ``item_counts``.
+    """
+    bits = F("responses_bits")
+    metrics = {}
+    for index, code in enumerate(QUESTION_CODES):
+        metrics[f"yes_{code}"] = Sum(bits.bitrightshift(index).bitand(1))
+    for first, second in CRITICAL_PAIRS:
+        mask = QUESTION_BITS[first] | QUESTION_BITS[second]
+        metrics[f"pair_{first}_{second}"] = Count(
+            "id", filter=Exact(bits.bitand(mask), FAILURE_PATTERN & mask)
+        )
+    return metrics
+
+
+def item_counts(row, total):
+    """Converte uma linha de ``item_aggregates`` em (falhas, pares críticos)."""
+    failures = []
+    for code in QUESTION_CODES:
+        yes = row[f"yes_{code}"] or 0
+        failures.append(yes if QUESTION_BITS[code] & FAILURE_PATTERN else total - yes)
+    pairs = [row[f"pair_{first}_{second}"] for first, second in CRITICAL_PAIRS]
+    return failures, pairs
+
+
+def evaluation_item_counts(bits):
+    """``item_counts`` de uma única avaliação, a partir de ``responses_bits``."""
+    row = {f"yes_{code}": (bits >> index) & 1 for index, code in enumerate(QUESTION_CODES)}
+    for first, second in CRITICAL_PAIRS:
+        mask = QUESTION_BITS[first] | QUESTION_BITS[second]
+        row[f"pair_{first}_{second}"] = int(bits & mask == FAILURE_PATTERN & mask)
+    return item_counts(row, 1)
+
+
+def add_counts(first, second):
+    if not first:
+        return list(second)
+    return [a + b for a, b in zip(first, second)]
+
+
+def _rate(count, total):
+    return round(count / total, 4) if total else 0
+
+
+def item_prevalence(buckets, group_by=()):
+    """Soma buckets do consolidado em taxas de falha por item.
+
+    ``buckets`` são tuplas (profissional, mês, risco, avaliações, falhas,
+    pares críticos); cada grupo traz a matriz de coocorrência dos itens
+    críticos, com as falhas individuais na diagonal.
+    """
+    positions = [GROUP_FIELDS.index(name) for name in group_by]
+    totals = {}
+    for bucket in buckets:
+        key = tuple(bucket[position] for position in positions)
+        count, failures, pairs = totals.get(key, (0, [], []))
+        totals[key] = (
+            count + bucket[3],
+            add_counts(failures, bucket[4]),
+            add_counts(pairs, bucket[5]),
+        )
+
+    critical_index = {code: QUESTION_CODES.index(code) for code in CRITICAL_CODES}
+    groups = []
+    for key in sorted(totals, key=lambda key: [(value is None, value) for value in key]):
+        total, failures, pair_counts = totals[key]
+        cells = {(code, code): failures[critical_index[code]] for code in CRITICAL_CODES}
+        for (first, second), count in zip(CRITICAL_PAIRS, pair_counts):
+            cells[first, second] = cells[second, first] = count
+
+        group = dict(zip(group_by, key))
+        group.update(
+            {
+                "evaluations": total,
+                "items": {
+                    code: {
+                        "failures": failures[index],
+                        "rate": _rate(failures[index], total),
+                        "critical": code in CRITICAL_ITEMS,
+                    }
+                    for index, code in enumerate(QUESTION_CODES)
+                },
+                "critical_cooccurrence": [
+                    [cells[first, second] for second in CRITICAL_CODES] for first in CRITICAL_CODES
+                ],
+            }
+        )
+        groups.append(group)
+    return groups
@@ -0,0 +1,38 @@
+"""Autenticação da API; carregada pelo DRF, então não pode importar ``rest_framework.views``."""
+
+import hmac
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework.authentication import BaseAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .middleware import span
+
+
+class TimedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication com o tempo medido no Server-Timing (``auth``)."""
+
+    def authenticate(self, request):
+        with span("auth"):
+            return super().authenticate(request)
+
+
+class TimedJWTScheme(SimpleJWTScheme):
+    # o drf-spectacular não reconhece subclasses de JWTAuthentication
+    target_class = "clinical.authentication.TimedJWTAuthentication"
+
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """Aceita ``Authorization: Bearer <METRICS_TOKEN>`` para a coleta das métricas."""
+
+    def authenticate(self, request):
+        token = settings.METRICS_TOKEN
+        header = request.META.get("HTTP_AUTHORIZATION", "")
+        if token and hmac.compare_digest(header.encode(), f"Bearer {token}".encode()):
+            return AnonymousUser(), "metrics"
+        return None
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
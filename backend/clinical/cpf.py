@@ -0,0 +1,34 @@
+import re
+
+CPF_LENGTH = 11
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_cpf(value):
+    """Reduz o CPF aos 11 dígitos, aceitando pontuação e espaços."""
+    digits = _NON_DIGITS.sub("", str(value or ""))
+    if len(digits) != CPF_LENGTH:
+        raise ValueError("O CPF deve conter 11 dígitos.")
+    return digits
+
+
+def format_cpf(digits):
+    return f"{digits[:3]}.{digits[3:6]}.{digits[6:9]}-{digits[9:]}"
+
+
+def cpf_variants(digits):
+    """Formas em que um CPF normalizado pode estar gravado no banco."""
+    return (digits, format_cpf(digits))
+
+
+def _check_digit(digits):
+    weight = len(digits) + 1
+    total = sum(int(digit) * (weight - index) for index, digit in enumerate(digits))
+    return str(total * 10 % 11 % 10)
+
+
+def cpf_with_check_digits(base):
+    """Completa os 9 primeiros dígitos de um CPF com os dígitos verificadores."""
+    first = base + _check_digit(base)
+    return first + _check_digit(first)
@@ -0,0 +1,173 @@
+import csv
+import zipfile
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .scoring import QUESTION_CODES, decode_responses
+
+OUTPUTS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+EVALUATION_FIELDS = (
+    "id",
+    "patient_id",
+    "professional_id",
+    "created_at",
+    "is_follow_up",
+    "total_score",
+    "risk_level",
+    "responses_bits",
+    "observations",
+)
+SESSION_FIELDS = (
+    "id",
+    "patient_id",
+    "professional_id",
+    "session_date",
+    "session_type",
+    "objectives",
+    "interventions",
+    "family_guidance",
+    "next_steps",
+    "created_at",
+)
+
+CHUNK_SIZE = 2000
+# tamanho aproximado de cada pedaço enviado ao cliente
+FLUSH_BYTES = 64 * 1024
+
+
+class _Echo:
+    """Arquivo fictício para o ``csv.writer`` devolver a linha formatada."""
+
+    def write(self, value):
+        return value
+
+
+def evaluation_row(row):
+    """Expande ``responses_bits`` em {"q1": "sim", ...} (mesmo formato da importação)."""
+    row["responses"] = decode_responses(row.pop("responses_bits"))
+    return row
+
+
+def _csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        responses = row.pop("responses", None)
+        values = list(row.values())
+        if responses is not None:
+            values.extend(responses[code] for code in QUESTION_CODES)
+        yield writer.writerow(values)
+
+
+def _jsonl_lines(rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(row) + "\n"
+
+
+def _buffered(lines):
+    buffer = []
+    size = 0
+    for index, line in enumerate(lines):
+        buffer.append(line)
+        size += len(line)
+        # o primeiro pedaço (cabeçalho ou 1ª linha) sai imediatamente
+        if index == 0 or size >= FLUSH_BYTES:
+            yield "".join(buffer).encode("utf-8")
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def export_response(queryset, fields, filename, output="csv", transform=None):
+    """Resposta em streaming com uma linha por registro do queryset.
+
+    As linhas vêm de ``.values().iterator()``, sem montar objetos nem
+    carregar o resultado inteiro, então a memória não cresce com a extração.
+    """
+    if output not in OUTPUTS:
+        raise ValidationError({"output": "Utilize 'csv' ou 'jsonl'."})
+
+    rows = queryset.values(*fields).iterator(chunk_size=CHUNK_SIZE)
+    if transform is not None:
+        rows = map(transform, rows)
+    if output == "csv":
+        header = [field for field in fields if field != "responses_bits"]
+        if "responses_bits" in fields:
+            header.extend(QUESTION_CODES)
+        lines = _csv_lines(header, rows)
+    else:
+        lines = _jsonl_lines(rows)
+
+    response = StreamingHttpResponse(_buffered(lines), content_type=OUTPUTS[output])
+    stamp = timezone.localtime().strftime("%Y%m%d%H%M")
+    response["Content-Disposition"] = f'attachment; filename="{filename}_{stamp}.{output}"'
+    return response
+
+
+def day_range_filter(field, start, end, is_datetime=True):
+    """Filtro inclusivo [start, end] por dia para campos de data ou data/hora."""
+    filters = {}
+    if is_datetime:
+        if start:
+            filters[f"{field}__gte"] = timezone.make_aware(datetime.combine(start, time.min))
+        if end:
+            filters[f"{field}__lt"] = timezone.make_aware(
+                datetime.combine(end + timedelta(days=1), time.min)
+            )
+    else:
+        if start:
+            filters[f"{field}__gte"] = start
+        if end:
+            filters[f"{field}__lte"] = end
+    return filters
+
+
+class _ZipOutput:
+    """Saída sem ``seek`` para o ZipFile; guarda os bytes até o próximo ``drain``."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def zip_stream(entries):
+    """Gera um ZIP em partes a partir de pares (nome, bytes ou arquivo aberto).
+
+    Cada arquivo é gravado e enviado antes de o próximo ser lido, então só um
+    PDF por vez fica em memória; os PDFs já são comprimidos e vão sem
+    compressão adicional (ZIP_STORED).
+    """
+    output = _ZipOutput()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_STORED) as archive:
+        for name, content in entries:
+            with archive.open(name, "w") as entry:
+                if isinstance(content, bytes):
+                    entry.write(content)
+                else:
+                    with content:
+                        for block in iter(lambda: content.read(FLUSH_BYTES), b""):
+                            entry.write(block)
+                            yield output.drain()
+            yield output.drain()
+    yield output.drain()
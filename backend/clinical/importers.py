@@ -0,0 +1,407 @@
+import csv
+import io
+import json
+from itertools import chain, islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.fields import SkipField, empty
+
+from .cpf import cpf_variants, normalize_cpf
+from .metrics import count_scorings
+from .models import EvaluationMChat, Patient
+from .rollups import apply_deltas, evaluation_contribution, merge, patient_reassignment
+from .scoring import QUESTION_CODES, RISK_LEVELS, score_batch
+from .serializers import EvaluationMChatSerializer, PatientSerializer
+
+User = get_user_model()
+
+FORMATS = ("csv", "jsonl")
+
+
+def detect_format(name):
+    extension = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    if extension == "csv":
+        return "csv"
+    return None
+
+
+def iter_csv(stream):
+    """Gera (linha, payload) a partir de um CSV com cabeçalho."""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, {
+            key: value.strip() for key, value in row.items() if key and value not in (None, "")
+        }
+
+
+def iter_jsonl(stream):
+    """Gera (linha, payload) a partir de um objeto JSON por linha."""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            payload = json.loads(line)
+        except ValueError:
+            payload = None
+        if not isinstance(payload, dict):
+            yield line_number, ValueError("Linha JSON inválida.")
+        else:
+            yield line_number, payload
+
+
+def read_rows(stream, name="", file_format=None):
+    """Escolhe o leitor pelo formato informado, pela extensão ou pela 1ª linha."""
+    file_format = file_format or detect_format(name)
+    if file_format is None:
+        first_line = stream.readline()
+        file_format = "jsonl" if first_line.lstrip().startswith("{") else "csv"
+        stream = chain([first_line], stream)
+    if file_format == "csv":
+        return iter_csv(stream)
+    return iter_jsonl(stream)
+
+
+def open_upload(upload):
+    """Abre um arquivo enviado como texto, sem carregá-lo inteiro na memória."""
+    return io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+
+
+class BatchImporter:
+    """Laço comum dos importadores: valida cada linha e grava em lotes.
+
+    Subclasses implementam ``_validate`` (retorna dados e erros da linha),
+    ``_save_batch`` e, se necessário, ``finish``.
+    """
+
+    def __init__(self, user=None, batch_size=2000, max_errors=1000):
+        self.user = user
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def _add_error(self, line, detail):
+        self.error_count += 1
+        if self.max_errors is None or len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "errors": detail})
+
+    def _parse_id(self, value):
+        if value in (None, ""):
+            return None
+        if isinstance(value, bool):
+            raise ValueError
+        return int(value)
+
+    def _run_fields(self, fields, payload, data, errors):
+        for name, field in fields.items():
+            try:
+                data[name] = field.run_validation(payload.get(name, empty))
+            except SkipField:
+                continue
+            except serializers.ValidationError as exc:
+                errors[name] = exc.detail
+
+    def _validate(self, payload):
+        raise NotImplementedError
+
+    def _save_batch(self, batch):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+    def run(self, rows):
+        rows = iter(rows)
+        try:
+            while True:
+                try:
+                    chunk = list(islice(rows, self.batch_size))
+                except (UnicodeDecodeError, csv.Error) as exc:
+                    self._add_error(None, {"non_field_errors": [f"Arquivo inválido: {exc}"]})
+                    break
+                if not chunk:
+                    break
+                batch = []
+                for line, payload in chunk:
+                    if isinstance(payload, Exception):
+                        self._add_error(line, {"non_field_errors": [str(payload)]})
+                        continue
+                    data, errors = self._validate(payload)
+                    if errors:
+                        self._add_error(line, errors)
+                    else:
+                        batch.append((line, data))
+                if batch:
+                    self._save_batch(batch)
+        finally:
+            self.finish()
+        return self.report()
+
+    def report(self):
+        return {
+            "created": self.created,
+            "error_count": self.error_count,
+            "errors": sorted(self.errors, key=lambda error: error["line"] or 0),
+            "errors_truncated": self.error_count > len(self.errors),
+        }
+
+
+class EvaluationImporter(BatchImporter):
+    """Importa avaliações M-CHAT em lotes com as regras do serializer.
+
+    As linhas são validadas com os próprios campos de
+    ``EvaluationMChatSerializer``; pacientes e profissionais são conferidos
+    com uma consulta por lote e cada lote é gravado com ``bulk_create`` em
+    sua própria transação. Como ``bulk_create`` não dispara signals, o
+    consolidado do painel é recalculado ao final.
+    """
+
+    field_names = (
+        "responses",
+        "observations",
+        "follow_up_recommendations",
+        "is_follow_up",
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = EvaluationMChatSerializer().fields
+        self.fields = {name: fields[name] for name in self.field_names}
+        self.patient_field = fields["patient_id"]
+        self.rollup_deltas = {}
+
+    def _validate(self, payload):
+        if "responses" not in payload:
+            # CSV: uma coluna por pergunta
+            payload["responses"] = {
+                code: payload.pop(code) for code in QUESTION_CODES if code in payload
+            }
+        data = {}
+        errors = {}
+        self._run_fields(self.fields, payload, data, errors)
+        for name in ("patient_id", "professional_id"):
+            try:
+                data[name] = self._parse_id(payload.get(name))
+            except (TypeError, ValueError):
+                errors[name] = [
+                    self.patient_field.error_messages["incorrect_type"].format(
+                        data_type=type(payload.get(name)).__name__
+                    )
+                ]
+        if "patient_id" not in errors and data["patient_id"] is None:
+            errors["patient_id"] = [self.patient_field.error_messages["required"]]
+        return data, errors
+
+    def _save_batch(self, batch):
+        patients = dict(
+            Patient.objects.filter(pk__in={data["patient_id"] for _, data in batch}).values_list(
+                "id", "professional_id"
+            )
+        )
+        professionals = set(
+            User.objects.filter(
+                pk__in={data["professional_id"] for _, data in batch} - {None}
+            ).values_list("id", flat=True)
+        )
+        does_not_exist = self.patient_field.error_messages["does_not_exist"]
+
+        valid = []
+        for line, data in batch:
+            errors = {}
+            if data["patient_id"] not in patients:
+                errors["patient_id"] = [does_not_exist.format(pk_value=data["patient_id"])]
+            professional_id = data["professional_id"]
+            if professional_id is not None and professional_id not in professionals:
+                errors["professional_id"] = [does_not_exist.format(pk_value=professional_id)]
+            if errors:
+                self._add_error(line, errors)
+            else:
+                valid.append(data)
+        if not valid:
+            return
+
+        totals, criticals, levels = score_batch([data["responses"] for data in valid])
+        count_scorings("import", len(valid))
+        evaluations = []
+        for data, total, critical, level in zip(valid, totals, criticals, levels):
+            risk_level = RISK_LEVELS[level]
+            professional_id = data["professional_id"] or getattr(self.user, "pk", None)
+            recommendations = data.get("follow_up_recommendations", "")
+            if risk_level == EvaluationMChat.RISK_HIGH and "follow_up_recommendations" not in data:
+                recommendations = EvaluationMChatSerializer.HIGH_RISK_RECOMMENDATION
+            evaluations.append(
+                EvaluationMChat(
+                    patient_id=data["patient_id"],
+                    professional_id=professional_id,
+                    responses_bits=data["responses"],
+                    observations=data.get("observations", ""),
+                    total_score=int(total),
+                    risk_level=risk_level,
+                    clinical_interpretation=EvaluationMChatSerializer._build_interpretation(
+                        risk_level, int(critical)
+                    ),
+                    follow_up_recommendations=recommendations,
+                    is_follow_up=data.get("is_follow_up", False),
+                )
+            )
+
+        with transaction.atomic():
+            EvaluationMChat.objects.bulk_create(evaluations, batch_size=self.batch_size)
+        self.created += len(evaluations)
+        # bulk_create não dispara os sinais: a contribuição de cada avaliação vai ao consolidado
+        for evaluation in evaluations:
+            merge(
+                self.rollup_deltas,
+                evaluation_contribution(
+                    {
+                        "professional_id": evaluation.professional_id,
+                        "patient__professional_id": patients[evaluation.patient_id],
+                        "created_at": evaluation.created_at,
+                        "is_follow_up": evaluation.is_follow_up,
+                        "risk_level": evaluation.risk_level,
+                        "total_score": evaluation.total_score,
+                        "responses_bits": evaluation.responses_bits,
+                    }
+                ),
+            )
+
+    def finish(self):
+        apply_deltas(self.rollup_deltas)
+
+
+class PatientImporter(BatchImporter):
+    """Importa pacientes deduplicando pelo CPF normalizado.
+
+    CPFs repetidos no arquivo são rejeitados (vale a primeira ocorrência) e
+    os já cadastrados são buscados com uma consulta por lote, nas duas
+    formas de gravação. No modo ``skip`` eles são ignorados; no modo
+    ``update`` o lote é gravado com ``bulk_create(update_conflicts=True)``.
+    """
+
+    MODES = ("skip", "update")
+    field_names = (
+        "name",
+        "birth_date",
+        "guardian_name",
+        "contact",
+        "address",
+        "summary_history",
+        "archived",
+    )
+
+    def __init__(self, *args, mode="skip", **kwargs):
+        super().__init__(*args, **kwargs)
+        if mode not in self.MODES:
+            raise ValueError(f"Modo inválido: {mode}")
+        self.mode = mode
+        fields = PatientSerializer().fields
+        self.fields = {name: fields[name] for name in self.field_names}
+        self.professional_field = fields["professional_id"]
+        self.updated = 0
+        self.skipped = 0
+        # CPFs já vistos no arquivo, como inteiros para limitar a memória
+        self.seen = set()
+        self.rollup_deltas = {}
+
+    def _validate(self, payload):
+        data = {}
+        errors = {}
+        self._run_fields(self.fields, payload, data, errors)
+        try:
+            data["cpf"] = normalize_cpf(payload.get("cpf"))
+        except ValueError as exc:
+            errors["cpf"] = [str(exc)]
+        try:
+            data["professional_id"] = self._parse_id(payload.get("professional_id"))
+        except (TypeError, ValueError):
+            errors["professional_id"] = [
+                self.professional_field.error_messages["incorrect_type"].format(
+                    data_type=type(payload.get("professional_id")).__name__
+                )
+            ]
+        if "cpf" in data and not errors:
+            key = int(data["cpf"])
+            if key in self.seen:
+                errors["cpf"] = ["CPF repetido no arquivo."]
+            self.seen.add(key)
+        return data, errors
+
+    def _save_batch(self, batch):
+        lookup = [variant for _, data in batch for variant in cpf_variants(data["cpf"])]
+        existing = {
+            normalize_cpf(cpf): (patient_id, cpf, professional_id)
+            for patient_id, cpf, professional_id in Patient.objects.filter(
+                cpf__in=lookup
+            ).values_list("id", "cpf", "professional_id")
+        }
+        professionals = set(
+            User.objects.filter(
+                pk__in={data["professional_id"] for _, data in batch} - {None}
+            ).values_list("id", flat=True)
+        )
+        does_not_exist = self.professional_field.error_messages["does_not_exist"]
+        restricted = self.user is not None and not self.user.is_staff
+
+        groups = {}
+        changed = {}
+        created = updated = 0
+        for line, data in batch:
+            professional_id = data.pop("professional_id")
+            if professional_id is not None and professional_id not in professionals:
+                self._add_error(
+                    line, {"professional_id": [does_not_exist.format(pk_value=professional_id)]}
+                )
+                continue
+            professional_id = professional_id or getattr(self.user, "pk", None)
+            current = existing.get(data["cpf"])
+            if current is not None:
+                patient_id, stored_cpf, current_professional = current
+                if self.mode == "skip":
+                    self.skipped += 1
+                    continue
+                if restricted and current_professional != self.user.pk:
+                    self._add_error(line, {"cpf": ["CPF já cadastrado por outro profissional."]})
+                    continue
+                # mantém o CPF como está gravado para acertar o conflito
+                data["cpf"] = stored_cpf
+                if professional_id is not None and professional_id != current_professional:
+                    changed[patient_id] = (current_professional, professional_id)
+                updated += 1
+            else:
+                created += 1
+            fields = [name for name in data if name != "cpf"]
+            if professional_id is not None:
+                data["professional_id"] = professional_id
+                fields.append("professional")
+            groups.setdefault(tuple(fields), []).append(Patient(**data))
+
+        with transaction.atomic():
+            for fields, patients in groups.items():
+                if self.mode == "update":
+                    Patient.objects.bulk_create(
+                        patients,
+                        update_conflicts=True,
+                        unique_fields=["cpf"],
+                        update_fields=[*fields, "updated_at"],
+                    )
+                else:
+                    Patient.objects.bulk_create(patients, ignore_conflicts=True)
+        self.created += created
+        self.updated += updated
+
+        if changed:
+            # pacientes que trocaram de profissional mudam o consolidado do painel
+            merge(self.rollup_deltas, patient_reassignment(changed))
+
+    def finish(self):
+        apply_deltas(self.rollup_deltas)
+
+    def report(self):
+        report = super().report()
+        report.update({"updated": self.updated, "skipped": self.skipped})
+        return report
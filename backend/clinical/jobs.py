@@ -0,0 +1,352 @@
+"""Fila de geração de PDFs no banco, consumida por ``manage.py run_pdf_worker``.
+
+O worker lê os dados de cada job no próprio processo (``build_context``) e
+envia só o dicionário resultante para um pool de processos, onde o reportlab
+desenha o documento sem acessar o banco. O PDF pronto fica no próprio job
+(``pdf_content``), já que o worker é um serviço separado do web; pelo mesmo
+motivo, o tempo de desenho fica no job até o web registrá-lo nas métricas
+(``observe_worker_renders``).
+"""
+
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from . import pdf
+from .metrics import observe_pdf_render
+from .models import ClinicalReport, EvaluationMChat, Patient, PdfJob
+from .pdf_cache import cached_render, get_cache, pdf_digest
+
+MAX_ATTEMPTS = 3
+# jobs "em processamento" há mais tempo que isso voltam para a fila
+STALE_AFTER = timedelta(minutes=10)
+
+
+def enqueue(kind, object_id, user=None):
+    return PdfJob.objects.create(kind=kind, object_id=object_id, requested_by=user)
+
+
+def claim_jobs(limit):
+    """Marca até ``limit`` jobs pendentes como em processamento.
+
+    Cada job é reservado com um UPDATE condicional ao status, então vários
+    workers podem disputar a mesma fila sem processar um job duas vezes.
+    """
+    candidates = (
+        PdfJob.objects.filter(status=PdfJob.STATUS_PENDING)
+        .order_by("created_at", "id")
+        .values_list("id", flat=True)[: limit * 2]
+    )
+    claimed = []
+    for job_id in candidates:
+        updated = PdfJob.objects.filter(id=job_id, status=PdfJob.STATUS_PENDING).update(
+            status=PdfJob.STATUS_RUNNING,
+            started_at=timezone.now(),
+            attempts=F("attempts") + 1,
+        )
+        if updated:
+            claimed.append(job_id)
+            if len(claimed) == limit:
+                break
+    return list(PdfJob.objects.filter(id__in=claimed).order_by("created_at", "id"))
+
+
+def general_context(patient, now=None):
+    return pdf.general_report_context(
+        patient,
+        patient.evaluations.order_by("-created_at"),
+        patient.sessions.order_by("-session_date", "-created_at"),
+        now or timezone.now(),
+    )
+
+
+def build_context(job):
+    if job.kind == PdfJob.KIND_EVALUATION:
+        evaluation = EvaluationMChat.objects.select_related("patient", "professional").get(
+            pk=job.object_id
+        )
+        return pdf.evaluation_context(evaluation)
+    if job.kind == PdfJob.KIND_REPORT:
+        report = ClinicalReport.objects.select_related(
+            "evaluation__patient", "evaluation__professional"
+        ).get(pk=job.object_id)
+        return pdf.report_context(report, timezone.now())
+    return general_context(Patient.objects.get(pk=job.object_id))
+
+
+def complete(job, content, filename, seconds=None):
+    # no banco, e não em MEDIA_ROOT: o worker roda em outro serviço, sem o disco do web
+    job.pdf_content = content
+    job.filename = filename
+    job.render_seconds = seconds
+    job.status = PdfJob.STATUS_DONE
+    job.error = ""
+    job.finished_at = timezone.now()
+    job.save(
+        update_fields=[
+            "pdf_content",
+            "filename",
+            "render_seconds",
+            "status",
+            "error",
+            "finished_at",
+        ]
+    )
+
+
+def fail(job, error):
+    job.status = PdfJob.STATUS_FAILED
+    job.error = str(error) or error.__class__.__name__
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "finished_at"])
+
+
+def release(job, error):
+    """Devolve à fila um job interrompido (ex.: processo do pool encerrado)."""
+    if job.attempts >= MAX_ATTEMPTS:
+        fail(job, error)
+        return
+    job.status = PdfJob.STATUS_PENDING
+    job.started_at = None
+    job.save(update_fields=["status", "started_at"])
+
+
+def requeue_stale(now=None):
+    limit = (now or timezone.now()) - STALE_AFTER
+    stale = PdfJob.objects.filter(status=PdfJob.STATUS_RUNNING, started_at__lt=limit)
+    for job in stale:
+        release(job, "Tempo de processamento excedido.")
+
+
+def prune_jobs(now=None):
+    """Apaga os jobs terminados há mais de ``PDF_JOB_RETENTION_HOURS``.
+
+    Cada download cria um job com o PDF no banco; sem isso a tabela cresce
+    a cada clique.
+    """
+    limit = (now or timezone.now()) - timedelta(hours=settings.PDF_JOB_RETENTION_HOURS)
+    deleted, _ = PdfJob.objects.filter(
+        status__in=[PdfJob.STATUS_DONE, PdfJob.STATUS_FAILED], finished_at__lt=limit
+    ).delete()
+    return deleted
+
+
+def observe_worker_renders(limit=500):
+    """Registra, no processo web, os tempos de desenho gravados pelo worker.
+
+    Chamado na coleta do ``/api/metrics/``. Cada tempo é apagado do job com
+    um UPDATE condicional, como em ``claim_jobs``, então entra uma única vez
+    mesmo com vários processos coletando ao mesmo tempo.
+    """
+    pending = PdfJob.objects.filter(render_seconds__isnull=False).values_list(
+        "id", "kind", "render_seconds"
+    )[:limit]
+    for job_id, kind, seconds in pending:
+        if PdfJob.objects.filter(id=job_id, render_seconds__isnull=False).update(
+            render_seconds=None
+        ):
+            observe_pdf_render(kind, seconds)
+
+
+def render_job(job):
+    """Gera o PDF de um job no processo atual (sem pool)."""
+    timings = []
+    try:
+        context = build_context(job)
+        _, content = cached_render(
+            job.kind, context, observe=lambda kind, seconds: timings.append(seconds)
+        )
+    except Exception as exc:
+        fail(job, exc)
+        return False
+    complete(job, content, context["filename"], timings[0] if timings else None)
+    return True
+
+
+def _new_pool(processes):
+    # "spawn" evita herdar conexões de banco e threads do processo principal
+    return ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def run_worker(processes=2, poll_interval=1.0, once=False, log=None):
+    """Processa a fila até ser interrompido (ou até esvaziá-la com ``once``).
+
+    Com ``processes=0`` os PDFs são gerados no próprio processo.
+    """
+    log = log or (lambda message: None)
+    done_count = 0
+    requeue_stale()
+    prune_jobs()
+
+    if not processes:
+        while True:
+            close_old_connections()
+            jobs = claim_jobs(1)
+            if not jobs:
+                if once:
+                    return done_count
+                time.sleep(poll_interval)
+                requeue_stale()
+                prune_jobs()
+                continue
+            done_count += render_job(jobs[0])
+
+    cache = get_cache()
+    pool = _new_pool(processes)
+    running = {}
+    try:
+        while True:
+            close_old_connections()
+            free = processes - len(running)
+            for job in claim_jobs(free) if free else []:
+                try:
+                    # o pool não acessa o banco: as linhas seguem como listas
+                    context = pdf.materialize(build_context(job))
+                except Exception as exc:
+                    fail(job, exc)
+                    continue
+                digest = pdf_digest(job.kind, context)
+                content = cache.get(digest)
+                if content is not None:
+                    complete(job, content, context["filename"])
+                    done_count += 1
+                    continue
+                future = pool.submit(pdf.render_timed, job.kind, context)
+                running[future] = (job, context["filename"], digest)
+
+            if not running:
+                if once:
+                    return done_count
+                time.sleep(poll_interval)
+                requeue_stale()
+                prune_jobs()
+                continue
+
+            finished, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in finished:
+                job, filename, digest = running.pop(future)
+                try:
+                    content, seconds = future.result()
+                except BrokenProcessPool as exc:
+                    broken = True
+                    release(job, exc)
+                    log(f"Processo do pool encerrado durante o job {job.id}.")
+                    continue
+                except Exception as exc:
+                    fail(job, exc)
+                    log(f"Job {job.id} falhou: {exc}")
+                    continue
+                cache.put(digest, content)
+                complete(job, content, filename, seconds)
+                done_count += 1
+                log(f"Job {job.id} concluído ({filename}).")
+
+            if broken:
+                for job, *_ in running.values():
+                    release(job, "Processo do pool encerrado.")
+                running = {}
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = _new_pool(processes)
+    finally:
+        for job, *_ in running.values():
+            release(job, "Worker interrompido.")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+
+def batch_pool(processes, broken=None):
+    """Pool das exportações em lote, compartilhado pelas requisições do processo.
+
+    É criado na primeira exportação e reaproveitado pelas seguintes, então um
+    processo web nunca tem mais que ``processes`` renderizadores, qualquer que
+    seja o número de requisições simultâneas. ``broken`` descarta o pool que
+    perdeu um processo.
+    """
+    global _batch_pool
+    with _batch_pool_lock:
+        pool, size = _batch_pool or (None, 0)
+        if pool is not None and (size != processes or pool is broken):
+            # as tarefas já enviadas terminam; as próximas vão para o novo pool
+            pool.shutdown(wait=False)
+            pool = None
+        if pool is None and processes:
+            pool = _new_pool(processes)
+        _batch_pool = (pool, processes) if pool is not None else None
+        return pool
+
+
+def render_general_reports(patients, processes=2):
+    """Gera (nome do arquivo, PDF, erro) do relatório geral de cada paciente.
+
+    Os dados são lidos aqui, em ordem; os PDFs fora do cache são desenhados
+    em paralelo no pool compartilhado (``batch_pool``), com no máximo
+    ``2 * processes`` aguardando, e devolvidos na mesma ordem dos pacientes.
+    O PDF vem como bytes ou como arquivo aberto do cache.
+    """
+    cache = get_cache()
+    pool = batch_pool(processes)
+    window = max(processes, 1) * 2
+    pending = deque()
+
+    def finish(filename, digest, result):
+        if isinstance(result, Future):
+            try:
+                content, seconds = result.result()
+            except BrokenProcessPool as exc:
+                batch_pool(processes, broken=pool)
+                return filename, None, exc
+            except Exception as exc:
+                return filename, None, exc
+            observe_pdf_render(PdfJob.KIND_GENERAL, seconds)
+            cache.put(digest, content)
+            return filename, content, None
+        if isinstance(result, Exception):
+            return filename, None, result
+        return filename, result, None
+
+    try:
+        now = timezone.now()
+        for patient in patients:
+            context = general_context(patient, now)
+            if pool is not None:
+                context = pdf.materialize(context)
+            digest = pdf_digest(PdfJob.KIND_GENERAL, context)
+            result = cache.open(digest)
+            if result is None and pool is not None:
+                try:
+                    result = pool.submit(pdf.render_timed, PdfJob.KIND_GENERAL, context)
+                except BrokenProcessPool as exc:
+                    batch_pool(processes, broken=pool)
+                    result = exc
+            elif result is None:
+                try:
+                    _, result = cached_render(PdfJob.KIND_GENERAL, context, digest)
+                except Exception as exc:
+                    result = exc
+            pending.append((context["filename"], digest, result))
+            while len(pending) > window:
+                yield finish(*pending.popleft())
+        while pending:
+            yield finish(*pending.popleft())
+    finally:
+        # download interrompido: libera os arquivos e o que ainda não começou no pool
+        for _, _, result in pending:
+            if isinstance(result, Future):
+                result.cancel()
+            elif hasattr(result, "close"):
+                result.close()
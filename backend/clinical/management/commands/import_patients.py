@@ -0,0 +1,65 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from clinical.importers import FORMATS, PatientImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = "Importa pacientes de um arquivo CSV ou JSONL, deduplicando pelo CPF."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Arquivo CSV ou JSONL.")
+        parser.add_argument("--format", dest="file_format", choices=FORMATS)
+        parser.add_argument(
+            "--mode",
+            choices=PatientImporter.MODES,
+            default="skip",
+            help="skip mantém os pacientes já cadastrados; update os atualiza.",
+        )
+        parser.add_argument(
+            "--professional",
+            help="Usuário (id ou username) atribuído às linhas sem professional_id.",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--report", help="Grava o relatório completo de erros (JSON) neste arquivo."
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options["professional"]:
+            User = get_user_model()
+            lookup = options["professional"]
+            field = "pk" if lookup.isdigit() else "username"
+            try:
+                user = User.objects.get(**{field: lookup})
+            except User.DoesNotExist:
+                raise CommandError(f"Profissional {lookup} não encontrado.")
+
+        importer = PatientImporter(
+            user=user,
+            mode=options["mode"],
+            batch_size=options["batch_size"],
+            max_errors=None if options["report"] else 20,
+        )
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as stream:
+                report = importer.run(read_rows(stream, options["path"], options["file_format"]))
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for error in report["errors"][:20]:
+            self.stderr.write(
+                f"linha {error['line']}: {json.dumps(error['errors'], ensure_ascii=False)}"
+            )
+        if options["report"]:
+            with open(options["report"], "w", encoding="utf-8") as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report['created']} paciente(s) criado(s), {report['updated']} atualizado(s), "
+                f"{report['skipped']} ignorado(s), {report['error_count']} linha(s) com erro."
+            )
+        )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clinical.rollups import rebuild_rollups, verify_rollups
+
+
+class Command(BaseCommand):
+    help = "Reconstrói e confere o consolidado mensal usado pelo painel."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify-only",
+            action="store_true",
+            help="Apenas compara o consolidado salvo com as avaliações.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["verify_only"]:
+            rebuild_rollups()
+            self.stdout.write("Consolidado do painel reconstruído.")
+
+        mismatches = verify_rollups()
+        for key, stored, expected in mismatches[:20]:
+            self.stderr.write(f"{key}: salvo={stored} esperado={expected}")
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} bucket(s) divergente(s).")
+        self.stdout.write(self.style.SUCCESS("Consolidado do painel conferido."))
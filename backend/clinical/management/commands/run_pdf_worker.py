@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from clinical.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Processa a fila de geração de PDFs usando um pool de processos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=2,
+            help="Processos de renderização (0 gera os PDFs no próprio processo).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Intervalo, em segundos, entre consultas à fila vazia.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Encerra quando a fila estiver vazia."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            done = run_worker(
+                processes=options["processes"],
+                poll_interval=options["poll_interval"],
+                once=options["once"],
+                log=self.stdout.write,
+            )
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(f"{done} PDF(s) gerado(s)."))
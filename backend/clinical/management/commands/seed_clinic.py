@@ -0,0 +1,95 @@
+import time
+from datetime import date
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from clinical.seeding import BATCH_SIZE, TABLES, ClinicGenerator, deferred_indexes
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera uma clínica sintética e determinística (profissionais, pacientes, "
+        "avaliações M-CHAT, sessões e relatórios) para testes de carga."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--professionals", type=int, default=20)
+        parser.add_argument("--patients", type=int, default=5000)
+        parser.add_argument(
+            "--evaluations",
+            type=int,
+            default=20000,
+            help="Avaliações; além da inicial de cada paciente, as demais são reavaliações.",
+        )
+        parser.add_argument("--sessions", type=int, default=40000)
+        parser.add_argument("--reports", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=1, help="Semente do gerador.")
+        parser.add_argument(
+            "--end-date",
+            type=date.fromisoformat,
+            default=date(2025, 12, 31),
+            help="Data (AAAA-MM-DD) do registro mais recente.",
+        )
+        parser.add_argument(
+            "--months", type=int, default=36, help="Meses de histórico até --end-date."
+        )
+        parser.add_argument(
+            "--password",
+            help="Senha dos profissionais gerados (sem ela, não é possível entrar com as contas).",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--skip-rollups",
+            action="store_true",
+            help="Não reconstrói o consolidado do painel ao final.",
+        )
+
+    def handle(self, *args, **options):
+        if options["professionals"] < 1 or options["patients"] < 1:
+            raise CommandError("Informe ao menos um profissional e um paciente.")
+        prefix = f"seed{options['seed']}_"
+        if get_user_model().objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f"A semente {options['seed']} já foi carregada neste banco; use outra --seed."
+            )
+
+        generator = ClinicGenerator(
+            options["seed"],
+            options["end_date"],
+            months=options["months"],
+            batch_size=options["batch_size"],
+        )
+        steps = [
+            (
+                "profissionais",
+                partial(generator.seed_professionals, password=options["password"]),
+                options["professionals"],
+            ),
+            ("pacientes", generator.seed_patients, options["patients"]),
+            ("avaliações", generator.seed_evaluations, options["evaluations"]),
+            ("sessões", generator.seed_sessions, options["sessions"]),
+            ("relatórios", generator.seed_reports, options["reports"]),
+        ]
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                # numa base vazia os índices só são criados depois da carga
+                empty = [model for model in TABLES if not model.objects.exists()]
+                with deferred_indexes(*empty):
+                    for label, step, count in steps:
+                        step_started = time.perf_counter()
+                        step(count)
+                        self.stdout.write(
+                            f"{count} {label} em {time.perf_counter() - step_started:.1f} s"
+                        )
+                step_started = time.perf_counter()
+                generator.finish(rollups=not options["skip_rollups"])
+                self.stdout.write(f"Finalização em {time.perf_counter() - step_started:.1f} s")
+        except IntegrityError as exc:
+            raise CommandError(f"Dados conflitantes com os já cadastrados: {exc}") from exc
+        self.stdout.write(
+            self.style.SUCCESS(f"Clínica gerada em {time.perf_counter() - started:.1f} s.")
+        )
@@ -0,0 +1,90 @@
+"""Métricas no formato do Prometheus, expostas em ``/api/metrics/``.
+
+Com ``PROMETHEUS_MULTIPROC_DIR`` definido (ver ``render.yaml``), cada worker
+do gunicorn grava seus valores em arquivos nesse diretório e a coleta soma
+todos; sem ele, vale só o processo atual. O diretório precisa ser esvaziado
+antes de iniciar os processos.
+
+O ``run_pdf_worker`` roda em outro serviço e não chega a esse diretório: ele
+grava o tempo de desenho em ``PdfJob.render_seconds`` e a coleta o registra
+em ``tea_pdf_render_duration_seconds`` (``jobs.observe_worker_renders``).
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+METHODS = {"GET", "HEAD", "OPTIONS", "POST", "PUT", "PATCH", "DELETE"}
+
+REQUESTS = Counter(
+    "tea_http_requests",
+    "Requisições atendidas, por view, ação, método e status.",
+    ["view", "action", "method", "status"],
+)
+REQUEST_SECONDS = Histogram(
+    "tea_http_request_duration_seconds",
+    "Duração das requisições (até o envio dos cabeçalhos), por view e ação.",
+    ["view", "action", "method"],
+)
+REQUEST_QUERIES = Histogram(
+    "tea_http_request_db_queries",
+    "Consultas SQL por requisição, por view e ação.",
+    ["view", "action"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500),
+)
+PDF_RENDER_SECONDS = Histogram(
+    "tea_pdf_render_duration_seconds",
+    "Tempo de desenho dos PDFs fora do cache, por tipo de documento.",
+    ["kind"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+SCORINGS = Counter(
+    "tea_mchat_scorings",
+    "Avaliações M-CHAT pontuadas, por origem (avaliação, lote ou importação).",
+    ["source"],
+)
+
+
+def view_labels(request, view_func):
+    """(view, ação) de uma requisição; a ação das views do DRF vem do método."""
+    method = request.method.lower()
+    cls = getattr(view_func, "cls", None)
+    if cls is None:
+        return f"{view_func.__module__}.{view_func.__name__}", method
+    actions = getattr(view_func, "actions", None) or {}
+    return cls.__name__, actions.get(method, method)
+
+
+def observe_request(view, action, method, status, seconds, queries):
+    method = method if method in METHODS else "OTHER"
+    REQUESTS.labels(view, action, method, status).inc()
+    REQUEST_SECONDS.labels(view, action, method).observe(seconds)
+    REQUEST_QUERIES.labels(view, action).observe(queries)
+
+
+def observe_pdf_render(kind, seconds):
+    PDF_RENDER_SECONDS.labels(kind).observe(seconds)
+
+
+def count_scorings(source, count=1):
+    if count:
+        SCORINGS.labels(source).inc(count)
+
+
+def collect():
+    """Texto no formato de exposição do Prometheus."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
@@ -0,0 +1,181 @@
+"""Instrumentação das requisições: cabeçalho ``Server-Timing`` e métricas.
+
+``ServerTimingMiddleware`` (``SERVER_TIMING=True``) registra a quantidade e o
+tempo das consultas SQL (``db``), a view, a renderização da resposta, o total
+e os trechos marcados com ``span`` (ex.: ``auth`` e ``pdf``). Requisições
+acima de ``SLOW_REQUEST_MS`` vão para o log ``clinical.timing`` com as
+consultas mais lentas. Desligado, o middleware sai da pilha
+(``MiddlewareNotUsed``) e ``span`` só consulta uma ContextVar.
+
+``MetricsMiddleware`` (``METRICS=True``) alimenta ``clinical.metrics``.
+"""
+
+import heapq
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger("clinical.timing")
+
+SLOWEST_QUERIES = 3
+
+_current_timer = ContextVar("request_timer", default=None)
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.1f}"
+
+
+class RequestTimer:
+    def __init__(self):
+        self.spans = {}
+        self.query_count = 0
+        self.query_time = 0.0
+        # heap com as consultas mais lentas: (duração, sql)
+        self.slowest = []
+        self.view_started = None
+
+    def add(self, name, elapsed):
+        self.spans[name] = self.spans.get(name, 0.0) + elapsed
+
+    def __call__(self, execute, sql, params, many, context):
+        # usado em connection.execute_wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.query_count += 1
+            self.query_time += elapsed
+            if len(self.slowest) < SLOWEST_QUERIES:
+                heapq.heappush(self.slowest, (elapsed, sql))
+            else:
+                heapq.heappushpop(self.slowest, (elapsed, sql))
+
+    def header(self, total):
+        entries = [f'db;dur={_ms(self.query_time)};desc="{self.query_count} consultas"']
+        entries.extend(f"{name};dur={_ms(elapsed)}" for name, elapsed in self.spans.items())
+        entries.append(f"total;dur={_ms(total)}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def span(name):
+    """Soma o tempo do bloco à métrica ``name`` da requisição atual, se medida."""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - started)
+
+
+class ServerTimingMiddleware:
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = RequestTimer()
+        token = _current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        total = time.perf_counter() - started
+        if timer.view_started is not None and "view" not in timer.spans:
+            # respostas sem renderização (arquivos, streaming)
+            timer.add("view", time.perf_counter() - timer.view_started)
+
+        response["Server-Timing"] = timer.header(total)
+        if total * 1000 >= settings.SLOW_REQUEST_MS:
+            self.log_slow(request, timer, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timer = _current_timer.get()
+        if timer is not None:
+            timer.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF: a view terminou e a resposta ainda vai ser renderizada
+        timer = _current_timer.get()
+        if timer is None or timer.view_started is None:
+            return response
+        rendering = time.perf_counter()
+        timer.add("view", rendering - timer.view_started)
+
+        def rendered(response):
+            timer.add("render", time.perf_counter() - rendering)
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def log_slow(request, timer, total):
+        slowest = "\n".join(
+            f"  {_ms(elapsed)} ms: {sql[:500]}"
+            for elapsed, sql in sorted(timer.slowest, reverse=True)
+        )
+        logger.warning(
+            "%s %s levou %s ms (%d consultas, %s ms de SQL)\n%s",
+            request.method,
+            request.get_full_path(),
+            _ms(total),
+            timer.query_count,
+            _ms(timer.query_time),
+            slowest,
+        )
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        # requisições sem view (ex.: 404 na resolução da URL) ficam como "none"
+        view, action = getattr(request, "metrics_view", ("none", "none"))
+        metrics.observe_request(
+            view,
+            action,
+            request.method,
+            response.status_code,
+            time.perf_counter() - started,
+            queries.count,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = metrics.view_labels(request, view_func)
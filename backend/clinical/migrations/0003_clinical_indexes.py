@@ -0,0 +1,59 @@
+# Generated by Django 5.0 on 2026-10-17 00:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinical', '0002_sessionrecord'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evaluationmchat',
+            index=models.Index(fields=['patient', '-created_at', '-id'], name='evaluation_patient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evaluationmchat',
+            index=models.Index(fields=['professional', '-created_at', '-id'], name='evaluation_prof_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evaluationmchat',
+            index=models.Index(fields=['is_follow_up', 'created_at', 'risk_level', 'total_score'], name='evaluation_followup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evaluationmchat',
+            index=models.Index(fields=['-created_at', '-id'], name='evaluation_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(condition=models.Q(('archived', False)), fields=['professional', '-created_at', '-id'], name='patient_prof_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(condition=models.Q(('archived', True)), fields=['professional', '-created_at', '-id'], name='patient_prof_archived_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(condition=models.Q(('archived', False)), fields=['-created_at', '-id'], name='patient_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(condition=models.Q(('archived', True)), fields=['-created_at', '-id'], name='patient_archived_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionrecord',
+            index=models.Index(fields=['patient', '-session_date', '-created_at', '-id'], name='session_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionrecord',
+            index=models.Index(fields=['professional', '-session_date', '-created_at', '-id'], name='session_prof_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionrecord',
+            index=models.Index(fields=['-session_date', '-created_at', '-id'], name='session_date_idx'),
+        ),
+    ]
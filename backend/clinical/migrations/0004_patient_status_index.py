@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-17 00:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinical', '0003_clinical_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['professional', 'archived'], name='patient_prof_status_idx'),
+        ),
+    ]
@@ -0,0 +1,128 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_rollups(apps, schema_editor):
+    # cópia da consolidação com o esquema desta migração; clinical.rollups
+    # acompanha o modelo atual e não pode ser usado aqui
+    EvaluationMChat = apps.get_model("clinical", "EvaluationMChat")
+    DashboardRollup = apps.get_model("clinical", "DashboardRollup")
+    base = EvaluationMChat.objects.order_by().annotate(
+        month=TruncMonth("created_at", output_field=DateField())
+    )
+    groups = [
+        (None, base),
+        ("professional_id", base.filter(professional__isnull=False)),
+        # avaliações vistas pelo profissional do paciente, sem contar duas vezes
+        (
+            "patient__professional_id",
+            base.filter(patient__professional__isnull=False).filter(
+                Q(professional__isnull=True) | ~Q(professional=F("patient__professional"))
+            ),
+        ),
+    ]
+    totals = {}
+    for owner, queryset in groups:
+        names = [owner] if owner else []
+        rows = queryset.values(*names, "month", "is_follow_up", "risk_level").annotate(
+            evaluation_count=Count("id"), score_sum=Sum("total_score")
+        )
+        for row in rows:
+            key = (
+                row[owner] if owner else None,
+                row["month"],
+                row["is_follow_up"],
+                row["risk_level"],
+            )
+            count, score = totals.get(key, (0, 0))
+            totals[key] = (count + row["evaluation_count"], score + (row["score_sum"] or 0))
+    DashboardRollup.objects.bulk_create(
+        [
+            DashboardRollup(
+                professional_id=professional_id,
+                month=month,
+                is_follow_up=is_follow_up,
+                risk_level=risk_level,
+                evaluation_count=count,
+                score_sum=score,
+            )
+            for (professional_id, month, is_follow_up, risk_level), (count, score) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinical", "0004_patient_status_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DashboardRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField()),
+                ("is_follow_up", models.BooleanField(default=False)),
+                (
+                    "risk_level",
+                    models.CharField(
+                        choices=[
+                            ("baixo", "Baixo risco"),
+                            ("moderado", "Risco moderado"),
+                            ("alto", "Risco elevado"),
+                        ],
+                        default="baixo",
+                        max_length=12,
+                    ),
+                ),
+                ("evaluation_count", models.PositiveIntegerField(default=0)),
+                ("score_sum", models.PositiveIntegerField(default=0)),
+                (
+                    "professional",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="dashboard_rollups",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Consolidado do painel",
+                "verbose_name_plural": "Consolidados do painel",
+                "ordering": ["month"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="dashboardrollup",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("professional__isnull", False)),
+                fields=("professional", "month", "is_follow_up", "risk_level"),
+                name="rollup_professional_bucket_unique",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dashboardrollup",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("professional__isnull", True)),
+                fields=("month", "is_follow_up", "risk_level"),
+                name="rollup_clinic_bucket_unique",
+            ),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations, models
+
+
+def encode_existing_responses(apps, schema_editor):
+    from clinical.scoring import QUESTION_BITS
+
+    EvaluationMChat = apps.get_model("clinical", "EvaluationMChat")
+    last_id = 0
+    while True:
+        batch = list(
+            EvaluationMChat.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .only("id", "responses")[:2000]
+        )
+        if not batch:
+            break
+        for evaluation in batch:
+            responses = evaluation.responses if isinstance(evaluation.responses, dict) else {}
+            evaluation.responses_bits = sum(
+                bit
+                for code, bit in QUESTION_BITS.items()
+                if str(responses.get(code, "")).lower() in ("sim", "true")
+            )
+        EvaluationMChat.objects.bulk_update(batch, ["responses_bits"])
+        last_id = batch[-1].id
+
+
+def decode_existing_responses(apps, schema_editor):
+    from clinical.scoring import decode_responses
+
+    EvaluationMChat = apps.get_model("clinical", "EvaluationMChat")
+    last_id = 0
+    while True:
+        batch = list(
+            EvaluationMChat.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .only("id", "responses_bits")[:2000]
+        )
+        if not batch:
+            break
+        for evaluation in batch:
+            evaluation.responses = decode_responses(evaluation.responses_bits)
+        EvaluationMChat.objects.bulk_update(batch, ["responses"])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinical", "0005_dashboardrollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="evaluationmchat",
+            name="responses_bits",
+            field=models.PositiveIntegerField(default=0, verbose_name="Respostas M-CHAT"),
+        ),
+        migrations.RunPython(encode_existing_responses, decode_existing_responses),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinical", "0006_evaluation_responses_bits"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="evaluationmchat",
+            name="responses",
+        ),
+    ]
@@ -0,0 +1,70 @@
+from itertools import combinations
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# cópia de clinical.scoring/analytics neste ponto: o bit i de responses_bits é
+# a resposta "sim" da pergunta q{i + 1}
+QUESTION_COUNT = 23
+ALL_MASK = (1 << QUESTION_COUNT) - 1
+# perguntas em que "sim" é a resposta de risco; nas demais, é "não"
+FAILURE_PATTERN = sum(1 << (number - 1) for number in (11, 18, 20, 22))
+CRITICAL_PAIRS = list(combinations((2, 7, 9, 13, 14, 15), 2))
+
+
+def populate_item_counts(apps, schema_editor):
+    # clinical.rollups acompanha o esquema atual e não pode ser usado aqui
+    EvaluationMChat = apps.get_model("clinical", "EvaluationMChat")
+    DashboardRollup = apps.get_model("clinical", "DashboardRollup")
+    totals = {}
+    rows = EvaluationMChat.objects.values(
+        "professional_id",
+        "patient__professional_id",
+        "created_at",
+        "is_follow_up",
+        "risk_level",
+        "responses_bits",
+    )
+    for row in rows.iterator(chunk_size=2000):
+        failed = ~(row["responses_bits"] ^ FAILURE_PATTERN) & ALL_MASK
+        month = timezone.localtime(row["created_at"]).date().replace(day=1)
+        owners = {None, row["professional_id"], row["patient__professional_id"]}
+        for owner in owners:
+            failures, pairs = totals.setdefault(
+                (owner, month, row["is_follow_up"], row["risk_level"]),
+                ([0] * QUESTION_COUNT, [0] * len(CRITICAL_PAIRS)),
+            )
+            for index in range(QUESTION_COUNT):
+                failures[index] += failed >> index & 1
+            for index, (first, second) in enumerate(CRITICAL_PAIRS):
+                pairs[index] += failed >> (first - 1) & failed >> (second - 1) & 1
+
+    # as linhas (e suas contagens) já vêm da 0005; aqui só entram os itens
+    rollups = list(DashboardRollup.objects.all())
+    for rollup in rollups:
+        key = (rollup.professional_id, rollup.month, rollup.is_follow_up, rollup.risk_level)
+        rollup.item_failures, rollup.critical_pairs = totals.get(key, ([], []))
+    DashboardRollup.objects.bulk_update(
+        rollups, ["item_failures", "critical_pairs"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinical", "0007_remove_evaluationmchat_responses"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dashboardrollup",
+            name="critical_pairs",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="dashboardrollup",
+            name="item_failures",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(populate_item_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinical", "0008_rollup_item_counts"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PdfJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("evaluation", "Avaliação M-CHAT"),
+                            ("report", "Relatório clínico"),
+                            ("general", "Relatório geral do paciente"),
+                        ],
+                        max_length=12,
+                    ),
+                ),
+                ("object_id", models.PositiveIntegerField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Na fila"),
+                            ("running", "Em processamento"),
+                            ("done", "Concluído"),
+                            ("failed", "Falhou"),
+                        ],
+                        default="pending",
+                        max_length=12,
+                    ),
+                ),
+                (
+                    "pdf_file",
+                    models.FileField(blank=True, null=True, upload_to="uploads/pdf_jobs/"),
+                ),
+                ("filename", models.CharField(blank=True, max_length=255)),
+                ("error", models.TextField(blank=True)),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "requested_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="pdf_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Geração de PDF",
+                "verbose_name_plural": "Gerações de PDF",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(fields=["status", "created_at"], name="pdfjob_status_idx"),
+                    models.Index(fields=["requested_by", "-created_at"], name="pdfjob_user_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinical", "0009_pdfjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="clinicalreport",
+            name="pdf_digest",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,40 @@
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+MODELS = ("EvaluationMChat", "ClinicalReport", "SessionRecord")
+
+
+def copy_created_at(apps, schema_editor):
+    # registros existentes: a última alteração conhecida é a criação
+    for name in MODELS:
+        apps.get_model("clinical", name).objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinical", "0010_clinicalreport_pdf_digest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="evaluationmchat",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="clinicalreport",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="sessionrecord",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinical", "0011_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pdfjob",
+            name="pdf_content",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
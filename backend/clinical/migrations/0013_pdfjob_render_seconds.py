@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("clinical", "0012_pdfjob_pdf_content"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pdfjob",
+            name="render_seconds",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+    ]
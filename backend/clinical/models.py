@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from django.db import models
 
+from .scoring import decode_responses, encode_responses
+
 User = get_user_model()
 
 
@@ -35,6 +37,32 @@ class Patient(models.Model):
         ordering = ["-created_at"]
         verbose_name = "Paciente"
         verbose_name_plural = "Pacientes"
+        indexes = [
+            models.Index(
+                fields=["professional", "-created_at", "-id"],
+                condition=models.Q(archived=False),
+                name="patient_prof_active_idx",
+            ),
+            models.Index(
+                fields=["professional", "-created_at", "-id"],
+                condition=models.Q(archived=True),
+                name="patient_prof_archived_idx",
+            ),
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(archived=False),
+                name="patient_active_idx",
+            ),
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(archived=True),
+                name="patient_archived_idx",
+            ),
+            models.Index(
+                fields=["professional", "archived"],
+                name="patient_prof_status_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -61,7 +89,8 @@ class EvaluationMChat(models.Model):
         blank=True,
         related_name="evaluations",
     )
-    responses = models.JSONField(default=dict)
+    # bit N-1 ligado = resposta "sim" para a pergunta qN (ver clinical.scoring)
+    responses_bits = models.PositiveIntegerField("Respostas M-CHAT", default=0)
     observations = models.TextField(blank=True)
     total_score = models.PositiveSmallIntegerField(
         validators=[MinValueValidator(0)]
@@ -73,15 +102,39 @@ class EvaluationMChat(models.Model):
     follow_up_recommendations = models.TextField(blank=True)
     is_follow_up = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "Avaliação M-CHAT"
         verbose_name_plural = "Avaliações M-CHAT"
+        indexes = [
+            models.Index(
+                fields=["patient", "-created_at", "-id"],
+                name="evaluation_patient_idx",
+            ),
+            models.Index(
+                fields=["professional", "-created_at", "-id"],
+                name="evaluation_prof_idx",
+            ),
+            models.Index(
+                fields=["is_follow_up", "created_at", "risk_level", "total_score"],
+                name="evaluation_followup_idx",
+            ),
+            models.Index(fields=["-created_at", "-id"], name="evaluation_created_idx"),
+        ]
 
     def __str__(self):
         return f"Avaliação {self.created_at:%d/%m/%Y} - {self.patient.name}"
 
+    @property
+    def responses(self):
+        return decode_responses(self.responses_bits)
+
+    @responses.setter
+    def responses(self, value):
+        self.responses_bits = encode_responses(value)
+
 
 class ClinicalReport(models.Model):
     evaluation = models.ForeignKey(
@@ -94,9 +147,12 @@ class ClinicalReport(models.Model):
     pdf_file = models.FileField(
         upload_to="uploads/generated_reports/", blank=True, null=True
     )
+    # chave do cache de PDF (pdf_cache.pdf_digest) do arquivo em pdf_file
+    pdf_digest = models.CharField(max_length=64, blank=True)
     health_equipment_notes = models.TextField(blank=True)
     periodic_review_notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
@@ -139,11 +195,135 @@ class SessionRecord(models.Model):
     family_guidance = models.TextField(blank=True)
     next_steps = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-session_date", "-created_at"]
         verbose_name = "Registro de sessão"
         verbose_name_plural = "Registros de sessões"
+        indexes = [
+            models.Index(
+                fields=["patient", "-session_date", "-created_at", "-id"],
+                name="session_patient_date_idx",
+            ),
+            models.Index(
+                fields=["professional", "-session_date", "-created_at", "-id"],
+                name="session_prof_date_idx",
+            ),
+            models.Index(
+                fields=["-session_date", "-created_at", "-id"],
+                name="session_date_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Sessão {self.session_date:%d/%m/%Y} - {self.patient.name}"
+
+
+class DashboardRollup(models.Model):
+    """Contagens mensais de avaliações visíveis a cada profissional.
+
+    Linhas com ``professional`` nulo guardam os totais da clínica inteira.
+    ``item_failures`` segue a ordem das perguntas do M-CHAT e
+    ``critical_pairs`` a de ``analytics.CRITICAL_PAIRS``.
+    """
+
+    professional = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="dashboard_rollups",
+    )
+    month = models.DateField()
+    is_follow_up = models.BooleanField(default=False)
+    risk_level = models.CharField(
+        max_length=12,
+        choices=EvaluationMChat.RISK_CHOICES,
+        default=EvaluationMChat.RISK_LOW,
+    )
+    evaluation_count = models.PositiveIntegerField(default=0)
+    score_sum = models.PositiveIntegerField(default=0)
+    item_failures = models.JSONField(default=list, blank=True)
+    critical_pairs = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        ordering = ["month"]
+        verbose_name = "Consolidado do painel"
+        verbose_name_plural = "Consolidados do painel"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["professional", "month", "is_follow_up", "risk_level"],
+                condition=models.Q(professional__isnull=False),
+                name="rollup_professional_bucket_unique",
+            ),
+            models.UniqueConstraint(
+                fields=["month", "is_follow_up", "risk_level"],
+                condition=models.Q(professional__isnull=True),
+                name="rollup_clinic_bucket_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%m/%Y} - {self.professional or 'Clínica'}"
+
+
+class PdfJob(models.Model):
+    """Geração de PDF enfileirada para o worker (``manage.py run_pdf_worker``)."""
+
+    KIND_EVALUATION = "evaluation"
+    KIND_REPORT = "report"
+    KIND_GENERAL = "general"
+    KIND_CHOICES = [
+        (KIND_EVALUATION, "Avaliação M-CHAT"),
+        (KIND_REPORT, "Relatório clínico"),
+        (KIND_GENERAL, "Relatório geral do paciente"),
+    ]
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Na fila"),
+        (STATUS_RUNNING, "Em processamento"),
+        (STATUS_DONE, "Concluído"),
+        (STATUS_FAILED, "Falhou"),
+    ]
+
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    # avaliação, relatório ou paciente, conforme ``kind``
+    object_id = models.PositiveIntegerField()
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="pdf_jobs",
+    )
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # jobs antigos: arquivo em MEDIA_ROOT, que o worker não compartilha com o web
+    pdf_file = models.FileField(upload_to="uploads/pdf_jobs/", blank=True, null=True)
+    # PDF gerado, gravado no banco pelo worker (serviço separado, sem disco em comum)
+    pdf_content = models.BinaryField(null=True, blank=True, editable=False)
+    # tempo de desenho no worker, até ser registrado nas métricas do web
+    # (jobs.observe_worker_renders); vazio quando o PDF veio do cache
+    render_seconds = models.FloatField(null=True, blank=True, editable=False)
+    filename = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Geração de PDF"
+        verbose_name_plural = "Gerações de PDF"
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="pdfjob_status_idx"),
+            models.Index(fields=["requested_by", "-created_at"], name="pdfjob_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id} ({self.get_status_display()})"
@@ -0,0 +1,129 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Paginação por cursor usando todos os campos da ordenação como chave.
+
+    O cursor guarda os valores de cada campo da ordenação do último (ou
+    primeiro) item da página, e a próxima página é obtida com um filtro
+    ``(a, b, id) < (x, y, z)`` em vez de OFFSET, mantendo o custo constante
+    em qualquer profundidade.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = bool(self.cursor and self.cursor.reverse)
+        if self.cursor is not None:
+            queryset = queryset.filter(
+                self._keyset_filter(
+                    self._decode_position(self.cursor.position, queryset.model), reverse
+                )
+            )
+
+        if reverse:
+            ordering = [self._invert(field) for field in self.ordering]
+        else:
+            ordering = list(self.ordering)
+
+        results = list(queryset.order_by(*ordering)[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        if self.has_next or self.has_previous:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        position = self._encode_position(self.page[-1])
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._encode_position(self.page[0])
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    def _keyset_filter(self, values, reverse):
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith("-") != reverse
+            name = field.lstrip("-")
+            clause = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[index]})
+            for previous, value in zip(self.ordering[:index], values):
+                clause &= Q(**{previous.lstrip("-"): value})
+            condition |= clause
+        return condition
+
+    def _encode_position(self, instance):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return json.dumps(values, separators=(",", ":"))
+
+    def _decode_position(self, position, model):
+        try:
+            values = json.loads(position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        decoded = []
+        for field, value in zip(self.ordering, values):
+            # o cursor vem do cliente: cada valor precisa ser válido para o seu campo,
+            # e NULL não tem como entrar na comparação do filtro
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                decoded.append(model._meta.get_field(field.lstrip("-")).to_python(value))
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return decoded
+
+
+class PatientCursorPagination(KeysetCursorPagination):
+    ordering = ("-created_at", "-id")
+
+
+class EvaluationCursorPagination(KeysetCursorPagination):
+    ordering = ("-created_at", "-id")
+
+
+class SessionCursorPagination(KeysetCursorPagination):
+    ordering = ("-session_date", "-created_at", "-id")
+
+
+class PdfJobCursorPagination(KeysetCursorPagination):
+    ordering = ("-created_at", "-id")
@@ -0,0 +1,408 @@
+"""Renderização dos PDFs clínicos.
+
+Cada documento é gerado em duas etapas: ``*_context`` lê os objetos do banco
+e devolve um dicionário apenas com textos e números, e ``render_*`` desenha o
+PDF a partir desse dicionário. A segunda etapa não acessa o Django, então pode
+rodar em outro processo (ver ``clinical.jobs``). No relatório geral, as
+avaliações e sessões ficam em ``Rows`` e só são lidas durante o desenho;
+``materialize`` as transforma em listas antes de sair do processo.
+"""
+
+import time
+from functools import lru_cache
+from io import BytesIO
+
+from reportlab.lib.colors import HexColor
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from .constants import RISK_LABELS
+
+# altere ao mudar o layout para invalidar os PDFs em cache
+TEMPLATE_VERSION = "1"
+
+
+def to_ascii(value):
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        value = str(value)
+    try:
+        return value.encode("latin-1", "ignore").decode("latin-1")
+    except Exception:
+        return value
+
+
+@lru_cache(maxsize=8192)
+def word_width(word, font, size):
+    return stringWidth(word, font, size)
+
+
+def wrap_lines(text, width, font, size):
+    """Quebra o texto em linhas de até ``width`` pontos.
+
+    A largura de cada palavra é medida uma vez (e memorizada por fonte e
+    tamanho); a linha é somada palavra a palavra com a largura do espaço,
+    sem medir de novo a linha inteira.
+    """
+    space = word_width(" ", font, size)
+    lines = []
+    for paragraph in text.split("\n"):
+        current = []
+        current_width = 0
+        for word in paragraph.split():
+            measure = word_width(word, font, size)
+            if not current:
+                current, current_width = [word], measure
+            elif current_width + space + measure <= width:
+                current.append(word)
+                current_width += space + measure
+            else:
+                lines.append(" ".join(current))
+                current, current_width = [word], measure
+        lines.append(" ".join(current))
+    return lines
+
+
+class PageLayout:
+    """Documento A4 com cabeçalho e rodapé fixos e texto que flui entre páginas.
+
+    Cabeçalho e rodapé são desenhados uma única vez num form XObject e apenas
+    referenciados em cada página; as seções quebram de página sozinhas quando
+    o texto alcança a margem inferior.
+    """
+
+    width, height = A4
+    margin = 25 * mm
+    header_height = 28 * mm
+    template = "page_template"
+
+    def __init__(self, title, subtitle, footer, footer_size=9, output=None):
+        self.output = output
+        self.buffer = BytesIO() if output is None else output
+        self.pdf = canvas.Canvas(self.buffer, pagesize=A4)
+        self.content_width = self.width - 2 * self.margin
+        self.top = self.height - self.margin - self.header_height - 15
+        self._define_template(title, subtitle, footer, footer_size)
+        self._start_page()
+
+    def _define_template(self, title, subtitle, footer, footer_size):
+        pdf = self.pdf
+        margin = self.margin
+        pdf.beginForm(self.template)
+        pdf.saveState()
+        pdf.setFillColor(HexColor("#1d4ed8"))
+        pdf.roundRect(
+            margin - 4 * mm,
+            self.height - self.header_height - margin / 2,
+            self.width - 2 * (margin - 4 * mm),
+            self.header_height,
+            6 * mm,
+            fill=True,
+            stroke=False,
+        )
+        pdf.setFillColor("#ffffff")
+        pdf.setFont("Helvetica-Bold", 15)
+        pdf.drawString(margin, self.height - margin, title)
+        pdf.setFont("Helvetica", 10)
+        pdf.drawString(margin, self.height - margin - 14, subtitle)
+        pdf.setFont("Helvetica", footer_size)
+        pdf.setFillColor(HexColor("#6b7280"))
+        pdf.drawString(margin, margin / 2, footer)
+        pdf.restoreState()
+        pdf.endForm()
+
+    def _start_page(self):
+        self.pdf.doForm(self.template)
+        self.y = self.top
+
+    def page_break(self):
+        self.pdf.showPage()
+        self._start_page()
+
+    def _room(self, height):
+        return self.y - height >= self.margin
+
+    def heading(self, text):
+        # o título não fica sozinho no fim da página
+        if not self._room(16 + 14):
+            self.page_break()
+        self.pdf.setFont("Helvetica-Bold", 12)
+        self.pdf.drawString(self.margin, self.y, text)
+        self.y -= 16
+
+    def paragraph(self, text, line_height=14, gap=8, keep_together=False):
+        font, size = "Helvetica", 11
+        lines = wrap_lines(to_ascii(text), self.content_width, font, size)
+        block = len(lines) * line_height
+        if keep_together and not self._room(block) and block <= self.top - self.margin:
+            self.page_break()
+        self.pdf.setFont(font, size)
+        for line in lines:
+            if self.y < self.margin:
+                self.page_break()
+                self.pdf.setFont(font, size)
+            self.pdf.drawString(self.margin, self.y, line)
+            self.y -= line_height
+        self.y -= gap
+
+    def section(self, title, text, line_height=14, gap=8):
+        self.heading(title)
+        self.paragraph(text, line_height, gap)
+
+    def save(self):
+        """Finaliza o PDF; devolve os bytes quando não há ``output``."""
+        self.pdf.showPage()
+        self.pdf.save()
+        if self.output is None:
+            return self.buffer.getvalue()
+
+
+def evaluation_context(evaluation):
+    patient = evaluation.patient
+    return {
+        "filename": f"avaliacao_{patient.id}_{evaluation.created_at:%Y%m%d%H%M}.pdf",
+        "patient_name": patient.name,
+        "professional": str(evaluation.professional or "Não atribuído"),
+        "created_at": f"{evaluation.created_at:%d/%m/%Y}",
+        "total_score": evaluation.total_score,
+        "risk_label": RISK_LABELS.get(evaluation.risk_level),
+        "clinical_interpretation": evaluation.clinical_interpretation,
+        "observations": evaluation.observations,
+        "follow_up_recommendations": evaluation.follow_up_recommendations,
+    }
+
+
+def report_context(report, now):
+    evaluation = report.evaluation
+    patient = evaluation.patient
+    return {
+        "filename": f"relatorio_{patient.id}_{now:%Y%m%d%H%M}.pdf",
+        "patient_name": patient.name,
+        "birth_date": f"{patient.birth_date:%d/%m/%Y}",
+        "guardian_name": patient.guardian_name,
+        "contact": patient.contact,
+        "professional": str(evaluation.professional or "Não atribuído"),
+        "created_at": f"{evaluation.created_at:%d/%m/%Y}",
+        "total_score": evaluation.total_score,
+        "risk_label": RISK_LABELS.get(evaluation.risk_level),
+        "clinical_interpretation": evaluation.clinical_interpretation,
+        "observations": evaluation.observations,
+        "follow_up_recommendations": evaluation.follow_up_recommendations,
+        "content": report.content,
+        "periodic_review_notes": report.periodic_review_notes,
+        "health_equipment_notes": report.health_equipment_notes,
+    }
+
+
+def evaluation_row(evaluation):
+    return {
+        "created_at": f"{evaluation.created_at:%d/%m/%Y %H:%M}",
+        "total_score": evaluation.total_score,
+        "risk_label": RISK_LABELS.get(evaluation.risk_level, evaluation.risk_level),
+        "is_follow_up": evaluation.is_follow_up,
+        "clinical_interpretation": evaluation.clinical_interpretation,
+    }
+
+
+def session_row(session):
+    return {
+        "session_date": f"{session.session_date:%d/%m/%Y}",
+        "session_type": session.get_session_type_display(),
+        "objectives": session.objectives,
+        "interventions": session.interventions,
+        "family_guidance": session.family_guidance,
+        "next_steps": session.next_steps,
+    }
+
+
+class Rows:
+    """Linhas de um queryset lidas em blocos a cada iteração, sem guardar os objetos.
+
+    Cada passagem (o hash do cache e depois o desenho do PDF) faz uma nova
+    consulta com ``iterator()``. Para enviar o contexto a outro processo, use
+    ``materialize``.
+    """
+
+    chunk_size = 500
+
+    def __init__(self, queryset, row):
+        self.queryset = queryset
+        self.row = row
+
+    def __iter__(self):
+        return map(self.row, self.queryset.iterator(chunk_size=self.chunk_size))
+
+    def __reduce__(self):
+        # ler o banco durante o pickle (na thread do pool) seria um erro silencioso
+        raise TypeError("Use pdf.materialize(context) antes de enviar o contexto.")
+
+
+def materialize(context):
+    """Cópia do contexto com as linhas em listas, para o pool de processos."""
+    return {
+        key: list(value) if isinstance(value, Rows) else value for key, value in context.items()
+    }
+
+
+def general_report_context(patient, evaluations, sessions, now):
+    """Contexto do relatório geral; ``evaluations`` e ``sessions`` são querysets."""
+    return {
+        "filename": f"relatorio-geral_{patient.id}_{now:%Y%m%d%H%M}.pdf",
+        "patient_name": patient.name,
+        "birth_date": f"{patient.birth_date:%d/%m/%Y}",
+        "guardian_name": patient.guardian_name,
+        "contact": patient.contact,
+        "evaluations": Rows(evaluations, evaluation_row),
+        "sessions": Rows(sessions, session_row),
+    }
+
+
+def render_evaluation(context, output=None):
+    layout = PageLayout(
+        "Plataforma Diagnóstica TEA – M-CHAT",
+        "Resultado da avaliação M-CHAT conforme Protocolo TEA-SP (2013)",
+        "Documento gerado automaticamente. Utilize este relatório para apoio à tomada de decisão clínica.",
+        footer_size=10,
+        output=output,
+    )
+    layout.section(
+        "Dados da avaliação",
+        (
+            f"Paciente: {context['patient_name']}\n"
+            f"Profissional responsável: {context['professional']}\n"
+            f"Data da avaliação: {context['created_at']}\n"
+            f"Pontuação total: {context['total_score']}\n"
+            f"Classificação de risco: {context['risk_label']}"
+        ),
+        line_height=15,
+        gap=10,
+    )
+    layout.section("Interpretação clínica", context["clinical_interpretation"])
+    layout.section(
+        "Observações clínicas", context["observations"] or "Sem observações registradas."
+    )
+    if context["follow_up_recommendations"]:
+        layout.section("Recomendações", context["follow_up_recommendations"])
+    return layout.save()
+
+
+def render_report(context, output=None):
+    layout = PageLayout(
+        "Plataforma Diagnóstica TEA – M-CHAT",
+        "Relatório clínico com base no Protocolo TEA-SP (Estado de São Paulo, 2013)",
+        "Gerado automaticamente pela Plataforma Diagnóstica TEA – M-CHAT. Uso restrito a profissionais autorizados.",
+        output=output,
+    )
+    layout.section(
+        "Dados do paciente",
+        (
+            f"Nome: {context['patient_name']}\n"
+            f"Data de nascimento: {context['birth_date']}\n"
+            f"Responsável: {context['guardian_name']}\n"
+            f"Contato: {context['contact'] or 'Não informado'}\n"
+            f"Profissional responsável: {context['professional']}"
+        ),
+        line_height=15,
+        gap=10,
+    )
+    layout.section(
+        "Avaliação M-CHAT",
+        (
+            f"Data da avaliação: {context['created_at']}\n"
+            f"Pontuação total: {context['total_score']}\n"
+            f"Classificação de risco: {context['risk_label']}"
+        ),
+        line_height=15,
+    )
+    layout.section("Interpretação clínica", context["clinical_interpretation"])
+    layout.section("Observações", context["observations"] or "Sem observações adicionais.")
+    layout.section(
+        "Recomendações",
+        context["follow_up_recommendations"] or "Acompanhar em consultas regulares.",
+    )
+    layout.section("Contexto clínico adicional", context["content"])
+    if context["periodic_review_notes"]:
+        layout.section(
+            "Reavaliações periódicas (Protocolo TEA-SP, seção 9)",
+            context["periodic_review_notes"],
+        )
+    if context["health_equipment_notes"]:
+        layout.section(
+            "Equipamentos de saúde de referência (Protocolo TEA-SP, seção 10)",
+            context["health_equipment_notes"],
+        )
+    return layout.save()
+
+
+def render_general_report(context, output=None):
+    layout = PageLayout(
+        "Relatorio geral do paciente",
+        "Sintese diagnostica e registros de acompanhamento (Protocolo TEA-SP)",
+        "Documento automatizado. Utilize este relatorio para apoiar reunioes multiprofissionais.",
+        output=output,
+    )
+    layout.section(
+        "Dados do paciente",
+        (
+            f"Nome: {context['patient_name']}\n"
+            f"Data de nascimento: {context['birth_date']}\n"
+            f"Responsavel: {context['guardian_name']}\n"
+            f"Contato: {context['contact'] or 'Nao informado'}"
+        ),
+        line_height=15,
+    )
+
+    layout.heading("Resumo das avaliacoes M-CHAT")
+    evaluation = None
+    for evaluation in context["evaluations"]:
+        layout.paragraph(
+            (
+                f"Data: {evaluation['created_at']}\n"
+                f"Pontuacao: {evaluation['total_score']} | Risco: {evaluation['risk_label']}\n"
+                f"Reavaliacao: {'Sim' if evaluation['is_follow_up'] else 'Nao'}\n"
+                f"Interpretacao: {evaluation['clinical_interpretation']}"
+            ),
+            gap=10,
+            keep_together=True,
+        )
+    if evaluation is None:
+        layout.paragraph("Nenhuma avaliacao registrada.")
+
+    layout.heading("Resumo das sessoes clinicas")
+    session = None
+    for session in context["sessions"]:
+        layout.paragraph(
+            (
+                f"Data: {session['session_date']} | Tipo: {session['session_type']}\n"
+                f"Objetivos: {session['objectives'] or 'Nao informado'}\n"
+                f"Intervencoes: {session['interventions'] or 'Nao informado'}\n"
+                f"Orientacao familiar: {session['family_guidance'] or 'Nao informado'}\n"
+                f"Proximos passos: {session['next_steps'] or 'Nao informado'}"
+            ),
+            gap=10,
+            keep_together=True,
+        )
+    if session is None:
+        layout.paragraph("Nenhuma sessao registrada.")
+    return layout.save()
+
+
+RENDERERS = {
+    "evaluation": render_evaluation,
+    "report": render_report,
+    "general": render_general_report,
+}
+
+
+def render(kind, context, output=None):
+    return RENDERERS[kind](context, output)
+
+
+def render_timed(kind, context):
+    """(PDF, segundos) para o processo principal registrar o tempo de um pool."""
+    started = time.perf_counter()
+    content = render(kind, context)
+    return content, time.perf_counter() - started
@@ -0,0 +1,213 @@
+"""Cache em disco dos PDFs gerados, endereçado pelo conteúdo.
+
+A chave é o SHA-256 dos dados usados na renderização (o dicionário de
+``clinical.pdf.*_context``, sem o nome do arquivo) junto com o tipo do
+documento e ``pdf.TEMPLATE_VERSION``; a mesma chave serve de ETag. Quando o
+diretório passa de ``PDF_CACHE_MAX_BYTES``, os arquivos usados há mais tempo
+são removidos até sobrar ``EVICT_TO`` do limite. Cada processo acompanha uma
+estimativa do tamanho do diretório e só o percorre quando ela passa do
+limite; o que outros processos gravaram entra na conta nessa varredura.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import pdf
+from .metrics import observe_pdf_render
+
+EVICT_TO = 0.9
+# diretório -> bytes estimados neste processo
+_sizes = {}
+_sizes_lock = threading.Lock()
+
+
+class _HashedRows:
+    """Repassa as linhas e guarda o hash da última passagem completa por elas."""
+
+    def __init__(self, rows, encoder):
+        self.rows = rows
+        self.encoder = encoder
+        self.hexdigest = None
+
+    def __iter__(self):
+        digest = hashlib.sha256()
+        for row in self.rows:
+            digest.update(self.encoder.encode(row).encode("utf-8") + b"\n")
+            yield row
+        self.hexdigest = digest.hexdigest()
+
+
+def _hashed(context):
+    encoder = DjangoJSONEncoder(sort_keys=True, ensure_ascii=False)
+    return {
+        key: _HashedRows(value, encoder) if isinstance(value, (list, pdf.Rows)) else value
+        for key, value in context.items()
+    }
+
+
+def _combine(kind, hashed):
+    # as linhas entram pelo hash de cada lista, calculado enquanto eram lidas
+    fields = {}
+    for key, value in hashed.items():
+        if key == "filename":
+            continue
+        if isinstance(value, _HashedRows):
+            if value.hexdigest is None:
+                raise RuntimeError(f"As linhas de {key!r} não foram lidas até o fim.")
+            value = value.hexdigest
+        fields[key] = value
+    encoder = DjangoJSONEncoder(sort_keys=True, ensure_ascii=False)
+    payload = encoder.encode([pdf.TEMPLATE_VERSION, kind, fields])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def pdf_digest(kind, context):
+    # linha a linha, sem montar a lista (``Rows`` é lida do banco aqui)
+    hashed = _hashed(context)
+    for value in hashed.values():
+        if isinstance(value, _HashedRows):
+            for _ in value:
+                pass
+    return _combine(kind, hashed)
+
+
+class PdfCache:
+    suffix = ".pdf"
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def _path(self, digest):
+        return self.directory / digest[:2] / f"{digest}{self.suffix}"
+
+    def open(self, digest):
+        path = self._path(digest)
+        try:
+            handle = path.open("rb")
+        except FileNotFoundError:
+            return None
+        # a data de modificação marca o último uso para a remoção LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return handle
+
+    def get(self, digest):
+        handle = self.open(digest)
+        if handle is None:
+            return None
+        with handle:
+            return handle.read()
+
+    def store(self, digest, write):
+        """Grava o PDF produzido por ``write(arquivo)`` e devolve-o aberto para leitura.
+
+        O arquivo é escrito num temporário e renomeado, para nunca expor um
+        PDF pela metade; o descritor devolvido continua válido mesmo que o
+        arquivo seja removido do cache logo em seguida. ``digest`` pode ser
+        uma função, chamada depois de ``write``, quando a chave é calculada
+        durante a renderização.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as output:
+                write(output)
+            path = self._path(digest() if callable(digest) else digest)
+            path.parent.mkdir(exist_ok=True)
+            reader = open(temp_path, "rb")
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        os.replace(temp_path, path)
+        self._account(os.fstat(reader.fileno()).st_size)
+        return reader
+
+    def put(self, digest, content):
+        self.store(digest, lambda output: output.write(content)).close()
+
+    def _account(self, size):
+        key = str(self.directory)
+        with _sizes_lock:
+            total = _sizes.get(key)
+            if total is not None and total + size <= self.max_bytes:
+                _sizes[key] = total + size
+                return
+            # primeira gravação do processo ou estimativa acima do limite
+            _sizes[key] = self.evict()
+
+    def evict(self):
+        """Remove os PDFs usados há mais tempo; devolve o total que restou."""
+        entries = []
+        total = 0
+        for path in self.directory.glob(f"*/*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return total
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+
+def get_cache():
+    return PdfCache(settings.PDF_CACHE_DIR, settings.PDF_CACHE_MAX_BYTES)
+
+
+def cached_file(kind, context, digest=None):
+    """Devolve (digest, arquivo aberto); o PDF é renderizado direto no disco.
+
+    Num PDF novo, a chave é recalculada com as linhas que o renderizador leu,
+    pois ``Rows`` consulta o banco de novo e os dados podem ter mudado desde
+    ``digest``; o arquivo fica sempre sob o hash do que ele mostra.
+    """
+    digest = digest or pdf_digest(kind, context)
+    cache = get_cache()
+    handle = cache.open(digest)
+    if handle is None:
+        hashed = _hashed(context)
+        started = time.perf_counter()
+        handle = cache.store(
+            lambda: _combine(kind, hashed), lambda output: pdf.render(kind, hashed, output)
+        )
+        observe_pdf_render(kind, time.perf_counter() - started)
+        digest = _combine(kind, hashed)
+    return digest, handle
+
+
+def cached_render(kind, context, digest=None, observe=observe_pdf_render):
+    """Devolve (digest, conteúdo), renderizando só quando não está em cache.
+
+    Como em ``cached_file``, um PDF novo é guardado sob o hash das linhas que
+    ele mostra. ``observe(kind, segundos)`` recebe o tempo de desenho.
+    """
+    digest = digest or pdf_digest(kind, context)
+    cache = get_cache()
+    content = cache.get(digest)
+    if content is None:
+        hashed = _hashed(context)
+        content, seconds = pdf.render_timed(kind, hashed)
+        observe(kind, seconds)
+        digest = _combine(kind, hashed)
+        cache.put(digest, content)
+    return digest, content
@@ -0,0 +1,259 @@
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .analytics import add_counts, evaluation_item_counts, item_aggregates, item_counts
+from .models import DashboardRollup, EvaluationMChat
+
+
+def subtract_months(base, months):
+    year = base.year
+    month = base.month - months
+    while month <= 0:
+        month += 12
+        year -= 1
+    return date(year, month, 1)
+
+
+def next_month(start):
+    if start.month == 12:
+        return date(start.year + 1, 1, 1)
+    return date(start.year, start.month + 1, 1)
+
+
+def month_of(moment):
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+CONTRIBUTION_FIELDS = (
+    "professional_id",
+    "patient__professional_id",
+    "created_at",
+    "is_follow_up",
+    "risk_level",
+    "total_score",
+    "responses_bits",
+)
+
+
+def evaluation_contribution(row):
+    """Buckets do consolidado que uma avaliação soma, com (1, pontos, falhas, pares).
+
+    ``row`` traz os campos de ``CONTRIBUTION_FIELDS``. A avaliação conta no
+    consolidado da clínica (profissional ``None``), no do seu profissional e
+    no do profissional do paciente, uma vez por profissional.
+    """
+    month = month_of(row["created_at"])
+    failures, pairs = evaluation_item_counts(row["responses_bits"])
+    owners = {None, row["professional_id"], row["patient__professional_id"]}
+    return {
+        (owner, month, row["is_follow_up"], row["risk_level"]): (
+            1,
+            row["total_score"],
+            failures,
+            pairs,
+        )
+        for owner in owners
+    }
+
+
+def stored_contribution(evaluation_id):
+    row = EvaluationMChat.objects.filter(pk=evaluation_id).values(*CONTRIBUTION_FIELDS).first()
+    return {} if row is None else evaluation_contribution(row)
+
+
+def merge(deltas, buckets, sign=1):
+    """Acumula ``buckets`` (somados ou, com ``sign=-1``, subtraídos) em ``deltas``."""
+    for key, (count, score, failures, pairs) in buckets.items():
+        total = deltas.get(key, EMPTY_BUCKET)
+        deltas[key] = (
+            total[0] + sign * count,
+            total[1] + sign * score,
+            add_counts(total[2], [sign * value for value in failures]),
+            add_counts(total[3], [sign * value for value in pairs]),
+        )
+    return deltas
+
+
+def patient_reassignment(changes):
+    """Diferenças no consolidado para pacientes que trocaram de profissional.
+
+    ``changes`` mapeia o id do paciente para (profissional anterior, atual).
+    Só mudam as avaliações que cada um enxerga através do paciente, isto é,
+    as que ele não registrou.
+    """
+    deltas = {}
+    grouped = _aggregate(
+        EvaluationMChat.objects.filter(patient_id__in=changes),
+        ["patient_id", "professional_id"],
+        items=True,
+    )
+    for (patient_id, professional_id, *bucket), value in grouped.items():
+        previous_id, current_id = changes[patient_id]
+        for owner, sign in ((previous_id, -1), (current_id, 1)):
+            if owner is not None and owner != professional_id:
+                merge(deltas, {(owner, *bucket): value}, sign)
+    return deltas
+
+
+def _lock_order(key):
+    # ordem fixa entre transações concorrentes, para não haver deadlock
+    owner, month, is_follow_up, risk_level = key
+    return (owner is not None, owner or 0, month, is_follow_up, risk_level)
+
+
+def apply_deltas(deltas):
+    """Soma as diferenças às linhas do consolidado, sem reler as avaliações.
+
+    Cada linha é travada (``select_for_update``) e atualizada com ``F()``;
+    linhas que chegam a zero são removidas, como no ``rebuild_rollups``.
+    """
+    for key in sorted(deltas, key=_lock_order):
+        count, score, failures, pairs = deltas[key]
+        if not count and not score and not any(failures) and not any(pairs):
+            continue
+        professional_id, month, is_follow_up, risk_level = key
+        lookup = {
+            "professional_id": professional_id,
+            "month": month,
+            "is_follow_up": is_follow_up,
+            "risk_level": risk_level,
+        }
+        for attempt in range(2):
+            try:
+                with transaction.atomic():
+                    row = DashboardRollup.objects.select_for_update().filter(**lookup).first()
+                    if row is None:
+                        # sem linha e com saldo negativo o consolidado já divergia;
+                        # o rebuild_dashboard_rollups corrige
+                        if count > 0:
+                            DashboardRollup.objects.create(
+                                **lookup,
+                                evaluation_count=count,
+                                score_sum=score,
+                                item_failures=failures,
+                                critical_pairs=pairs,
+                            )
+                    elif row.evaluation_count + count <= 0:
+                        row.delete()
+                    else:
+                        DashboardRollup.objects.filter(pk=row.pk).update(
+                            evaluation_count=F("evaluation_count") + count,
+                            score_sum=F("score_sum") + score,
+                            item_failures=add_counts(row.item_failures, failures),
+                            critical_pairs=add_counts(row.critical_pairs, pairs),
+                        )
+                break
+            except IntegrityError:
+                # outra transação criou a mesma linha ao mesmo tempo; aplica sobre ela
+                if attempt:
+                    raise
+
+
+def _aggregate(queryset, fields, items):
+    """Agrupa ``queryset`` por ``fields`` seguidos de (mês, reavaliação, risco).
+
+    Cada chave mapeia para (total, soma, falhas por item, pares críticos);
+    com ``items=False`` as listas ficam vazias.
+    """
+    metrics = {"evaluation_count": Count("id"), "score_sum": Sum("total_score")}
+    if items:
+        metrics.update(item_aggregates())
+    names = [*fields, "month", "is_follow_up", "risk_level"]
+    queryset = queryset.order_by().annotate(
+        month=TruncMonth("created_at", output_field=DateField())
+    )
+    totals = {}
+    for row in queryset.values(*names).annotate(**metrics):
+        failures, pairs = item_counts(row, row["evaluation_count"]) if items else ([], [])
+        totals[tuple(row[name] for name in names)] = (
+            row["evaluation_count"],
+            row["score_sum"] or 0,
+            failures,
+            pairs,
+        )
+    return totals
+
+
+def compute_rollups(evaluation_model=EvaluationMChat, items=True):
+    """Consolida todas as avaliações por (prof, mês, reavaliação, risco).
+
+    Cada chave mapeia para (total, soma, falhas por item, pares críticos);
+    com ``items=False`` as listas ficam vazias.
+    """
+    base = evaluation_model.objects.all()
+    groups = [
+        (None, base),
+        ("professional_id", base.filter(professional__isnull=False)),
+        # avaliações vistas pelo profissional do paciente, sem contar duas vezes
+        (
+            "patient__professional_id",
+            base.filter(patient__professional__isnull=False).filter(
+                Q(professional__isnull=True) | ~Q(professional=F("patient__professional"))
+            ),
+        ),
+    ]
+    totals = {}
+    for owner, queryset in groups:
+        grouped = _aggregate(queryset, [owner] if owner else [], items)
+        if owner is None:
+            grouped = {(None, *key): value for key, value in grouped.items()}
+        merge(totals, grouped)
+    return totals
+
+
+def stored_rollups():
+    return {
+        (row.professional_id, row.month, row.is_follow_up, row.risk_level): (
+            row.evaluation_count,
+            row.score_sum,
+            row.item_failures,
+            row.critical_pairs,
+        )
+        for row in DashboardRollup.objects.all()
+    }
+
+
+@transaction.atomic
+def rebuild_rollups(
+    batch_size=1000,
+    evaluation_model=EvaluationMChat,
+    rollup_model=DashboardRollup,
+    items=True,
+):
+    rollup_model.objects.all().delete()
+    rows = []
+    for key, (count, score, failures, pairs) in compute_rollups(
+        evaluation_model, items
+    ).items():
+        professional_id, month, is_follow_up, risk_level = key
+        row = rollup_model(
+            professional_id=professional_id,
+            month=month,
+            is_follow_up=is_follow_up,
+            risk_level=risk_level,
+            evaluation_count=count,
+            score_sum=score,
+        )
+        if items:
+            row.item_failures = failures
+            row.critical_pairs = pairs
+        rows.append(row)
+    rollup_model.objects.bulk_create(rows, batch_size=batch_size)
+
+
+EMPTY_BUCKET = (0, 0, [], [])
+
+
+def verify_rollups():
+    """Retorna as divergências entre o consolidado salvo e as avaliações."""
+    expected = compute_rollups()
+    stored = stored_rollups()
+    return [
+        (key, stored.get(key, EMPTY_BUCKET), expected.get(key, EMPTY_BUCKET))
+        for key in sorted(set(expected) | set(stored), key=str)
+        if stored.get(key) != expected.get(key)
+    ]
@@ -0,0 +1,150 @@
+"""Listagens montadas direto de ``.values()``, sem passar pelos campos do DRF.
+
+``compile_rows(serializer)`` percorre uma vez por requisição os campos de
+saída do serializer (já filtrados por ``?fields=``/``?expand=``) e devolve os
+caminhos para ``queryset.values()`` e uma função que transforma cada linha no
+mesmo dicionário que ``serializer.data`` produziria. Se algum campo não puder
+ser reproduzido, devolve ``None`` e a view usa o serializer normalmente.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import empty
+from rest_framework.settings import api_settings
+
+# campos cujo to_representation devolve o próprio valor lido do banco
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.EmailField,
+    serializers.IntegerField,
+)
+
+
+class Unsupported(Exception):
+    pass
+
+
+def compile_rows(serializer):
+    """Devolve (caminhos do ``.values()``, função linha -> dict) ou ``None``."""
+    try:
+        paths, build = _compile(serializer, "")
+    except Unsupported:
+        return None
+    return list(dict.fromkeys(paths)), build
+
+
+def _skipped(field):
+    # o DRF ignora (SkipField) campos opcionais sem atributo correspondente
+    return field.default is empty and not field.allow_null and not field.required
+
+
+def _compile(serializer, prefix):
+    model = serializer.Meta.model
+    row_sources = getattr(serializer, "row_sources", {})
+    paths = []
+    steps = []
+
+    for field in serializer._readable_fields:
+        name = field.field_name
+        if name in row_sources:
+            source, convert = row_sources[name]
+            paths.append(prefix + source)
+            steps.append((name, prefix + source, convert, False))
+            continue
+
+        if len(field.source_attrs) != 1:
+            raise Unsupported(name)
+        source = field.source_attrs[0]
+        if not hasattr(model, source):
+            if _skipped(field):
+                continue
+            raise Unsupported(name)
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            raise Unsupported(name)
+
+        if isinstance(field, serializers.BaseSerializer):
+            if not (model_field.many_to_one or model_field.one_to_one) or not model_field.concrete:
+                raise Unsupported(name)
+            nested_prefix = f"{prefix}{source}__"
+            nested_paths, nested_build = _compile(field, nested_prefix)
+            # chave primária do relacionado indica se a relação é nula
+            key = nested_prefix + model_field.related_model._meta.pk.name
+            paths.append(key)
+            paths.extend(nested_paths)
+            steps.append((name, key, nested_build, True))
+        elif model_field.is_relation:
+            if type(field) is not serializers.PrimaryKeyRelatedField or field.pk_field is not None:
+                raise Unsupported(name)
+            paths.append(prefix + source)
+            steps.append((name, prefix + source, None, False))
+        else:
+            paths.append(prefix + source)
+            steps.append((name, prefix + source, _converter(field, model_field), False))
+
+    def build(row):
+        item = {}
+        for name, path, convert, nested in steps:
+            value = row[path]
+            if value is None:
+                item[name] = None
+            elif nested:
+                item[name] = convert(row)
+            elif convert is None:
+                item[name] = value
+            else:
+                item[name] = convert(value)
+        return item
+
+    return paths, build
+
+
+def _converter(field, model_field):
+    """Função equivalente a ``field.to_representation`` para o valor do ``.values()``."""
+    kind = type(field)
+    if kind in IDENTITY_FIELDS:
+        return None
+    if kind is serializers.ChoiceField:
+        if all(isinstance(key, str) for key in field.choices):
+            return None
+        return field.to_representation
+    if kind is serializers.DateField:
+        if getattr(field, "format", api_settings.DATE_FORMAT) == ISO_8601:
+            return _isoformat
+        return field.to_representation
+    if kind is serializers.DateTimeField:
+        tz = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+        if getattr(field, "format", api_settings.DATETIME_FORMAT) == ISO_8601 and tz:
+            return _datetime_converter(tz)
+        return field.to_representation
+    if kind is serializers.FileField:
+        return _file_converter(field, model_field)
+    if isinstance(field, (serializers.RelatedField, serializers.SerializerMethodField)):
+        raise Unsupported(field.field_name)
+    # demais campos recebem o mesmo valor que teriam do objeto
+    return field.to_representation
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _datetime_converter(tz):
+    def convert(value):
+        text = value.astimezone(tz).isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+    return convert
+
+
+def _file_converter(field, model_field):
+    # o .values() traz o nome do arquivo, não o FieldFile
+    if not getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL):
+        return lambda name: name or None
+    storage = model_field.storage
+    request = field.context.get("request")
+    if request is None:
+        return lambda name: storage.url(name) if name else None
+    return lambda name: request.build_absolute_uri(storage.url(name)) if name else None
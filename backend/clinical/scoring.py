@@ -0,0 +1,107 @@
+import numpy as np
+
+from .constants import CRITICAL_ITEMS, MCHAT_QUESTIONS
+
+ANSWER_YES = "sim"
+ANSWER_NO = "nao"
+
+# cada pergunta ocupa um bit (q1 = bit 0); bit ligado = resposta "sim"
+QUESTION_CODES = [question["code"] for question in MCHAT_QUESTIONS]
+QUESTION_BITS = {code: 1 << index for index, code in enumerate(QUESTION_CODES)}
+ALL_MASK = (1 << len(QUESTION_CODES)) - 1
+NO_RISK_MASK = sum(
+    QUESTION_BITS[question["code"]]
+    for question in MCHAT_QUESTIONS
+    if question["risk_answer"] == ANSWER_NO
+)
+CRITICAL_MASK = sum(QUESTION_BITS[code] for code in CRITICAL_ITEMS)
+
+RISK_LEVELS = ("baixo", "moderado", "alto")
+
+
+def _classify(risk_count, critical_count):
+    if risk_count <= 2 and critical_count == 0:
+        return 0
+    if risk_count <= 7 and critical_count < 2:
+        return 1
+    return 2
+
+
+# tabela [itens de risco][itens críticos] -> índice em RISK_LEVELS
+RISK_TABLE = np.array(
+    [
+        [_classify(risk_count, critical) for critical in range(len(CRITICAL_ITEMS) + 1)]
+        for risk_count in range(len(QUESTION_CODES) + 1)
+    ],
+    dtype=np.uint8,
+)
+_RISK_TABLE_ROWS = RISK_TABLE.tolist()
+_BYTE_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+class ResponseError(ValueError):
+    pass
+
+
+def normalize_answer(code, answer):
+    if isinstance(answer, bool):
+        return ANSWER_YES if answer else ANSWER_NO
+    if isinstance(answer, str) and answer.lower() in (ANSWER_YES, ANSWER_NO):
+        return answer.lower()
+    raise ResponseError(f"Resposta inválida para {code}. Utilize 'sim' ou 'nao'.")
+
+
+def encode_responses(responses):
+    """Converte {"q1": "sim", ...} no inteiro de 23 bits das respostas."""
+    if not isinstance(responses, dict):
+        raise ResponseError("As respostas devem ser um objeto JSON.")
+    missing = [code for code in QUESTION_CODES if code not in responses]
+    if missing:
+        raise ResponseError(f"Faltam respostas para: {', '.join(sorted(missing))}")
+    bits = 0
+    for code in QUESTION_CODES:
+        if normalize_answer(code, responses[code]) == ANSWER_YES:
+            bits |= QUESTION_BITS[code]
+    return bits
+
+
+def decode_responses(bits):
+    return {
+        code: ANSWER_YES if bits & bit else ANSWER_NO
+        for code, bit in QUESTION_BITS.items()
+    }
+
+
+def risk_bits(bits):
+    """Bits das perguntas respondidas com a resposta de risco."""
+    return (bits ^ NO_RISK_MASK) & ALL_MASK
+
+
+def score_bits(bits):
+    """Retorna (pontuação, nível de risco, itens críticos alterados)."""
+    risky = risk_bits(bits)
+    risk_count = risky.bit_count()
+    critical_count = (risky & CRITICAL_MASK).bit_count()
+    return risk_count, RISK_LEVELS[_RISK_TABLE_ROWS[risk_count][critical_count]], critical_count
+
+
+def _popcount(values):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values).astype(np.uint8)
+    return (
+        _BYTE_POPCOUNT[values & 0xFF]
+        + _BYTE_POPCOUNT[(values >> 8) & 0xFF]
+        + _BYTE_POPCOUNT[(values >> 16) & 0xFF]
+    )
+
+
+def score_batch(bits):
+    """Pontua vetorialmente uma sequência de respostas codificadas.
+
+    Retorna três arrays: pontuação, itens críticos e índice em RISK_LEVELS.
+    """
+    values = np.asarray(bits, dtype=np.uint32)
+    risky = (values ^ np.uint32(NO_RISK_MASK)) & np.uint32(ALL_MASK)
+    risk_counts = _popcount(risky)
+    critical_counts = _popcount(risky & np.uint32(CRITICAL_MASK))
+    return risk_counts, critical_counts, RISK_TABLE[risk_counts, critical_counts]
@@ -0,0 +1,531 @@
+"""Clínica sintética e determinística para testes de carga (``manage.py seed_clinic``).
+
+A mesma semente e a mesma data final geram os mesmos profissionais,
+pacientes (com CPFs válidos e únicos), avaliações M-CHAT, sessões e
+relatórios. As tabelas grandes são gravadas sem instanciar modelos, com
+``COPY`` no PostgreSQL e ``executemany`` nos demais bancos, usando ids
+atribuídos aqui; como os sinais não são disparados, o consolidado do painel
+é reconstruído no final.
+"""
+
+import csv
+import io
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, models
+from django.db.models import Max
+
+from .cpf import cpf_with_check_digits
+from .models import ClinicalReport, EvaluationMChat, Patient, SessionRecord
+from .rollups import rebuild_rollups
+from .scoring import ALL_MASK, NO_RISK_MASK, QUESTION_CODES, RISK_LEVELS, score_batch
+from .serializers import EvaluationMChatSerializer
+
+BATCH_SIZE = 10000
+TABLES = (Patient, EvaluationMChat, SessionRecord, ClinicalReport)
+CHUNK_SIZE = 100000
+
+# passo coprimo com 10**9: percorre as bases de CPF sem repetição
+CPF_STEP = 387_420_489
+
+# perfil de risco do paciente: (proporção, chance de cada resposta ser de risco)
+RISK_PROFILES = ((0.80, 0.03), (0.14, 0.2), (0.06, 0.5))
+# dias entre uma avaliação e a reavaliação seguinte
+FOLLOW_UP_DAYS = (30, 120)
+SESSION_WEIGHTS = (0.15, 0.3, 0.35, 0.12, 0.08)
+
+FIRST_NAMES = (
+    "Ana",
+    "Miguel",
+    "Helena",
+    "Arthur",
+    "Alice",
+    "Gael",
+    "Laura",
+    "Heitor",
+    "Manuela",
+    "Theo",
+    "Valentina",
+    "Davi",
+    "Sophia",
+    "Gabriel",
+    "Isabela",
+    "Bernardo",
+    "Lorena",
+    "Samuel",
+    "Cecília",
+    "Pedro",
+    "Júlia",
+    "Lucas",
+    "Beatriz",
+    "Benjamin",
+    "Lívia",
+)
+LAST_NAMES = (
+    "Silva",
+    "Santos",
+    "Oliveira",
+    "Souza",
+    "Rodrigues",
+    "Ferreira",
+    "Alves",
+    "Pereira",
+    "Lima",
+    "Gomes",
+    "Costa",
+    "Ribeiro",
+    "Martins",
+    "Carvalho",
+    "Almeida",
+    "Lopes",
+    "Soares",
+    "Fernandes",
+    "Vieira",
+    "Barbosa",
+    "Rocha",
+    "Dias",
+    "Nascimento",
+    "Moreira",
+)
+STREETS = (
+    "Rua das Flores",
+    "Avenida Paulista",
+    "Rua XV de Novembro",
+    "Rua da Consolação",
+    "Avenida Brasil",
+    "Rua Augusta",
+    "Rua São Bento",
+    "Avenida Ipiranga",
+)
+NOTES = (
+    "Boa interação durante as atividades lúdicas.",
+    "Contato visual sustentado em parte das tarefas.",
+    "Responde ao nome com frequência crescente.",
+    "Orientada a família sobre rotina estruturada em casa.",
+    "Introduzida comunicação alternativa com pranchas.",
+    "Atividade mediada por pares com boa adesão.",
+    "Escola relata avanço na participação em grupo.",
+    "Encaminhado para acompanhamento fonoaudiológico.",
+    "Família relata melhora no sono e na alimentação.",
+    "Manter estímulos sensoriais graduais nas próximas sessões.",
+)
+
+
+def valid_cpfs(count, offset):
+    """``count`` CPFs (só dígitos) válidos e distintos a partir de ``offset``."""
+    cpfs = []
+    index = 0
+    while len(cpfs) < count:
+        base = f"{(CPF_STEP * index + offset) % 10**9:09d}"
+        index += 1
+        # bases com todos os dígitos iguais são rejeitadas pela Receita
+        if len(set(base)) > 1:
+            cpfs.append(cpf_with_check_digits(base))
+    return cpfs
+
+
+def _batched(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _adapter(field):
+    if isinstance(field, models.DateTimeField):
+        return connection.ops.adapt_datetimefield_value
+    if isinstance(field, models.DateField):
+        return connection.ops.adapt_datefield_value
+    return None
+
+
+def write_rows(model, columns, rows, batch_size=BATCH_SIZE):
+    """Grava tuplas na tabela do modelo, sem instanciar objetos nem disparar sinais.
+
+    No PostgreSQL usa ``COPY ... FROM STDIN`` em CSV; nos demais bancos,
+    ``INSERT`` com ``executemany``, sempre em blocos de ``batch_size`` linhas.
+    """
+    fields = [model._meta.get_field(name) for name in columns]
+    adapters = [(index, adapt) for index, field in enumerate(fields) if (adapt := _adapter(field))]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    names = ", ".join(quote(field.column) for field in fields)
+
+    def adapted(row):
+        row = list(row)
+        for index, adapt in adapters:
+            row[index] = adapt(row[index])
+        return row
+
+    if adapters:
+        rows = map(adapted, rows)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            sql = f"COPY {table} ({names}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+            for chunk in _batched(rows, batch_size):
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row in chunk:
+                    writer.writerow(["\\N" if value is None else value for value in row])
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+        else:
+            placeholders = ", ".join(["%s"] * len(fields))
+            sql = f"INSERT INTO {table} ({names}) VALUES ({placeholders})"
+            for chunk in _batched(rows, batch_size):
+                cursor.executemany(sql, chunk)
+
+
+@contextmanager
+def deferred_indexes(*tables):
+    """Remove os índices do ``Meta`` dos modelos em ``tables`` e os recria ao sair.
+
+    Criar cada índice de uma vez sobre a tabela cheia é bem mais rápido que
+    atualizá-lo a cada linha; deve rodar dentro de uma transação. As chaves
+    estrangeiras das linhas gravadas são conferidas antes da recriação.
+    """
+    editor = connection.schema_editor()
+    indexes = [(model, index) for model in tables for index in model._meta.indexes]
+    with connection.cursor() as cursor:
+        for model, index in indexes:
+            cursor.execute(str(index.remove_sql(model, editor)))
+    yield
+    # valida as FKs adiadas, que no PostgreSQL impedem alterar as tabelas
+    connection.check_constraints(table_names=[model._meta.db_table for model in tables])
+    with connection.cursor() as cursor:
+        for model, index in indexes:
+            cursor.execute(str(index.create_sql(model, editor)))
+
+
+def _next_id(model):
+    return (model.objects.aggregate(value=Max("pk"))["value"] or 0) + 1
+
+
+class ClinicGenerator:
+    """Gera e grava a clínica; cada ``seed_*`` usa o que os anteriores criaram."""
+
+    def __init__(self, seed, end_date, months=36, batch_size=BATCH_SIZE):
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.batch_size = batch_size
+        # datas ingênuas em UTC, como o Django as grava com USE_TZ
+        end = datetime.combine(end_date, time(18))
+        self.start = np.datetime64(end - timedelta(days=round(months * 30.44)), "s")
+        self.span_seconds = int((np.datetime64(end, "s") - self.start).astype(np.int64))
+
+    def _moments(self, seconds):
+        return (self.start + seconds.astype("timedelta64[s]")).tolist()
+
+    def _dates(self, seconds):
+        return (self.start + seconds.astype("timedelta64[s]")).astype("datetime64[D]").tolist()
+
+    def _pick(self, options, size):
+        return [options[index] for index in self.rng.integers(0, len(options), size)]
+
+    def _notes(self, size, sentences):
+        picks = self.rng.integers(0, len(NOTES), (size, sentences)).tolist()
+        return [" ".join(NOTES[index] for index in row) for row in picks]
+
+    def seed_professionals(self, count, password=None):
+        User = get_user_model()
+        firsts = self._pick(FIRST_NAMES, count)
+        lasts = self._pick(LAST_NAMES, count)
+        # sem senha, as contas ficam com senha inutilizável
+        password = make_password(password)
+        users = User.objects.bulk_create(
+            User(
+                username=f"seed{self.seed}_prof{index:04d}",
+                first_name=first,
+                last_name=last,
+                email=f"seed{self.seed}_prof{index:04d}@example.com",
+                password=password,
+            )
+            for index, (first, last) in enumerate(zip(firsts, lasts))
+        )
+        self.professional_ids = np.array([user.pk for user in users])
+
+    def seed_patients(self, count):
+        rng = self.rng
+        first_id = _next_id(Patient)
+        cpfs = valid_cpfs(count, int(rng.integers(0, 10**9)))
+        # o último trimestre fica para as reavaliações
+        created = np.sort(rng.integers(0, int(self.span_seconds * 0.9), count))
+        # M-CHAT: crianças de 16 a 30 meses na primeira consulta
+        age_days = rng.integers(16 * 30, 30 * 30, count)
+        professionals = self.professional_ids[rng.integers(0, len(self.professional_ids), count)]
+        archived = rng.random(count) < 0.05
+        profiles = rng.choice(len(RISK_PROFILES), count, p=[share for share, _ in RISK_PROFILES])
+        firsts = self._pick(FIRST_NAMES, count)
+        lasts = self._pick(LAST_NAMES, 2 * count)
+        guardians = self._pick(FIRST_NAMES, count)
+        streets = self._pick(STREETS, count)
+        numbers = rng.integers(1, 3000, count).tolist()
+        phones = rng.integers(0, 10**8, count).tolist()
+        histories = self._notes(count, 2)
+        moments = self._moments(created)
+        births = self._dates(created - age_days * 86400)
+
+        self.patient_ids = np.arange(first_id, first_id + count)
+        self.patient_created = created
+        self.patient_professionals = professionals
+        self.patient_profiles = profiles
+
+        def rows():
+            for index in range(count):
+                yield (
+                    first_id + index,
+                    f"{firsts[index]} {lasts[2 * index]} {lasts[2 * index + 1]}",
+                    births[index],
+                    f"{guardians[index]} {lasts[2 * index + 1]}",
+                    f"(11) 9{phones[index] // 10**4:04d}-{phones[index] % 10**4:04d}",
+                    cpfs[index],
+                    f"{streets[index]}, {numbers[index]} - São Paulo/SP",
+                    histories[index],
+                    int(professionals[index]),
+                    None,
+                    bool(archived[index]),
+                    moments[index],
+                    moments[index],
+                )
+
+        write_rows(
+            Patient,
+            [
+                "id",
+                "name",
+                "birth_date",
+                "guardian_name",
+                "contact",
+                "cpf",
+                "address",
+                "summary_history",
+                "professional",
+                "clinical_attachment",
+                "archived",
+                "created_at",
+                "updated_at",
+            ],
+            rows(),
+            self.batch_size,
+        )
+
+    def seed_evaluations(self, count):
+        rng = self.rng
+        patients = len(self.patient_ids)
+        first_id = _next_id(EvaluationMChat)
+        # toda criança tem a avaliação inicial; as demais são reavaliações
+        if count >= patients:
+            owners = np.concatenate(
+                [np.arange(patients), rng.integers(0, patients, count - patients)]
+            )
+        else:
+            owners = rng.choice(patients, count, replace=False)
+        owners.sort()
+        rank = np.arange(count) - np.searchsorted(owners, owners)
+        created = self.patient_created[owners]
+        first_visit = created + min(7 * 86400, self.span_seconds // 20)
+        gaps = rng.integers(*FOLLOW_UP_DAYS, count) * rank * 86400
+        seconds = first_visit + gaps + rng.integers(0, 86400, count)
+        # reavaliações que passariam da data final caem em qualquer ponto do intervalo
+        late = seconds > self.span_seconds
+        seconds[late] = first_visit[late] + (
+            rng.random(int(late.sum())) * (self.span_seconds - first_visit[late])
+        ).astype(np.int64)
+        # ids crescentes no tempo, como num banco real
+        order = np.argsort(seconds, kind="stable")
+        owners, seconds = owners[order], seconds[order]
+        follow_up = np.ones(count, dtype=bool)
+        follow_up[np.unique(owners, return_index=True)[1]] = False
+
+        bits = np.empty(count, dtype=np.int64)
+        chances = np.array([chance for _, chance in RISK_PROFILES])[self.patient_profiles[owners]]
+        weights = 1 << np.arange(len(QUESTION_CODES), dtype=np.int64)
+        for start in range(0, count, CHUNK_SIZE):
+            part = slice(start, start + CHUNK_SIZE)
+            risky = rng.random((len(chances[part]), len(QUESTION_CODES))) < chances[part, None]
+            bits[part] = (risky @ weights) ^ NO_RISK_MASK
+        bits &= ALL_MASK
+        totals, criticals, levels = score_batch(bits)
+        # 10% das avaliações são aplicadas por outro profissional
+        professionals = self.patient_professionals[owners]
+        others = rng.random(count) < 0.1
+        professionals[others] = self.professional_ids[
+            rng.integers(0, len(self.professional_ids), int(others.sum()))
+        ]
+        observed = rng.random(count) < 0.3
+        observations = self._notes(count, 1)
+
+        interpretations = {}
+        high_risk = EvaluationMChatSerializer.HIGH_RISK_RECOMMENDATION
+        self.evaluation_ids = np.arange(first_id, first_id + count)
+        self.evaluation_owners = owners
+        self.evaluation_seconds = seconds
+        self.evaluation_levels = levels
+
+        def rows():
+            for index, (patient, bits_, total, critical, level, professional, moment) in enumerate(
+                zip(
+                    owners.tolist(),
+                    bits.tolist(),
+                    totals.tolist(),
+                    criticals.tolist(),
+                    levels.tolist(),
+                    professionals.tolist(),
+                    self._moments(seconds),
+                )
+            ):
+                risk_level = RISK_LEVELS[level]
+                key = (risk_level, critical)
+                if key not in interpretations:
+                    interpretations[key] = EvaluationMChatSerializer._build_interpretation(*key)
+                yield (
+                    first_id + index,
+                    int(self.patient_ids[patient]),
+                    professional,
+                    bits_,
+                    observations[index] if observed[index] else "",
+                    total,
+                    risk_level,
+                    interpretations[key],
+                    high_risk if risk_level == EvaluationMChat.RISK_HIGH else "",
+                    bool(follow_up[index]),
+                    moment,
+                    moment,
+                )
+
+        write_rows(
+            EvaluationMChat,
+            [
+                "id",
+                "patient",
+                "professional",
+                "responses_bits",
+                "observations",
+                "total_score",
+                "risk_level",
+                "clinical_interpretation",
+                "follow_up_recommendations",
+                "is_follow_up",
+                "created_at",
+                "updated_at",
+            ],
+            rows(),
+            self.batch_size,
+        )
+
+    def seed_sessions(self, count):
+        rng = self.rng
+        first_id = _next_id(SessionRecord)
+        owners = rng.integers(0, len(self.patient_ids), count)
+        created = self.patient_created[owners]
+        seconds = created + (rng.random(count) * (self.span_seconds - created)).astype(np.int64)
+        order = np.argsort(seconds, kind="stable")
+        owners, seconds = owners[order], seconds[order]
+        types = rng.choice(len(SessionRecord.SESSION_TYPES), count, p=SESSION_WEIGHTS).tolist()
+        professionals = self.patient_professionals[owners].tolist()
+        objectives = self._notes(count, 1)
+        interventions = self._notes(count, 3)
+        guidance = self._notes(count, 1)
+        next_steps = self._notes(count, 1)
+        moments = self._moments(seconds)
+        dates = self._dates(seconds)
+
+        def rows():
+            for index, patient in enumerate(owners.tolist()):
+                yield (
+                    first_id + index,
+                    int(self.patient_ids[patient]),
+                    professionals[index],
+                    dates[index],
+                    SessionRecord.SESSION_TYPES[types[index]][0],
+                    objectives[index],
+                    interventions[index],
+                    guidance[index],
+                    next_steps[index],
+                    moments[index],
+                    moments[index],
+                )
+
+        write_rows(
+            SessionRecord,
+            [
+                "id",
+                "patient",
+                "professional",
+                "session_date",
+                "session_type",
+                "objectives",
+                "interventions",
+                "family_guidance",
+                "next_steps",
+                "created_at",
+                "updated_at",
+            ],
+            rows(),
+            self.batch_size,
+        )
+
+    def seed_reports(self, count):
+        rng = self.rng
+        first_id = _next_id(ClinicalReport)
+        total = len(self.evaluation_ids)
+        count = min(count, total)
+        # relatórios saem sobretudo das avaliações de risco moderado ou alto
+        weights = np.array([1.0, 4.0, 8.0])[self.evaluation_levels]
+        chosen = np.sort(rng.choice(total, count, replace=False, p=weights / weights.sum()))
+        delays = rng.integers(3600, 3 * 86400, count)
+        equipment = self._notes(count, 1)
+        reviews = self._notes(count, 1)
+        seconds = np.minimum(self.evaluation_seconds[chosen] + delays, self.span_seconds)
+        moments = self._moments(seconds)
+
+        def rows():
+            for index, evaluation in enumerate(chosen.tolist()):
+                moment = moments[index]
+                level = RISK_LEVELS[self.evaluation_levels[evaluation]]
+                yield (
+                    first_id + index,
+                    int(self.evaluation_ids[evaluation]),
+                    f"Relatório M-CHAT {moment:%d/%m/%Y}",
+                    f"Avaliação com classificação de risco {level}. {equipment[index]}",
+                    None,
+                    "",
+                    equipment[index],
+                    reviews[index],
+                    moment,
+                    moment,
+                )
+
+        write_rows(
+            ClinicalReport,
+            [
+                "id",
+                "evaluation",
+                "title",
+                "content",
+                "pdf_file",
+                "pdf_digest",
+                "health_equipment_notes",
+                "periodic_review_notes",
+                "created_at",
+                "updated_at",
+            ],
+            rows(),
+            self.batch_size,
+        )
+
+    def finish(self, rollups=True):
+        # ids gravados explicitamente: as sequências do PostgreSQL precisam avançar
+        if connection.vendor == "postgresql":
+            statements = connection.ops.sequence_reset_sql(no_style(), TABLES)
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+        if rollups:
+            rebuild_rollups()
@@ -1,19 +1,86 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 
-from .constants import CRITICAL_ITEMS, MCHAT_QUESTIONS, RISK_LABELS
-from .models import ClinicalReport, EvaluationMChat, Patient, SessionRecord
+from .constants import MCHAT_QUESTIONS, RISK_LABELS
+from .metrics import count_scorings
+from .models import ClinicalReport, EvaluationMChat, Patient, PdfJob, SessionRecord
+from .scoring import ResponseError, decode_responses, encode_responses, score_bits
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+def split_paths(paths):
+    """Separa ["id", "patient.name"] em campos deste nível e listas por campo aninhado."""
+    own = set()
+    nested = {}
+    for path in paths:
+        name, _, rest = path.partition(".")
+        own.add(name)
+        if rest:
+            nested.setdefault(name, []).append(rest)
+    return own, nested
+
+
+class FlexFieldsMixin:
+    """Suporte a ``?fields=`` e ``?expand=``.
+
+    Os campos de ``expandable_fields`` trazem só o id, a não ser que sejam
+    expandidos; ``"*"`` expande todos, em todos os níveis (é o padrão fora das
+    listagens, ver ``FlexFieldsViewMixin``). ``fields`` limita os campos de
+    saída; caminhos como ``patient.name`` valem para os objetos expandidos.
+    """
+
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        context = kwargs.get("context") or {}
+        if fields is None:
+            fields = context.get("fields")
+        if expand is None:
+            expand = context.get("expand", ["*"])
+
+        expand_all = "*" in expand
+        expand_names, nested_expand = split_paths(path for path in expand if path != "*")
+        keep, nested_fields = split_paths(fields or ())
+        unknown = keep - set(self.fields)
+        unknown |= set(nested_fields) - set(self.expandable_fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {"fields": f"Campos inválidos: {', '.join(sorted(unknown))}."}
+            )
+
+        for name, (serializer_class, options) in self.expandable_fields.items():
+            if name not in self.fields:
+                continue
+            if expand_all or name in expand_names:
+                self.fields[name] = serializer_class(
+                    read_only=True,
+                    fields=nested_fields.get(name),
+                    expand=["*"] if expand_all else nested_expand.get(name, []),
+                    **options,
+                )
+            else:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, **options)
+
+        self._output_fields = keep
+
+    @property
+    def _readable_fields(self):
+        # ``fields`` só filtra a saída; os campos de entrada continuam valendo
+        for field in super()._readable_fields:
+            if not self._output_fields or field.field_name in self._output_fields:
+                yield field
+
+
+class UserSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id", "first_name", "last_name", "email"]
 
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     professional = UserSerializer(read_only=True)
     professional_id = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
@@ -46,6 +113,12 @@ class PatientSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
 
+    expandable_fields = {"professional": (UserSerializer, {})}
+
+
+def risk_label_of(level):
+    return RISK_LABELS.get(level, level)
+
 
 class MChatQuestionSerializer(serializers.Serializer):
     id = serializers.IntegerField()
@@ -54,7 +127,20 @@ class MChatQuestionSerializer(serializers.Serializer):
     risk_answer = serializers.CharField()
 
 
-class EvaluationMChatSerializer(serializers.ModelSerializer):
+class MChatResponsesField(serializers.Field):
+    """Expõe ``responses_bits`` como o objeto {"q1": "sim", ...} da API."""
+
+    def to_representation(self, value):
+        return decode_responses(value)
+
+    def to_internal_value(self, data):
+        try:
+            return encode_responses(data)
+        except ResponseError as exc:
+            raise serializers.ValidationError(str(exc))
+
+
+class EvaluationMChatSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     patient = PatientSerializer(read_only=True)
     patient_id = serializers.PrimaryKeyRelatedField(
         queryset=Patient.objects.all(),
@@ -69,9 +155,21 @@ class EvaluationMChatSerializer(serializers.ModelSerializer):
         allow_null=True,
         required=False,
     )
+    responses = MChatResponsesField(source="responses_bits")
     risk_label = serializers.SerializerMethodField()
     questions = MChatQuestionSerializer(many=True, read_only=True)
 
+    expandable_fields = {
+        "patient": (PatientSerializer, {}),
+        "professional": (UserSerializer, {}),
+    }
+    # campos calculados para clinical.rows: nome -> (campo do modelo, função do valor)
+    row_sources = {"risk_label": ("risk_level", risk_label_of)}
+
+    HIGH_RISK_RECOMMENDATION = (
+        "Encaminhar imediatamente para equipe multiprofissional e registrar ações no SUS."
+    )
+
     class Meta:
         model = EvaluationMChat
         fields = [
@@ -104,55 +202,11 @@ class EvaluationMChatSerializer(serializers.ModelSerializer):
         return MCHAT_QUESTIONS
 
     def get_risk_label(self, obj):
-        return RISK_LABELS.get(obj.risk_level, obj.risk_level)
-
-    def validate_responses(self, value):
-        if not isinstance(value, dict):
-            raise serializers.ValidationError("As respostas devem ser um objeto JSON.")
-        missing = {
-            question["code"]
-            for question in MCHAT_QUESTIONS
-            if question["code"] not in value
-        }
-        if missing:
-            raise serializers.ValidationError(
-                f"Faltam respostas para: {', '.join(sorted(missing))}"
-            )
-        normalized = {}
-        for question in MCHAT_QUESTIONS:
-            code = question["code"]
-            answer = value.get(code)
-            if isinstance(answer, bool):
-                normalized_answer = "sim" if answer else "nao"
-            elif isinstance(answer, str):
-                normalized_answer = answer.lower()
-            else:
-                raise serializers.ValidationError(
-                    f"Resposta inválida para {code}. Utilize 'sim' ou 'nao'."
-                )
-            if normalized_answer not in {"sim", "nao"}:
-                raise serializers.ValidationError(
-                    f"Resposta inválida para {code}. Utilize 'sim' ou 'nao'."
-                )
-            normalized[code] = normalized_answer
-        return normalized
-
-    def _score_responses(self, responses):
-        risk_count = 0
-        critical_count = 0
-        for question in MCHAT_QUESTIONS:
-            code = question["code"]
-            if responses.get(code) == question["risk_answer"]:
-                risk_count += 1
-                if code in CRITICAL_ITEMS:
-                    critical_count += 1
-        if risk_count <= 2 and critical_count == 0:
-            risk_level = EvaluationMChat.RISK_LOW
-        elif risk_count <= 7 and critical_count < 2:
-            risk_level = EvaluationMChat.RISK_MODERATE
-        else:
-            risk_level = EvaluationMChat.RISK_HIGH
-        return risk_count, risk_level, critical_count
+        return risk_label_of(obj.risk_level)
+
+    def _score_responses(self, responses_bits):
+        count_scorings("single")
+        return score_bits(responses_bits)
 
     @staticmethod
     def _build_interpretation(risk_level, critical_count):
@@ -173,8 +227,9 @@ class EvaluationMChatSerializer(serializers.ModelSerializer):
         )
 
     def create(self, validated_data):
-        responses = validated_data["responses"]
-        risk_count, risk_level, critical_count = self._score_responses(responses)
+        risk_count, risk_level, critical_count = self._score_responses(
+            validated_data["responses_bits"]
+        )
         validated_data["total_score"] = risk_count
         validated_data["risk_level"] = risk_level
         validated_data["clinical_interpretation"] = self._build_interpretation(
@@ -182,14 +237,14 @@ class EvaluationMChatSerializer(serializers.ModelSerializer):
         )
         if risk_level == EvaluationMChat.RISK_HIGH:
             validated_data.setdefault(
-                "follow_up_recommendations",
-                "Encaminhar imediatamente para equipe multiprofissional e registrar ações no SUS.",
+                "follow_up_recommendations", self.HIGH_RISK_RECOMMENDATION
             )
         return super().create(validated_data)
 
     def update(self, instance, validated_data):
-        responses = validated_data.get("responses", instance.responses)
-        risk_count, risk_level, critical_count = self._score_responses(responses)
+        risk_count, risk_level, critical_count = self._score_responses(
+            validated_data.get("responses_bits", instance.responses_bits)
+        )
         validated_data["total_score"] = risk_count
         validated_data["risk_level"] = risk_level
         validated_data["clinical_interpretation"] = self._build_interpretation(
@@ -198,7 +253,7 @@ class EvaluationMChatSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class ClinicalReportSerializer(serializers.ModelSerializer):
+class ClinicalReportSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     evaluation = EvaluationMChatSerializer(read_only=True)
     evaluation_id = serializers.PrimaryKeyRelatedField(
         queryset=EvaluationMChat.objects.all(),
@@ -221,8 +276,10 @@ class ClinicalReportSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "pdf_file", "created_at"]
 
+    expandable_fields = {"evaluation": (EvaluationMChatSerializer, {})}
+
 
-class SessionRecordSerializer(serializers.ModelSerializer):
+class SessionRecordSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     patient = PatientSerializer(read_only=True)
     patient_id = serializers.PrimaryKeyRelatedField(
         queryset=Patient.objects.all(),
@@ -255,3 +312,58 @@ class SessionRecordSerializer(serializers.ModelSerializer):
             "created_at",
         ]
         read_only_fields = ["id", "created_at", "patient", "professional"]
+
+    expandable_fields = {
+        "patient": (PatientSerializer, {}),
+        "professional": (UserSerializer, {}),
+    }
+
+
+class PdfJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PdfJob
+        fields = [
+            "id",
+            "kind",
+            "object_id",
+            "status",
+            "filename",
+            "error",
+            "attempts",
+            "download_url",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = [
+            "id",
+            "status",
+            "filename",
+            "error",
+            "attempts",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
+    def get_download_url(self, obj):
+        if obj.status != PdfJob.STATUS_DONE:
+            return None
+        return reverse("pdf-job-download", args=[obj.pk], request=self.context.get("request"))
+
+
+class GeneralReportBatchSerializer(serializers.Serializer):
+    """Pacientes do ZIP de relatórios gerais: lista de ids ou filtro."""
+
+    MAX_PATIENTS = 500
+
+    patient_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        allow_empty=False,
+        max_length=MAX_PATIENTS,
+    )
+    archived = serializers.BooleanField(required=False, default=False)
+    professional = serializers.IntegerField(required=False, min_value=1)
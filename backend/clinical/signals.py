@@ -0,0 +1,68 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import EvaluationMChat, Patient
+from .rollups import (
+    apply_deltas,
+    evaluation_contribution,
+    merge,
+    patient_reassignment,
+    stored_contribution,
+)
+
+
+@receiver(pre_save, sender=EvaluationMChat)
+def remember_evaluation_contribution(sender, instance, raw=False, **kwargs):
+    instance._previous_rollup = (
+        {} if raw or instance.pk is None else stored_contribution(instance.pk)
+    )
+
+
+@receiver(post_save, sender=EvaluationMChat)
+def update_evaluation_rollups(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = merge({}, getattr(instance, "_previous_rollup", {}), -1)
+    apply_deltas(merge(deltas, stored_contribution(instance.pk)))
+
+
+@receiver(pre_delete, sender=EvaluationMChat)
+def remember_deleted_evaluation_contribution(sender, instance, **kwargs):
+    instance._previous_rollup = stored_contribution(instance.pk)
+
+
+@receiver(post_delete, sender=EvaluationMChat)
+def update_deleted_evaluation_rollups(sender, instance, **kwargs):
+    contribution = getattr(instance, "_previous_rollup", None)
+    if contribution is None:
+        contribution = evaluation_contribution(
+            {
+                "professional_id": instance.professional_id,
+                "patient__professional_id": None,
+                "created_at": instance.created_at,
+                "is_follow_up": instance.is_follow_up,
+                "risk_level": instance.risk_level,
+                "total_score": instance.total_score,
+                "responses_bits": instance.responses_bits,
+            }
+        )
+    apply_deltas(merge({}, contribution, -1))
+
+
+@receiver(pre_save, sender=Patient)
+def remember_patient_professional(sender, instance, raw=False, **kwargs):
+    instance._previous_professional_id = (
+        None
+        if raw or instance.pk is None
+        else Patient.objects.filter(pk=instance.pk)
+        .values_list("professional_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Patient)
+def update_reassigned_patient_rollups(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, "_previous_professional_id", None)
+    if raw or created or previous == instance.professional_id:
+        return
+    apply_deltas(patient_reassignment({instance.pk: (previous, instance.professional_id)}))
@@ -1,10 +1,53 @@
+import base64
+import itertools
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import warnings
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework import status
+from django.utils import timezone
+from prometheus_client import REGISTRY
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from rest_framework import serializers, status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
 
-from .constants import MCHAT_QUESTIONS
-from .models import EvaluationMChat, Patient
+from .constants import CRITICAL_ITEMS, MCHAT_QUESTIONS
+from .cpf import cpf_with_check_digits
+from . import jobs, views
+from .jobs import run_worker
+from .pdf import (
+    PageLayout,
+    evaluation_context,
+    evaluation_row,
+    general_report_context,
+    render_evaluation,
+    render_general_report,
+    session_row,
+    wrap_lines,
+)
+from .models import ClinicalReport, DashboardRollup, EvaluationMChat, Patient, PdfJob, SessionRecord
+from .pdf_cache import PdfCache, get_cache, pdf_digest
+from .rollups import rebuild_rollups, verify_rollups
+from .rows import compile_rows
+from .scoring import encode_responses, score_batch, score_bits
 
 
 class EvaluationScoreTests(APITestCase):
@@ -34,3 +77,1651 @@ class EvaluationScoreTests(APITestCase):
         evaluation = EvaluationMChat.objects.get()
         self.assertEqual(evaluation.total_score, 23)
         self.assertEqual(evaluation.risk_level, EvaluationMChat.RISK_HIGH)
+
+    def test_bitmask_scorer_matches_item_by_item_scoring(self):
+        def reference(responses):
+            risk_count = critical_count = 0
+            for question in MCHAT_QUESTIONS:
+                if responses[question["code"]] == question["risk_answer"]:
+                    risk_count += 1
+                    critical_count += question["code"] in CRITICAL_ITEMS
+            if risk_count <= 2 and critical_count == 0:
+                return risk_count, EvaluationMChat.RISK_LOW, critical_count
+            if risk_count <= 7 and critical_count < 2:
+                return risk_count, EvaluationMChat.RISK_MODERATE, critical_count
+            return risk_count, EvaluationMChat.RISK_HIGH, critical_count
+
+        samples = [
+            {
+                question["code"]: "sim" if (seed * 7919 >> index) & 1 else "nao"
+                for index, question in enumerate(MCHAT_QUESTIONS)
+            }
+            for seed in range(0, 4000, 7)
+        ]
+        encoded = [encode_responses(sample) for sample in samples]
+        totals, criticals, levels = score_batch(encoded)
+        for index, sample in enumerate(samples):
+            expected = reference(sample)
+            self.assertEqual(score_bits(encoded[index]), expected)
+            self.assertEqual(
+                (int(totals[index]), int(criticals[index])), (expected[0], expected[2])
+            )
+            self.assertEqual(
+                ("baixo", "moderado", "alto")[levels[index]], expected[1]
+            )
+
+    def test_score_batch_endpoint_reports_errors_per_item(self):
+        responses = {q["code"]: q["risk_answer"] for q in MCHAT_QUESTIONS}
+        payload = {"responses": [responses, {"q1": "sim"}, 0]}
+        response = self.client.post(
+            reverse("evaluation-score-batch"), payload, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["errors"], 1)
+        first, second, third = response.data["results"]
+        self.assertEqual(first["total_score"], 23)
+        self.assertEqual(first["risk_level"], EvaluationMChat.RISK_HIGH)
+        self.assertIn("Faltam respostas", second["error"])
+        self.assertEqual(third["critical_count"], 6)
+        self.assertFalse(EvaluationMChat.objects.exists())
+
+
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="tester", email="tester@example.com", password="123456"
+        )
+        self.client.force_authenticate(self.user)
+        self.patient = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="000.000.000-00",
+            professional=self.user,
+        )
+
+    def _walk(self, url, params):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item["id"] for item in response.data["results"])
+            if not response.data["next"]:
+                return ids, response
+            response = self.client.get(response.data["next"])
+
+    def test_sessions_follow_next_cursor_across_date_ties(self):
+        sessions = [
+            SessionRecord.objects.create(
+                patient=self.patient,
+                professional=self.user,
+                session_date=f"2024-05-0{1 + index % 2}",
+            )
+            for index in range(7)
+        ]
+        ids, last_page = self._walk(
+            reverse("session-list"), {"patient": self.patient.id, "page_size": 3}
+        )
+        expected = [
+            item.id
+            for item in sorted(
+                sessions,
+                key=lambda item: (item.session_date, item.created_at, item.id),
+                reverse=True,
+            )
+        ]
+        self.assertEqual(ids, expected)
+
+        previous = self.client.get(last_page.data["previous"])
+        self.assertEqual(
+            [item["id"] for item in previous.data["results"]], expected[3:6]
+        )
+
+    def test_invalid_cursor_returns_not_found(self):
+        response = self.client.get(reverse("patient-list"), {"cursor": "invalido"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_forged_cursor_positions_return_not_found(self):
+        forged = [
+            ["notadate", 1],
+            [{"a": 1}, 1],
+            [None, None],
+            ["2024-01-01T00:00:00Z", "abc"],
+            ["2024-01-01T00:00:00Z", [1]],
+        ]
+        for name in ("patient-list", "evaluation-list", "pdf-job-list", "session-list"):
+            for position in forged:
+                if name == "session-list":
+                    position = ["2024-01-01", *position]
+                cursor = base64.b64encode(
+                    urlencode({"p": json.dumps(position)}).encode("ascii")
+                ).decode("ascii")
+                with self.subTest(endpoint=name, position=position):
+                    response = self.client.get(reverse(name), {"cursor": cursor})
+                    self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+def plan_problems(sql):
+    """Lista varreduras sequenciais e ordenações no plano da consulta."""
+    problems = []
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_sort = off")
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            nodes = [plan[0]["Plan"]]
+            while nodes:
+                node = nodes.pop()
+                if node["Node Type"] in {"Seq Scan", "Sort", "Incremental Sort"}:
+                    problems.append(f"{node['Node Type']} {node.get('Relation Name', '')}")
+                nodes.extend(node.get("Plans", []))
+        else:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            for row in cursor.fetchall():
+                detail = row[-1]
+                if detail.startswith("SCAN") and "USING" not in detail:
+                    problems.append(detail)
+                elif "TEMP B-TREE FOR" in detail and "ORDER BY" in detail:
+                    problems.append(detail)
+    return problems
+
+
+class QueryPlanTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.staff = User.objects.create_user(
+            username="coordenacao", email="coord@example.com", password="123456", is_staff=True
+        )
+        self.professional = User.objects.create_user(
+            username="tester", email="tester@example.com", password="123456"
+        )
+        self.patients = []
+        for index in range(12):
+            patient = Patient.objects.create(
+                name=f"Paciente {index}",
+                birth_date="2018-01-01",
+                guardian_name="Responsável",
+                cpf=f"{index:011d}",
+                professional=self.professional if index % 2 else self.staff,
+                archived=index % 4 == 0,
+            )
+            self.patients.append(patient)
+            for follow_up in (False, True):
+                EvaluationMChat.objects.create(
+                    patient=patient,
+                    professional=self.professional,
+                    total_score=index % 9,
+                    is_follow_up=follow_up,
+                )
+                SessionRecord.objects.create(
+                    patient=patient,
+                    professional=self.professional,
+                    session_date=f"2024-0{1 + index % 9}-10",
+                )
+
+    def assertIndexedPlans(self, user, url, params=None):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for query in context.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT") or "clinical_" not in sql:
+                continue
+            self.assertEqual(plan_problems(sql), [], f"{url} {params}: {sql}")
+
+    def test_list_and_report_queries_use_indexes(self):
+        patient = self.patients[1]
+        for user in (self.staff, self.professional):
+            self.assertIndexedPlans(user, reverse("patient-list"))
+            self.assertIndexedPlans(user, reverse("patient-list"), {"archived": "true"})
+            self.assertIndexedPlans(user, reverse("evaluation-list"))
+            self.assertIndexedPlans(user, reverse("evaluation-list"), {"patient": patient.id})
+            self.assertIndexedPlans(user, reverse("session-list"))
+            self.assertIndexedPlans(user, reverse("session-list"), {"patient": patient.id})
+            self.assertIndexedPlans(user, reverse("general-report"), {"patient": patient.id})
+
+    def test_dashboard_queries_use_indexes(self):
+        for user in (self.staff, self.professional):
+            self.assertIndexedPlans(user, reverse("dashboard-summary"))
+
+
+class DashboardSummaryTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="tester", email="tester@example.com", password="123456"
+        )
+        self.client.force_authenticate(self.user)
+        self.patient = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="000.000.000-00",
+            professional=self.user,
+        )
+        for day, follow_up, score, risk in [
+            ("2024-01-10", False, 1, EvaluationMChat.RISK_LOW),
+            ("2024-01-20", True, 5, EvaluationMChat.RISK_MODERATE),
+            ("2024-03-05", True, 9, EvaluationMChat.RISK_HIGH),
+        ]:
+            evaluation = EvaluationMChat.objects.create(
+                patient=self.patient,
+                professional=self.user,
+                total_score=score,
+                risk_level=risk,
+                is_follow_up=follow_up,
+            )
+            EvaluationMChat.objects.filter(pk=evaluation.pk).update(
+                created_at=f"{day}T12:00:00-03:00"
+            )
+        rebuild_rollups()
+
+    def test_summary_uses_constant_queries_for_any_window(self):
+        url = reverse("dashboard-summary")
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {"from": "2023-12", "to": "2024-03-31"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total_evaluations"], 3)
+        self.assertEqual(response.data["follow_up_count"], 2)
+        self.assertEqual(response.data["initial_evaluations"], 1)
+        self.assertEqual(response.data["average_score"], 5)
+        self.assertEqual(len(response.data["risk_distribution"]), 3)
+        series = response.data["monthly_followups"]
+        self.assertEqual(series["labels"], ["Dec/2023", "Jan/2024", "Feb/2024", "Mar/2024"])
+        self.assertEqual(series["follow"], [0, 1, 0, 1])
+        self.assertEqual(series["initial"], [0, 1, 0, 0])
+
+    def test_weekly_granularity_and_invalid_parameters(self):
+        url = reverse("dashboard-summary")
+        response = self.client.get(
+            url, {"from": "2024-01-08", "to": "2024-01-21", "granularity": "week"}
+        )
+        self.assertEqual(response.data["monthly_followups"]["follow"], [0, 1])
+        self.assertEqual(response.data["monthly_followups"]["initial"], [1, 0])
+
+        response = self.client.get(url, {"granularity": "day"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {"from": "2024-02-30"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DashboardRollupTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.first = User.objects.create_user(username="primeiro", password="123456")
+        self.second = User.objects.create_user(username="segundo", password="123456")
+        self.patient = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="000.000.000-00",
+            professional=self.first,
+        )
+
+    def _counts(self, professional):
+        return sum(
+            DashboardRollup.objects.filter(professional=professional).values_list(
+                "evaluation_count", flat=True
+            )
+        )
+
+    def test_rollups_follow_evaluation_and_patient_changes(self):
+        evaluation = EvaluationMChat.objects.create(
+            patient=self.patient, professional=self.first, total_score=3
+        )
+        EvaluationMChat.objects.create(
+            patient=self.patient, professional=self.second, total_score=9,
+            risk_level=EvaluationMChat.RISK_HIGH,
+        )
+        self.assertEqual(self._counts(None), 2)
+        self.assertEqual(self._counts(self.first), 2)
+        self.assertEqual(self._counts(self.second), 1)
+
+        evaluation.is_follow_up = True
+        evaluation.professional = self.second
+        evaluation.save()
+        self.assertEqual(verify_rollups(), [])
+
+        self.patient.professional = self.second
+        self.patient.save()
+        self.assertEqual(self._counts(self.first), 0)
+        self.assertEqual(self._counts(self.second), 2)
+        self.assertEqual(verify_rollups(), [])
+
+        evaluation.delete()
+        self.assertEqual(self._counts(None), 1)
+        self.assertEqual(verify_rollups(), [])
+
+    def test_writes_update_rollups_without_rescanning_the_month(self):
+        def create(score):
+            evaluation = EvaluationMChat(
+                patient=self.patient, professional=self.second, total_score=score
+            )
+            evaluation.responses = {q["code"]: "nao" for q in MCHAT_QUESTIONS}
+            with CaptureQueriesContext(connection) as queries:
+                evaluation.save()
+            return evaluation, queries
+
+        _, first = create(1)
+        for score in range(20):
+            create(score)
+        evaluation, last = create(5)
+        self.assertEqual(len(last), len(first))
+        # nenhuma agregação sobre as avaliações: só as linhas do consolidado mudam
+        self.assertFalse(any("GROUP BY" in query["sql"] for query in last.captured_queries))
+        self.assertEqual(verify_rollups(), [])
+
+        evaluation.responses = {q["code"]: "sim" for q in MCHAT_QUESTIONS}
+        evaluation.save()
+        EvaluationMChat.objects.filter(total_score=1).delete()
+        self.assertEqual(verify_rollups(), [])
+        self.assertEqual(self._counts(None), 20)
+
+    def test_rebuild_command_repairs_drift(self):
+        EvaluationMChat.objects.create(
+            patient=self.patient, professional=self.second, total_score=1
+        )
+        DashboardRollup.objects.update(evaluation_count=99)
+        self.assertNotEqual(verify_rollups(), [])
+        call_command("rebuild_dashboard_rollups", stdout=StringIO())
+        self.assertEqual(verify_rollups(), [])
+        self.assertEqual(self._counts(self.first), 1)
+
+
+class ItemAnalyticsTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.staff = User.objects.create_user(
+            username="coordenacao", password="123456", is_staff=True
+        )
+        self.professional = User.objects.create_user(
+            username="tester", password="123456"
+        )
+        self.other = User.objects.create_user(username="outro", password="123456")
+        self.patient = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="000.000.000-00",
+            professional=self.professional,
+        )
+        self.samples = [
+            {
+                question["code"]: "sim" if (seed * 2654435761 >> index) & 1 else "nao"
+                for index, question in enumerate(MCHAT_QUESTIONS)
+            }
+            for seed in range(1, 31)
+        ]
+        for index, sample in enumerate(self.samples):
+            total_score, risk_level, _ = score_bits(encode_responses(sample))
+            evaluation = EvaluationMChat(
+                patient=self.patient,
+                professional=self.other if index % 3 == 0 else self.professional,
+                total_score=total_score,
+                risk_level=risk_level,
+            )
+            evaluation.responses = sample
+            evaluation.save()
+
+    def _failed(self, sample, code):
+        question = next(q for q in MCHAT_QUESTIONS if q["code"] == code)
+        return sample[code] == question["risk_answer"]
+
+    def test_item_rates_and_cooccurrence_match_python(self):
+        self.client.force_authenticate(self.staff)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("item-analytics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        (group,) = response.data["groups"]
+        self.assertEqual(group["evaluations"], len(self.samples))
+        self.assertEqual(verify_rollups(), [])
+        for question in MCHAT_QUESTIONS:
+            code = question["code"]
+            expected = sum(self._failed(sample, code) for sample in self.samples)
+            self.assertEqual(group["items"][code]["failures"], expected)
+            self.assertEqual(group["items"][code]["critical"], code in CRITICAL_ITEMS)
+
+        codes = response.data["critical_items"]
+        for row, first in enumerate(codes):
+            for column, second in enumerate(codes):
+                expected = sum(
+                    self._failed(sample, first) and self._failed(sample, second)
+                    for sample in self.samples
+                )
+                self.assertEqual(group["critical_cooccurrence"][row][column], expected)
+
+    def test_grouping_respects_visibility(self):
+        self.patient.professional = self.staff
+        self.patient.save()
+        self.client.force_authenticate(self.professional)
+        response = self.client.get(
+            reverse("item-analytics"), {"group_by": "professional,risk_level"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        groups = response.data["groups"]
+        self.assertEqual(
+            {group["professional"] for group in groups}, {self.professional.id}
+        )
+        self.assertEqual(sum(group["evaluations"] for group in groups), 20)
+
+        response = self.client.get(reverse("item-analytics"), {"group_by": "patient"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class EvaluationImportTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="tester", email="tester@example.com", password="123456"
+        )
+        self.client.force_authenticate(self.user)
+        self.patient = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="000.000.000-00",
+            professional=self.user,
+        )
+        self.risk_answers = {q["code"]: q["risk_answer"] for q in MCHAT_QUESTIONS}
+
+    def _upload(self, name, content):
+        upload = SimpleUploadedFile(name, content.encode("utf-8"))
+        return self.client.post(
+            reverse("evaluation-import"), {"file": upload}, format="multipart"
+        )
+
+    def test_csv_import_scores_rows_and_reports_errors(self):
+        codes = [q["code"] for q in MCHAT_QUESTIONS]
+        header = ",".join(["patient_id", "observations", "is_follow_up", *codes])
+        high = ",".join(self.risk_answers[code] for code in codes)
+        low = ",".join("nao" if self.risk_answers[code] == "sim" else "sim" for code in codes)
+        content = "\n".join(
+            [
+                header,
+                f"{self.patient.id},Triagem,false,{high}",
+                f"{self.patient.id},,true,{low}",
+                f"999,,false,{low}",
+                f"{self.patient.id},,talvez,{low.replace('sim', 'x', 1)}",
+            ]
+        )
+        response = self._upload("campanha.csv", content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["error_count"], 2)
+        first_error, second_error = response.data["errors"]
+        self.assertEqual(first_error["line"], 4)
+        self.assertIn("patient_id", first_error["errors"])
+        self.assertEqual(set(second_error["errors"]), {"is_follow_up", "responses"})
+
+        high_eval = EvaluationMChat.objects.get(observations="Triagem")
+        self.assertEqual(high_eval.total_score, 23)
+        self.assertEqual(high_eval.risk_level, EvaluationMChat.RISK_HIGH)
+        self.assertEqual(high_eval.professional, self.user)
+        self.assertTrue(high_eval.follow_up_recommendations)
+        low_eval = EvaluationMChat.objects.get(is_follow_up=True)
+        self.assertEqual(low_eval.total_score, 0)
+        self.assertEqual(verify_rollups(), [])
+
+    def test_jsonl_import_and_command(self):
+        lines = [
+            json.dumps({"patient_id": self.patient.id, "responses": self.risk_answers}),
+            "não é json",
+            json.dumps({"patient_id": self.patient.id, "responses": {"q1": "sim"}}),
+        ]
+        response = self._upload("lote.jsonl", "\n".join(lines))
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual([error["line"] for error in response.data["errors"]], [2, 3])
+
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", encoding="utf-8") as handle:
+            handle.write(lines[0] + "\n" + lines[0] + "\n")
+            handle.flush()
+            call_command(
+                "import_evaluations", handle.name, professional="tester", stdout=StringIO()
+            )
+        self.assertEqual(EvaluationMChat.objects.filter(total_score=23).count(), 3)
+        self.assertEqual(verify_rollups(), [])
+
+
+class PatientImportTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username="tester", password="123456")
+        self.other = User.objects.create_user(username="outro", password="123456")
+        self.client.force_authenticate(self.user)
+        self.existing = Patient.objects.create(
+            name="Paciente Antigo",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="144.544.174-82",
+            professional=self.user,
+        )
+        self.foreign = Patient.objects.create(
+            name="Paciente de Outro",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="11122233344",
+            professional=self.other,
+        )
+        self.content = "\n".join(
+            [
+                "name,birth_date,guardian_name,cpf,contact",
+                "Novo Paciente,2019-05-01,Mãe,987.654.321-00,(11) 9999-0000",
+                "Paciente Atualizado,2018-01-01,Pai,14454417482,(11) 8888-0000",
+                "Duplicado,2019-05-01,Mãe,98765432100,",
+                "Sem CPF,2019-05-01,Mãe,123,",
+                "Outro,2018-01-01,Pai,111.222.333-44,",
+            ]
+        )
+
+    def _upload(self, mode):
+        upload = SimpleUploadedFile("pacientes.csv", self.content.encode("utf-8"))
+        return self.client.post(
+            reverse("patient-import"), {"file": upload, "mode": mode}, format="multipart"
+        )
+
+    def test_skip_mode_keeps_existing_and_rejects_duplicates(self):
+        response = self._upload("skip")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["skipped"], 2)
+        self.assertEqual([error["line"] for error in response.data["errors"]], [4, 5])
+        self.assertEqual(Patient.objects.count(), 3)
+        created = Patient.objects.get(cpf="98765432100")
+        self.assertEqual(created.professional, self.user)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.name, "Paciente Antigo")
+
+    def test_update_mode_upserts_and_respects_ownership(self):
+        EvaluationMChat.objects.create(
+            patient=self.existing, professional=self.user, total_score=1
+        )
+        self.content = "\n".join(
+            [
+                "name,birth_date,guardian_name,cpf,professional_id",
+                f"Paciente Atualizado,2018-01-01,Pai,14454417482,{self.other.id}",
+                "Novo Paciente,2019-05-01,Mãe,98765432100,",
+                "Outro,2018-01-01,Pai,111.222.333-44,",
+            ]
+        )
+        response = self._upload("update")
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["updated"], 1)
+        self.assertEqual(response.data["errors"][0]["line"], 4)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.name, "Paciente Atualizado")
+        self.assertEqual(self.existing.cpf, "144.544.174-82")
+        self.assertEqual(self.existing.professional, self.other)
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.name, "Paciente de Outro")
+        self.assertEqual(verify_rollups(), [])
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username="tester", password="123456")
+        self.other = User.objects.create_user(username="outro", password="123456")
+        self.client.force_authenticate(self.user)
+        own = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="00000000000",
+            professional=self.user,
+        )
+        foreign = Patient.objects.create(
+            name="Paciente de Outro",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="00000000001",
+            professional=self.other,
+        )
+        responses = {q["code"]: q["risk_answer"] for q in MCHAT_QUESTIONS}
+        for patient, day in ((own, "2024-01-10"), (own, "2024-02-10"), (foreign, "2024-01-15")):
+            evaluation = EvaluationMChat(
+                patient=patient, professional=patient.professional, total_score=23
+            )
+            evaluation.responses = responses
+            evaluation.save()
+            EvaluationMChat.objects.filter(pk=evaluation.pk).update(
+                created_at=f"{day}T12:00:00-03:00"
+            )
+            SessionRecord.objects.create(
+                patient=patient, professional=patient.professional, session_date=day
+            )
+
+    def _content(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_evaluation_csv_export_streams_visible_rows(self):
+        response = self.client.get(reverse("evaluation-export"), {"to": "2024-01-31"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        lines = self._content(response).splitlines()
+        header = lines[0].split(",")
+        self.assertEqual(header[-23:], [q["code"] for q in MCHAT_QUESTIONS])
+        self.assertEqual(len(lines), 2)
+
+    def test_jsonl_exports_and_filters(self):
+        response = self.client.get(reverse("evaluation-export"), {"output": "jsonl"})
+        rows = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["responses"]["q1"], "nao")
+        self.assertLess(rows[0]["created_at"], rows[1]["created_at"])
+
+        response = self.client.get(
+            reverse("session-export"),
+            {"output": "jsonl", "from": "2024-02-01", "professional": self.user.id},
+        )
+        rows = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual([row["session_date"] for row in rows], ["2024-02-10"])
+
+        response = self.client.get(reverse("session-export"), {"output": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TempMediaMixin:
+    """MEDIA_ROOT e cache de PDF num diretório temporário, apagado após cada teste."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, PDF_CACHE_DIR=f"{self.media_root}/pdf_cache"
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class PdfJobTests(TempMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="tester", password="123456")
+        self.other = User.objects.create_user(username="outro", password="123456")
+        self.client.force_authenticate(self.user)
+        self.patient = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="00000000000",
+            professional=self.user,
+        )
+        self.foreign = Patient.objects.create(
+            name="Paciente de Outro",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="00000000001",
+            professional=self.other,
+        )
+        self.evaluation = EvaluationMChat(
+            patient=self.patient,
+            professional=self.user,
+            total_score=0,
+            clinical_interpretation="Baixo risco para TEA.",
+        )
+        self.evaluation.responses = {q["code"]: "sim" for q in MCHAT_QUESTIONS}
+        self.evaluation.save()
+        self.report = ClinicalReport.objects.create(
+            evaluation=self.evaluation, title="Relatório", content="Contexto clínico."
+        )
+        SessionRecord.objects.create(
+            patient=self.patient, professional=self.user, session_date="2024-01-10"
+        )
+
+    def _enqueue(self, kind, object_id):
+        return self.client.post(
+            reverse("pdf-job-list"), {"kind": kind, "object_id": object_id}, format="json"
+        )
+
+    def test_jobs_are_rendered_by_worker_pool(self):
+        jobs = [
+            self._enqueue(PdfJob.KIND_EVALUATION, self.evaluation.id),
+            self._enqueue(PdfJob.KIND_REPORT, self.report.id),
+            self._enqueue(PdfJob.KIND_GENERAL, self.patient.id),
+        ]
+        for response in jobs:
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(response.data["status"], PdfJob.STATUS_PENDING)
+            self.assertIsNone(response.data["download_url"])
+
+        pending = self.client.get(reverse("pdf-job-download", args=[jobs[0].data["id"]]))
+        self.assertEqual(pending.status_code, status.HTTP_409_CONFLICT)
+
+        self.assertEqual(run_worker(processes=2, once=True), 3)
+
+        for response in jobs:
+            detail = self.client.get(reverse("pdf-job-detail", args=[response.data["id"]]))
+            self.assertEqual(detail.data["status"], PdfJob.STATUS_DONE)
+            download = self.client.get(detail.data["download_url"])
+            self.assertEqual(download.status_code, status.HTTP_200_OK)
+            self.assertEqual(download["Content-Type"], "application/pdf")
+            self.assertTrue(b"".join(download.streaming_content).startswith(b"%PDF"))
+        self.report.refresh_from_db()
+        self.assertFalse(self.report.pdf_file)
+
+    def test_missing_object_fails_job(self):
+        job = PdfJob.objects.create(kind=PdfJob.KIND_GENERAL, object_id=0, requested_by=self.user)
+        self.assertEqual(run_worker(processes=0, once=True), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, PdfJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 1)
+
+    @override_settings(PDF_JOB_RETENTION_HOURS=24)
+    def test_old_finished_jobs_are_pruned(self):
+        now = timezone.now()
+        old, fresh, pending = (
+            PdfJob.objects.create(
+                kind=PdfJob.KIND_EVALUATION,
+                object_id=self.evaluation.id,
+                status=job_status,
+                pdf_content=b"%PDF-1.4",
+                finished_at=finished_at,
+            )
+            for job_status, finished_at in [
+                (PdfJob.STATUS_DONE, now - timedelta(hours=25)),
+                (PdfJob.STATUS_DONE, now - timedelta(hours=1)),
+                (PdfJob.STATUS_PENDING, None),
+            ]
+        )
+        PdfJob.objects.filter(id=pending.id).update(created_at=now - timedelta(days=3))
+
+        self.assertEqual(jobs.prune_jobs(now), 1)
+        self.assertFalse(PdfJob.objects.filter(id=old.id).exists())
+        self.assertEqual(PdfJob.objects.get(id=fresh.id).pdf_content, b"%PDF-1.4")
+        self.assertTrue(PdfJob.objects.filter(id=pending.id).exists())
+
+    def test_jobs_respect_visibility(self):
+        response = self._enqueue(PdfJob.KIND_GENERAL, self.foreign.id)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        foreign_job = PdfJob.objects.create(
+            kind=PdfJob.KIND_GENERAL, object_id=self.foreign.id, requested_by=self.other
+        )
+        response = self.client.get(reverse("pdf-job-detail", args=[foreign_job.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse("pdf-job-list")).data["results"], [])
+
+    def test_synchronous_endpoints_still_return_pdf(self):
+        response = self.client.get(reverse("evaluation-export-pdf", args=[self.evaluation.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.content.startswith(b"%PDF"))
+        response = self.client.post(reverse("report-generate-pdf", args=[self.report.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(
+            reverse("general-report"), {"patient_id": self.patient.id}, format="json"
+        )
+        self.assertTrue(response.streaming)
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+
+
+class PdfWrapTests(APITestCase):
+    def test_wrap_matches_whole_line_measurement(self):
+        paragraph = "Intervenção mediada por pares com comunicação alternativa. " * 40
+        paragraph += "Palavramuitolongaquenaocabenalinha " * 3
+        for width in (60, 200, 480):
+            lines = wrap_lines(paragraph, width, "Helvetica", 11)
+            self.assertEqual(" ".join(lines).split(), paragraph.split())
+            for line, following in zip(lines, lines[1:]):
+                if " " in line:
+                    self.assertLessEqual(stringWidth(line, "Helvetica", 11), width + 1e-6)
+                # guloso: a próxima palavra não caberia nesta linha
+                joined = f"{line} {following.split()[0]}"
+                self.assertGreater(stringWidth(joined, "Helvetica", 11), width - 1e-6)
+        self.assertEqual(wrap_lines("a\n\nb", 100, "Helvetica", 11), ["a", "", "b"])
+
+
+class PdfLayoutTests(APITestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="tester", password="123456")
+        patient = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="00000000000",
+            professional=user,
+        )
+        self.evaluation = EvaluationMChat.objects.create(
+            patient=patient,
+            professional=user,
+            total_score=0,
+            clinical_interpretation="Baixo risco para TEA.",
+        )
+
+    def test_long_notes_continue_on_new_pages(self):
+        context = evaluation_context(self.evaluation)
+        single = render_evaluation(context)
+        context["observations"] = "Observação clínica detalhada. " * 1500
+        content = render_evaluation(context)
+        self.assertIn(b"/Count 1 ", single)
+        pages = int(re.search(rb"/Count (\d+)", content).group(1))
+        self.assertGreater(pages, 1)
+        # cabeçalho e rodapé definidos uma vez e referenciados em cada página
+        self.assertEqual(content.count(b"/Subtype /Form"), 1)
+
+
+class PdfCacheTests(TempMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        user = get_user_model().objects.create_user(username="tester", password="123456")
+        self.client.force_authenticate(user)
+        patient = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="00000000000",
+            professional=user,
+        )
+        self.evaluation = EvaluationMChat(
+            patient=patient,
+            professional=user,
+            total_score=0,
+            clinical_interpretation="Baixo risco para TEA.",
+        )
+        self.evaluation.responses = {q["code"]: "sim" for q in MCHAT_QUESTIONS}
+        self.evaluation.save()
+        self.report = ClinicalReport.objects.create(
+            evaluation=self.evaluation, title="Relatório", content="Contexto clínico."
+        )
+
+    def test_unchanged_pdf_is_served_from_cache_with_etag(self):
+        url = reverse("evaluation-export-pdf", args=[self.evaluation.id])
+        first = self.client.get(url)
+        etag = first["ETag"]
+        self.assertTrue(etag)
+
+        with mock.patch("clinical.pdf.render_evaluation") as render:
+            cached = self.client.get(url)
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        render.assert_not_called()
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified["ETag"], etag)
+
+        self.evaluation.observations = "Nova observação."
+        self.evaluation.save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed["ETag"], etag)
+
+    def test_generate_pdf_keeps_file_while_report_is_unchanged(self):
+        url = reverse("report-generate-pdf", args=[self.report.id])
+        first = self.client.post(url).data["pdf_file"]
+        self.assertEqual(self.client.post(url).data["pdf_file"], first)
+        self.report.content = "Contexto atualizado."
+        self.report.save()
+        self.assertNotEqual(self.client.post(url).data["pdf_file"], first)
+
+    def test_general_report_is_cached_under_the_rows_it_draws(self):
+        patient = Patient.objects.get(id=self.evaluation.patient_id)
+        session = SessionRecord.objects.create(
+            patient=patient, professional=patient.professional, session_date="2024-01-10"
+        )
+        stale = pdf_digest(PdfJob.KIND_GENERAL, jobs.general_context(patient))
+        original = views.cached_file
+
+        def edit_between_passes(*args, **kwargs):
+            # a sessão muda depois do hash e antes do desenho
+            SessionRecord.objects.filter(id=session.id).update(objectives="Novo objetivo.")
+            return original(*args, **kwargs)
+
+        url = reverse("general-report")
+        with mock.patch.object(views, "cached_file", side_effect=edit_between_passes):
+            response = self.client.post(url, {"patient_id": patient.id}, format="json")
+        content = b"".join(response.streaming_content)
+        digest = response["ETag"].strip('"')
+
+        self.assertNotEqual(digest, stale)
+        self.assertEqual(digest, pdf_digest(PdfJob.KIND_GENERAL, jobs.general_context(patient)))
+        self.assertEqual(get_cache().get(digest), content)
+        self.assertIsNone(get_cache().get(stale))
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = PdfCache(f"{self.media_root}/lru", max_bytes=250)
+        for age, digest in enumerate(("aa01", "bb02"), start=1):
+            cache.put(digest, b"x" * 100)
+            os.utime(cache._path(digest), (age, age))
+        cache.get("aa01")
+        cache.put("cc03", b"x" * 100)
+        self.assertIsNotNone(cache.get("aa01"))
+        self.assertIsNone(cache.get("bb02"))
+        self.assertIsNotNone(cache.get("cc03"))
+
+    def test_cache_writes_scan_directory_only_past_the_limit(self):
+        cache = PdfCache(f"{self.media_root}/estimate", max_bytes=1000)
+        with mock.patch.object(Path, "glob", autospec=True, side_effect=Path.glob) as glob:
+            for index in range(9):
+                cache.put(f"{index:04d}", b"x" * 100)
+            # só a primeira gravação do processo percorre o diretório
+            self.assertEqual(glob.call_count, 1)
+            cache.put("0009", b"x" * 100)
+            cache.put("0010", b"x" * 100)
+        self.assertEqual(glob.call_count, 2)
+        remaining = list(Path(cache.directory).glob("*/*.pdf"))
+        self.assertLessEqual(sum(path.stat().st_size for path in remaining), 900)
+
+
+class GeneralReportBatchTests(TempMediaMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.user = User.objects.create_user(username="tester", password="123456")
+        other = User.objects.create_user(username="outro", password="123456")
+        self.client.force_authenticate(self.user)
+        self.patient = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="00000000000",
+            professional=self.user,
+        )
+        self.foreign = Patient.objects.create(
+            name="Paciente de Outro",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="00000000001",
+            professional=other,
+        )
+        evaluation = EvaluationMChat(patient=self.patient, professional=self.user, total_score=0)
+        evaluation.responses = {q["code"]: "sim" for q in MCHAT_QUESTIONS}
+        evaluation.save()
+        SessionRecord.objects.create(
+            patient=self.patient, professional=self.user, session_date="2024-01-10"
+        )
+
+    def test_batch_zip_contains_one_report_per_patient(self):
+        second = Patient.objects.create(
+            name="Segundo Paciente",
+            birth_date="2019-05-01",
+            guardian_name="Responsável",
+            cpf="00000000002",
+            professional=self.user,
+        )
+        url = reverse("general-report-batch")
+        with self.settings(PDF_BATCH_PROCESSES=2):
+            response = self.client.post(
+                url, {"patient_ids": [self.patient.id, second.id]}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+        names = archive.namelist()
+        self.assertEqual(len(names), 2)
+        self.assertTrue(names[0].startswith(f"relatorio-geral_{self.patient.id}_"))
+        for name in names:
+            self.assertTrue(archive.read(name).startswith(b"%PDF"))
+
+        # filtro padrão: pacientes ativos do profissional, já em cache
+        with self.settings(PDF_BATCH_PROCESSES=0):
+            response = self.client.post(url, {}, format="json")
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 2)
+
+        response = self.client.post(url, {"patient_ids": [self.foreign.id]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requests_share_one_render_pool(self):
+        self.addCleanup(jobs.batch_pool, 0)
+        url = reverse("general-report-batch")
+        with self.settings(PDF_BATCH_PROCESSES=1), mock.patch.object(
+            jobs, "_new_pool", wraps=jobs._new_pool
+        ) as new_pool:
+            for _ in range(2):
+                # cache vazio, para que os PDFs passem pelo pool nas duas requisições
+                shutil.rmtree(f"{self.media_root}/pdf_cache", ignore_errors=True)
+                response = self.client.post(url, {"patient_ids": [self.patient.id]}, format="json")
+                archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+                self.assertTrue(archive.read(archive.namelist()[0]).startswith(b"%PDF"))
+        new_pool.assert_called_once_with(1)
+
+
+class GeneralReportStreamingTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="tester", password="123456")
+        self.patient = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="00000000000",
+            professional=self.user,
+        )
+        for index in range(4):
+            EvaluationMChat.objects.create(
+                patient=self.patient, total_score=index, risk_level="baixo"
+            )
+            SessionRecord.objects.create(patient=self.patient, session_date=f"2024-01-1{index}")
+        self.patient.refresh_from_db()
+
+    def test_rows_are_read_while_the_pdf_is_drawn(self):
+        read = []
+
+        def counting(row):
+            def wrapper(instance):
+                read.append(instance.pk)
+                return row(instance)
+
+            return wrapper
+
+        drawn = []
+        original_paragraph = PageLayout.paragraph
+
+        def paragraph(layout, text, *args, **kwargs):
+            drawn.append(len(read))
+            return original_paragraph(layout, text, *args, **kwargs)
+
+        with mock.patch("clinical.pdf.evaluation_row", counting(evaluation_row)), mock.patch(
+            "clinical.pdf.session_row", counting(session_row)
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                context = general_report_context(
+                    self.patient,
+                    self.patient.evaluations.order_by("-created_at"),
+                    self.patient.sessions.order_by("-session_date"),
+                    timezone.now(),
+                )
+            self.assertEqual(len(queries), 0)
+
+            with mock.patch.object(
+                QuerySet, "iterator", autospec=True, side_effect=QuerySet.iterator
+            ) as iterator, mock.patch.object(
+                PageLayout, "paragraph", autospec=True, side_effect=paragraph
+            ), CaptureQueriesContext(connection) as queries:
+                content = render_general_report(context)
+
+        self.assertTrue(content.startswith(b"%PDF"))
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(
+            [call.kwargs for call in iterator.call_args_list], [{"chunk_size": 500}] * 2
+        )
+        # cada bloco é desenhado logo depois de a sua linha ser lida, sem ler tudo antes
+        self.assertEqual(drawn, list(range(9)))
+
+
+class FlexFieldsTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="tester", first_name="Ana", password="123456"
+        )
+        self.client.force_authenticate(self.user)
+        self.patient = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="00000000000",
+            professional=self.user,
+        )
+        self.evaluation = EvaluationMChat(
+            patient=self.patient, professional=self.user, total_score=0
+        )
+        self.evaluation.responses = {q["code"]: "sim" for q in MCHAT_QUESTIONS}
+        self.evaluation.save()
+
+    def test_list_returns_ids_unless_expanded(self):
+        url = reverse("evaluation-list")
+        row = self.client.get(url).data["results"][0]
+        self.assertEqual(row["patient"], self.patient.id)
+        self.assertEqual(row["professional"], self.user.id)
+        self.assertIn("responses", row)
+
+        row = self.client.get(url, {"expand": "patient.professional"}).data["results"][0]
+        self.assertEqual(row["patient"]["name"], "Paciente Teste")
+        self.assertEqual(row["patient"]["professional"]["first_name"], "Ana")
+        self.assertEqual(row["professional"], self.user.id)
+
+    def test_fields_limit_output_including_nested_paths(self):
+        response = self.client.get(
+            reverse("evaluation-list"),
+            {"fields": "id,risk_label,patient.name", "expand": "patient"},
+        )
+        row = response.data["results"][0]
+        self.assertEqual(set(row), {"id", "risk_label", "patient"})
+        self.assertEqual(row["patient"], {"name": "Paciente Teste"})
+
+    def test_unknown_fields_are_rejected(self):
+        url = reverse("evaluation-list")
+        for fields in ("id,nome", "risk_label.name", "patient.nome"):
+            response = self.client.get(url, {"fields": fields, "expand": "patient"})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, fields)
+            self.assertIn("fields", response.data)
+
+    def test_detail_and_create_stay_expanded(self):
+        detail = self.client.get(reverse("evaluation-detail", args=[self.evaluation.id]))
+        self.assertEqual(detail.data["patient"]["professional"]["id"], self.user.id)
+        response = self.client.post(
+            reverse("session-list") + "?fields=id,patient",
+            {"patient_id": self.patient.id, "session_date": "2024-03-01"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(response.data), {"id", "patient"})
+        self.assertEqual(response.data["patient"]["name"], "Paciente Teste")
+
+
+class QueryCountTests(APITestCase):
+    """O número de consultas de cada endpoint não pode crescer com a quantidade de registros."""
+
+    SIZES = (1, 10, 100)
+    ENDPOINTS = [
+        ("patient-list", {}),
+        ("patient-list", {"expand": "*"}),
+        ("evaluation-list", {}),
+        ("evaluation-list", {"expand": "*"}),
+        ("evaluation-list", {"fields": "id,patient.name", "expand": "patient"}),
+        ("report-list", {}),
+        ("report-list", {"expand": "*"}),
+        ("session-list", {}),
+        ("session-list", {"expand": "*"}),
+        ("evaluation-export", {}),
+        ("session-export", {"output": "jsonl"}),
+        ("pdf-job-list", {}),
+        ("dashboard-summary", {}),
+        ("item-analytics", {}),
+    ]
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user(
+            username="coordenacao", password="123456", is_staff=True
+        )
+        self.client.force_authenticate(self.staff)
+        self.seeded = 0
+
+    def _seed(self, count):
+        # cada linha com profissional próprio, para que um acesso por linha apareça
+        User = get_user_model()
+        for index in range(self.seeded, count):
+            professional = User.objects.create_user(username=f"profissional{index}")
+            patient = Patient.objects.create(
+                name=f"Paciente {index}",
+                birth_date="2018-01-01",
+                guardian_name="Responsável",
+                cpf=f"{index:011d}",
+                professional=professional,
+            )
+            evaluation = EvaluationMChat.objects.create(
+                patient=patient, professional=professional, total_score=index % 20
+            )
+            ClinicalReport.objects.create(evaluation=evaluation, title="Relatório", content="-")
+            SessionRecord.objects.create(
+                patient=patient, professional=professional, session_date="2024-03-01"
+            )
+            PdfJob.objects.create(
+                kind=PdfJob.KIND_EVALUATION, object_id=evaluation.id, requested_by=self.staff
+            )
+        self.seeded = count
+
+    def _count_queries(self, name, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(name), {"page_size": 500, **params})
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, name)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        counts = {}
+        for size in self.SIZES:
+            self._seed(size)
+            for name, params in self.ENDPOINTS:
+                key = (name, tuple(sorted(params.items())))
+                counts.setdefault(key, []).append(self._count_queries(name, params))
+        for (name, params), found in counts.items():
+            with self.subTest(endpoint=name, params=dict(params)):
+                # consultas com 1, 10 e 100 registros
+                self.assertEqual(found, [found[0]] * len(self.SIZES))
+
+    def test_general_report_query_count_does_not_grow_with_rows(self):
+        # o relatório geral é de um paciente só: as linhas crescem dentro dele
+        patient = Patient.objects.create(
+            name="Paciente Geral",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="99999999999",
+            professional=self.staff,
+        )
+        found = []
+        seeded = 0
+        for size in self.SIZES:
+            for index in range(seeded, size):
+                EvaluationMChat.objects.create(
+                    patient=patient,
+                    professional=self.staff,
+                    total_score=index % 20,
+                    is_follow_up=index % 2 == 1,
+                )
+                SessionRecord.objects.create(
+                    patient=patient, professional=self.staff, session_date="2024-03-01"
+                )
+            seeded = size
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(reverse("general-report"), {"patient": patient.id})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data["sessions"]), size)
+            found.append(len(context.captured_queries))
+        self.assertEqual(found, [found[0]] * len(self.SIZES))
+
+
+class ValuesListTests(APITestCase):
+    """As listagens via ``.values()`` devem gerar exatamente o mesmo JSON do serializer."""
+
+    CASES = [
+        ("patient-list", {}),
+        ("patient-list", {"expand": "*", "archived": "true"}),
+        ("patient-list", {"fields": "id,name,clinical_attachment,professional.email"}),
+        ("evaluation-list", {}),
+        ("evaluation-list", {"expand": "*"}),
+        ("evaluation-list", {"fields": "id,risk_label,patient.name", "expand": "patient"}),
+        ("evaluation-list", {"page_size": 2}),
+        ("report-list", {}),
+        ("report-list", {"expand": "evaluation.patient.professional"}),
+        ("session-list", {"expand": "*"}),
+        ("session-list", {"fields": "session_date,session_type", "page_size": 3}),
+    ]
+
+    def setUp(self):
+        User = get_user_model()
+        self.staff = User.objects.create_user(
+            username="coordenacao", first_name="Coordenação", password="123456", is_staff=True
+        )
+        self.professional = User.objects.create_user(
+            username="tester", first_name="Ana", email="ana@example.com", password="123456"
+        )
+        for index in range(4):
+            patient = Patient.objects.create(
+                name=f"Paciente {index} — ção",
+                birth_date=f"2018-0{index + 1}-15",
+                guardian_name="Responsável",
+                cpf=f"{index:011d}",
+                professional=None if index == 3 else self.professional,
+                archived=index == 2,
+                clinical_attachment="uploads/patient_reports/laudo.pdf" if index == 1 else None,
+            )
+            evaluation = EvaluationMChat(
+                patient=patient,
+                professional=self.professional if index % 2 else None,
+                total_score=index * 3,
+                risk_level=["baixo", "moderado", "alto", "outro"][index],
+                is_follow_up=bool(index % 2),
+                observations='Observação\n"aspas"',
+            )
+            answer = "sim" if index % 2 else "nao"
+            evaluation.responses = {q["code"]: answer for q in MCHAT_QUESTIONS}
+            evaluation.save()
+            ClinicalReport.objects.create(
+                evaluation=evaluation,
+                title=f"Relatório {index}",
+                content="Conteúdo",
+                pdf_file="uploads/generated_reports/r.pdf" if index == 0 else None,
+            )
+            SessionRecord.objects.create(
+                patient=patient,
+                professional=self.professional if index else None,
+                session_date=f"2024-03-0{index + 1}",
+                session_type=SessionRecord.SESSION_TYPES[index][0],
+            )
+
+    def test_output_matches_serializer(self):
+        for user in (self.staff, self.professional):
+            self.client.force_authenticate(user)
+            for name, params in self.CASES:
+                with self.subTest(user=user.username, endpoint=name, params=params):
+                    # o caminho rápido não pode recorrer ao serializer
+                    with mock.patch.object(
+                        serializers.Serializer, "to_representation", side_effect=AssertionError
+                    ):
+                        fast = self.client.get(reverse(name), params)
+                    with mock.patch("clinical.views.compile_rows", return_value=None):
+                        slow = self.client.get(reverse(name), params)
+                    self.assertEqual(fast.status_code, status.HTTP_200_OK)
+                    self.assertEqual(fast.content, slow.content)
+
+
+@override_settings(SERVER_TIMING=True, SLOW_REQUEST_MS=60_000)
+class ServerTimingTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="tester", password="123456")
+        self.patient = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="00000000000",
+            professional=self.user,
+        )
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+    def _metrics(self, response):
+        metrics = {}
+        for metric in response["Server-Timing"].split(", "):
+            name, *params = metric.split(";")
+            metrics[name] = dict(param.split("=", 1) for param in params)
+        return metrics
+
+    def test_header_reports_sql_view_render_and_auth(self):
+        with warnings.catch_warnings():
+            # SECRET_KEY de desenvolvimento, curta demais para o PyJWT
+            warnings.simplefilter("ignore")
+            token = self.client.post(
+                reverse("token_obtain_pair"), {"username": "tester", "password": "123456"}
+            ).data["access"]
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(reverse("patient-list"))
+        metrics = self._metrics(response)
+        self.assertEqual(metrics["db"]["desc"], f'"{len(context.captured_queries)} consultas"')
+        self.assertEqual(set(metrics), {"db", "auth", "view", "render", "total"})
+        self.assertLessEqual(float(metrics["view"]["dur"]), float(metrics["total"]["dur"]))
+
+    def test_pdf_spans_and_slow_request_log(self):
+        evaluation = EvaluationMChat.objects.create(
+            patient=self.patient, professional=self.user, total_score=0
+        )
+        self.client.force_authenticate(self.user)
+        with override_settings(SLOW_REQUEST_MS=0, PDF_CACHE_DIR=self.cache_dir):
+            with self.assertLogs("clinical.timing", "WARNING") as logs:
+                response = self.client.get(
+                    reverse("evaluation-export-pdf", args=[evaluation.id])
+                )
+        self.assertIn("pdf_context", self._metrics(response))
+        self.assertIn("pdf", self._metrics(response))
+        self.assertIn("export_pdf", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+
+    @override_settings(SERVER_TIMING=False)
+    def test_disabled_by_default(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("patient-list"))
+        self.assertNotIn("Server-Timing", response)
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.staff = User.objects.create_user(username="coordenacao", is_staff=True)
+        self.user = User.objects.create_user(username="tester")
+        self.patient = Patient.objects.create(
+            name="Paciente Teste",
+            birth_date="2018-01-01",
+            guardian_name="Responsável",
+            cpf="00000000000",
+            professional=self.user,
+        )
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+    def _value(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_are_counted_per_view_and_action(self):
+        self.client.force_authenticate(self.user)
+        before = self._value(
+            "tea_http_requests_total",
+            view="PatientViewSet",
+            action="list",
+            method="GET",
+            status="200",
+        )
+        self.client.get(reverse("patient-list"))
+        self.assertEqual(
+            self._value(
+                "tea_http_requests_total",
+                view="PatientViewSet",
+                action="list",
+                method="GET",
+                status="200",
+            ),
+            before + 1,
+        )
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        content = response.content.decode()
+        self.assertIn(
+            'tea_http_request_duration_seconds_count{action="list",method="GET",'
+            'view="PatientViewSet"}',
+            content,
+        )
+        self.assertIn(
+            'tea_http_request_db_queries_sum{action="list",view="PatientViewSet"}', content
+        )
+
+    @override_settings(METRICS_TOKEN="segredo")
+    def test_scrape_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer segredo")
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer outro")
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+
+    def test_scoring_and_pdf_render_metrics(self):
+        self.client.force_authenticate(self.user)
+        scorings = self._value("tea_mchat_scorings_total", source="single")
+        renders = self._value("tea_pdf_render_duration_seconds_count", kind="evaluation")
+        response = self.client.post(
+            reverse("evaluation-list"),
+            {
+                "patient_id": self.patient.id,
+                "responses": {q["code"]: "sim" for q in MCHAT_QUESTIONS},
+            },
+            format="json",
+        )
+        self.assertEqual(self._value("tea_mchat_scorings_total", source="single"), scorings + 1)
+        with override_settings(PDF_CACHE_DIR=self.cache_dir):
+            url = reverse("evaluation-export-pdf", args=[response.data["id"]])
+            self.client.get(url)
+            self.client.get(url)
+        # a segunda vem do cache
+        self.assertEqual(
+            self._value("tea_pdf_render_duration_seconds_count", kind="evaluation"), renders + 1
+        )
+
+    def test_worker_render_times_are_observed_once_at_collection(self):
+        evaluation = EvaluationMChat(patient=self.patient, professional=self.user, total_score=0)
+        evaluation.responses = {q["code"]: "sim" for q in MCHAT_QUESTIONS}
+        evaluation.save()
+        job = PdfJob.objects.create(kind=PdfJob.KIND_EVALUATION, object_id=evaluation.id)
+        renders = self._value("tea_pdf_render_duration_seconds_count", kind="evaluation")
+        with override_settings(PDF_CACHE_DIR=self.cache_dir):
+            self.assertEqual(run_worker(processes=0, once=True), 1)
+        job.refresh_from_db()
+        self.assertIsNotNone(job.render_seconds)
+
+        # o worker é outro serviço: o tempo só entra nas métricas na coleta do web
+        self.client.force_authenticate(self.staff)
+        for _ in range(2):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+            self.assertEqual(
+                self._value("tea_pdf_render_duration_seconds_count", kind="evaluation"),
+                renders + 1,
+            )
+        job.refresh_from_db()
+        self.assertIsNone(job.render_seconds)
+
+    def test_counters_are_summed_across_processes(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": directory}
+        # dois processos registram pontuações; um terceiro coleta a soma
+        script = "from clinical import metrics; metrics.count_scorings('batch', {})"
+        for count in (3, 4):
+            subprocess.run([sys.executable, "-c", script.format(count)], env=env, check=True)
+        collect = "from clinical import metrics; print(metrics.collect().decode())"
+        output = subprocess.run(
+            [sys.executable, "-c", collect],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        self.assertIn('tea_mchat_scorings_total{source="batch"} 7.0', output)
+
+
+class SeedClinicTests(APITestCase):
+    SIZES = {
+        "professionals": 3,
+        "patients": 40,
+        "evaluations": 120,
+        "sessions": 60,
+        "reports": 15,
+    }
+
+    def _seed(self, seed=5):
+        call_command("seed_clinic", seed=seed, stdout=StringIO(), **self.SIZES)
+
+    def _snapshot(self):
+        return (
+            list(Patient.objects.order_by("cpf").values_list("cpf", "name", "created_at")),
+            list(
+                EvaluationMChat.objects.order_by("created_at", "id").values_list(
+                    "patient__cpf", "responses_bits", "risk_level", "is_follow_up", "created_at"
+                )
+            ),
+            list(
+                SessionRecord.objects.order_by("created_at", "id").values_list(
+                    "patient__cpf", "session_type", "interventions", "created_at"
+                )
+            ),
+        )
+
+    def test_generates_consistent_clinic(self):
+        call_command("seed_clinic", seed=5, password="carga-123", stdout=StringIO(), **self.SIZES)
+        professional = get_user_model().objects.get(username="seed5_prof0000")
+        self.assertTrue(professional.check_password("carga-123"))
+        self.assertEqual(professional.email, "seed5_prof0000@example.com")
+        self.assertEqual(Patient.objects.count(), 40)
+        self.assertEqual(EvaluationMChat.objects.count(), 120)
+        self.assertEqual(SessionRecord.objects.count(), 60)
+        self.assertEqual(ClinicalReport.objects.count(), 15)
+
+        self.assertEqual(cpf_with_check_digits("529982247"), "52998224725")
+        cpfs = list(Patient.objects.values_list("cpf", flat=True))
+        self.assertEqual(len(set(cpfs)), len(cpfs))
+        self.assertTrue(all(cpf_with_check_digits(cpf[:9]) == cpf for cpf in cpfs))
+
+        first_visits = {}
+        for evaluation in EvaluationMChat.objects.order_by("created_at", "id"):
+            risk_count, risk_level, _ = score_bits(evaluation.responses_bits)
+            self.assertEqual(
+                (evaluation.total_score, evaluation.risk_level), (risk_count, risk_level)
+            )
+            self.assertEqual(evaluation.is_follow_up, evaluation.patient_id in first_visits)
+            first_visits.setdefault(evaluation.patient_id, evaluation.created_at)
+            self.assertGreaterEqual(evaluation.created_at, evaluation.patient.created_at)
+        self.assertEqual(len(first_visits), 40)
+        self.assertEqual(verify_rollups(), [])
+
+        # ids atribuídos pelo gerador não podem colidir com os próximos registros
+        patient = Patient.objects.create(
+            name="Novo", birth_date="2024-01-01", guardian_name="Mãe", cpf="52998224725"
+        )
+        self.assertEqual(patient.id, max(Patient.objects.values_list("id", flat=True)))
+
+    def test_same_seed_generates_same_data(self):
+        snapshots = []
+        for seed in (5, 5, 6):
+            with transaction.atomic():
+                self._seed(seed)
+                snapshots.append(self._snapshot())
+                if seed == 5:
+                    with self.assertRaises(CommandError):
+                        self._seed(seed)
+                transaction.set_rollback(True)
+        self.assertEqual(snapshots[0], snapshots[1])
+        self.assertNotEqual(snapshots[0][0], snapshots[2][0])
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.professional = User.objects.create_user(
+            username="tester", first_name="Ana", email="ana@example.com", password="123456"
+        )
+        self.client.force_authenticate(self.professional)
+        self.patient = Patient.objects.create(
+            name="Paciente",
+            birth_date="2022-01-15",
+            guardian_name="Responsável",
+            cpf="00000000001",
+            professional=self.professional,
+        )
+        self.evaluations = []
+        for answer in ("sim", "nao"):
+            evaluation = EvaluationMChat(
+                patient=self.patient,
+                professional=self.professional,
+                total_score=0,
+                risk_level="baixo",
+            )
+            evaluation.responses = {q["code"]: answer for q in MCHAT_QUESTIONS}
+            evaluation.save()
+            self.evaluations.append(evaluation)
+
+    def _revalidate(self, url, params, response):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def test_unchanged_list_is_not_serialized_again(self):
+        url = reverse("evaluation-list")
+        for values, params in itertools.product(
+            (True, False), ({}, {"expand": "patient"}, {"page_size": 1})
+        ):
+            with self.subTest(values=values, params=params), mock.patch(
+                "clinical.views.compile_rows", wraps=compile_rows if values else lambda _: None
+            ):
+                first = self.client.get(url, params)
+                self.assertEqual(first.status_code, status.HTTP_200_OK)
+                self.assertIn("private", first["Cache-Control"])
+                self.assertIn("Authorization", first["Vary"])
+                self.assertNotIn("Last-Modified", first)
+                with mock.patch.object(
+                    serializers.Serializer, "to_representation", side_effect=AssertionError
+                ):
+                    again = self._revalidate(url, params, first)
+                self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual(again["ETag"], first["ETag"])
+                self.assertEqual(again.content, b"")
+
+    def test_list_etag_follows_changes(self):
+        url = reverse("evaluation-list")
+        params = {"expand": "patient"}
+        first = self.client.get(url, params)
+        # outro formato ou outro filtro não reaproveitam a ETag
+        self.assertNotEqual(self.client.get(url, {"page_size": 1})["ETag"], first["ETag"])
+
+        Patient.objects.filter(pk=self.patient.pk).update(name="Paciente Renomeado")
+        renamed = self._revalidate(url, params, first)
+        self.assertEqual(renamed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(renamed["ETag"], first["ETag"])
+
+        self.evaluations[0].delete()
+        deleted = self._revalidate(url, params, renamed)
+        self.assertEqual(deleted.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(deleted.json()["results"]), 1)
+
+    def test_detail_revalidation(self):
+        evaluation = self.evaluations[1]
+        url = reverse("evaluation-detail", args=[evaluation.pk])
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", first)
+        self.assertEqual(
+            self._revalidate(url, {}, first).status_code, status.HTTP_304_NOT_MODIFIED
+        )
+        since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Patient.objects.filter(pk=self.patient.pk).update(guardian_name="Outro Responsável")
+        changed = self._revalidate(url, {}, first)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(changed.json()["patient"]["guardian_name"], "Outro Responsável")
+
+    def test_archive_updates_timestamp(self):
+        before = self.patient.updated_at
+        response = self.client.post(reverse("patient-archive", args=[self.patient.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.patient.refresh_from_db()
+        self.assertGreater(self.patient.updated_at, before)
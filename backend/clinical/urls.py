@@ -6,8 +6,12 @@ from .views import (
     DashboardSummaryView,
     EvaluationViewSet,
     HelpContentView,
+    ItemAnalyticsView,
+    MetricsView,
     PatientViewSet,
+    PdfJobViewSet,
     SessionRecordViewSet,
+    GeneralReportBatchView,
     GeneralReportView,
 )
 
@@ -16,10 +20,18 @@ router.register(r"patients", PatientViewSet, basename="patient")
 router.register(r"evaluations", EvaluationViewSet, basename="evaluation")
 router.register(r"reports", ClinicalReportViewSet, basename="report")
 router.register(r"sessions", SessionRecordViewSet, basename="session")
+router.register(r"pdf-jobs", PdfJobViewSet, basename="pdf-job")
 
 urlpatterns = [
     path("reports/general/", GeneralReportView.as_view(), name="general-report"),
+    path(
+        "reports/general/batch/",
+        GeneralReportBatchView.as_view(),
+        name="general-report-batch",
+    ),
     path("dashboard/summary/", DashboardSummaryView.as_view(), name="dashboard-summary"),
+    path("analytics/items/", ItemAnalyticsView.as_view(), name="item-analytics"),
     path("help/", HelpContentView.as_view(), name="help-content"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
     path("", include(router.urls)),
 ]
@@ -1,68 +1,270 @@
+import hashlib
+from datetime import datetime, time, timedelta
 from io import BytesIO
-from datetime import date, datetime, time
 
+from django.conf import settings
 from django.core.files.base import ContentFile
-from django.db.models import Avg, Count, Q
-from django.http import HttpResponse
+from django.db.models import Count, DateField, Q
+from django.db.models.functions import TruncWeek
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from reportlab.lib.colors import HexColor
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import cm, mm
-from reportlab.pdfgen import canvas
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, BasePermission
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 
+from .analytics import CRITICAL_CODES, GROUP_FIELDS, item_prevalence
+from .authentication import MetricsTokenAuthentication
 from .constants import MCHAT_QUESTIONS, RISK_LABELS
-from .models import ClinicalReport, EvaluationMChat, Patient, SessionRecord
+from .exports import (
+    EVALUATION_FIELDS,
+    SESSION_FIELDS,
+    day_range_filter,
+    evaluation_row,
+    export_response,
+    zip_stream,
+)
+from .importers import FORMATS, EvaluationImporter, PatientImporter, open_upload, read_rows
+from .jobs import enqueue, observe_worker_renders, render_general_reports
+from .metrics import CONTENT_TYPE, collect, count_scorings
+from .middleware import span
+from .models import (
+    ClinicalReport,
+    DashboardRollup,
+    EvaluationMChat,
+    Patient,
+    PdfJob,
+    SessionRecord,
+)
+from .pagination import (
+    EvaluationCursorPagination,
+    PatientCursorPagination,
+    PdfJobCursorPagination,
+    SessionCursorPagination,
+)
+from .pdf import evaluation_context, general_report_context, report_context, to_ascii
+from .pdf_cache import cached_file, cached_render, pdf_digest
+from .rollups import next_month, subtract_months
+from .rows import compile_rows
+from .scoring import (
+    ALL_MASK,
+    RISK_LEVELS,
+    ResponseError,
+    encode_responses,
+    score_batch,
+)
 from .serializers import (
     ClinicalReportSerializer,
     EvaluationMChatSerializer,
+    GeneralReportBatchSerializer,
     PatientSerializer,
+    PdfJobSerializer,
     SessionRecordSerializer,
 )
 
 
-def to_ascii(value):
-    if value is None:
-        return ""
-    if not isinstance(value, str):
-        value = str(value)
-    try:
-        return value.encode("latin-1", "ignore").decode("latin-1")
-    except Exception:
-        return value
-
-
-def draw_wrapped_text(pdf, text, x, y, width, line_height, font="Helvetica", size=11):
-    pdf.setFont(font, size)
-    text = to_ascii(text)
-    lines = []
-    for paragraph in text.split("\n"):
-        current_line = ""
-        for word in paragraph.split():
-            test_line = f"{current_line} {word}".strip()
-            if pdf.stringWidth(test_line, font, size) <= width:
-                current_line = test_line
-            else:
-                if current_line:
-                    lines.append(current_line)
-                current_line = word
-        lines.append(current_line)
-    for line in lines:
-        pdf.drawString(x, y, line)
-        y -= line_height
-    return y
-
-
-class PatientViewSet(viewsets.ModelViewSet):
-    queryset = Patient.objects.all()
+def pdf_response(content, filename, digest=None):
+    if isinstance(content, bytes):
+        response = HttpResponse(content, content_type="application/pdf")
+    else:
+        # arquivo aberto: o FileResponse envia em blocos e o fecha ao final
+        response = FileResponse(content, content_type="application/pdf")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if digest:
+        response["ETag"] = f'"{digest}"'
+        # o navegador guarda o PDF, mas revalida com If-None-Match a cada download
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def run_import(request, importer):
+    upload = request.FILES.get("file")
+    if upload is None:
+        return Response(
+            {"detail": "Envie o arquivo CSV ou JSONL no campo file."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    file_format = request.data.get("file_format") or None
+    if file_format is not None and file_format not in FORMATS:
+        return Response(
+            {"file_format": "Utilize 'csv' ou 'jsonl'."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    report = importer.run(read_rows(open_upload(upload), upload.name, file_format))
+    success = report["created"] or report.get("updated") or report.get("skipped")
+    return Response(
+        report,
+        status=status.HTTP_201_CREATED if success else status.HTTP_400_BAD_REQUEST,
+    )
+
+
+def filter_export(request, queryset, date_field, is_datetime=True):
+    """Aplica os filtros from/to (AAAA-MM-DD) e professional das exportações."""
+    params = request.query_params
+    bounds = []
+    for name in ("from", "to"):
+        value = parse_day(params.get(name)) if params.get(name) else None
+        if params.get(name) and value is None:
+            raise ValidationError({name: "Data inválida. Utilize AAAA-MM-DD."})
+        bounds.append(value)
+    queryset = queryset.filter(**day_range_filter(date_field, *bounds, is_datetime=is_datetime))
+    professional_id = params.get("professional")
+    if professional_id:
+        if not professional_id.isdigit():
+            raise ValidationError({"professional": "Profissional inválido."})
+        queryset = queryset.filter(professional_id=professional_id)
+    return queryset
+
+
+class FlexFieldsViewMixin:
+    """Repassa ``?fields=`` e ``?expand=`` (listas separadas por vírgula) ao serializer.
+
+    Sem ``expand``, as listagens trazem apenas os ids dos objetos relacionados
+    e as demais ações continuam com tudo expandido.
+    """
+
+    def _param_list(self, name):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        return [item.strip() for item in value.split(",") if item.strip()]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request is None:
+            return context
+        context["fields"] = self._param_list("fields")
+        expand = self._param_list("expand")
+        if expand is None:
+            expand = [] if self.action == "list" else ["*"]
+        context["expand"] = expand
+        return context
+
+
+def instance_state(instance):
+    """Colunas de ``instance`` e, recursivamente, dos relacionados já carregados."""
+    state = [instance._meta.label]
+    state.extend(getattr(instance, field.attname) for field in instance._meta.concrete_fields)
+    for name, related in sorted(instance._state.fields_cache.items()):
+        state.append((name, None if related is None else instance_state(related)))
+    return state
+
+
+def last_modified_of(instance):
+    """Maior ``updated_at`` entre ``instance`` e os relacionados já carregados."""
+    moments = [getattr(instance, "updated_at", None)]
+    moments.extend(
+        last_modified_of(related)
+        for related in instance._state.fields_cache.values()
+        if related is not None
+    )
+    return max((moment for moment in moments if moment is not None), default=None)
+
+
+class ConditionalGetMixin:
+    """ETag nas listagens e nos detalhes, ``Last-Modified`` nos detalhes.
+
+    A ETag resume o que foi lido do banco para a resposta (as linhas da página
+    com os links da paginação, ou o objeto com os relacionados do
+    ``select_related``), a URL, o formato e o usuário, e é conferida antes da
+    serialização: com o mesmo ``If-None-Match`` a resposta é um 304 sem corpo.
+    As listagens não levam ``Last-Modified``, que não muda quando um registro
+    é excluído.
+    """
+
+    def not_modified(self, state, last_modified=None):
+        request = self.request
+        key = (request.build_absolute_uri(), request.accepted_media_type, request.user.pk, state)
+        etag = f'"{hashlib.sha256(repr(key).encode("utf-8")).hexdigest()}"'
+        self._validators = (etag, last_modified)
+        return get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+
+    def page_state(self, page, rows):
+        # a presença do link "next" depende de linhas fora da página
+        links = None if page is None else self.get_paginated_response([]).data
+        return rows, links
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        items = list(queryset) if page is None else page
+        state = self.page_state(page, [instance_state(item) for item in items])
+        not_modified = self.not_modified(state)
+        if not_modified is not None:
+            return not_modified
+        data = self.get_serializer(items, many=True).data
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        not_modified = self.not_modified(instance_state(instance), last_modified_of(instance))
+        if not_modified is not None:
+            return not_modified
+        return Response(self.get_serializer(instance).data)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, "_validators", None)
+        if validators is not None and response.status_code in (200, 304):
+            etag, last_modified = validators
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified.timestamp())
+            # o navegador guarda a resposta, mas revalida a cada uso
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ["Authorization"])
+        return response
+
+
+class ValuesListMixin:
+    """Listagem lida com ``.values()`` e montada por ``clinical.rows.compile_rows``.
+
+    A saída é a mesma do serializer, sem criar os objetos do modelo nem passar
+    pelos campos do DRF a cada linha. Usada antes de ``ConditionalGetMixin``,
+    que confere a ETag com as linhas lidas.
+    """
+
+    def list(self, request, *args, **kwargs):
+        compiled = compile_rows(self.get_serializer())
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+        paths, build = compiled
+        # o cursor da paginação precisa dos campos da ordenação
+        for field in getattr(self.paginator, "ordering", ()):
+            if field.lstrip("-") not in paths:
+                paths.append(field.lstrip("-"))
+        rows = self.filter_queryset(self.get_queryset()).values(*paths)
+        page = self.paginate_queryset(rows)
+        rows = list(rows) if page is None else page
+        not_modified = self.not_modified(self.page_state(page, rows))
+        if not_modified is not None:
+            return not_modified
+        if page is not None:
+            return self.get_paginated_response([build(row) for row in rows])
+        return Response([build(row) for row in rows])
+
+
+class PatientViewSet(
+    ValuesListMixin, ConditionalGetMixin, FlexFieldsViewMixin, viewsets.ModelViewSet
+):
+    queryset = Patient.objects.select_related("professional")
     serializer_class = PatientSerializer
+    pagination_class = PatientCursorPagination
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
     def perform_create(self, serializer):
@@ -93,20 +295,34 @@ class PatientViewSet(viewsets.ModelViewSet):
     def archive(self, request, pk=None):
         patient = self.get_object()
         patient.archived = True
-        patient.save(update_fields=["archived"])
+        patient.save(update_fields=["archived", "updated_at"])
         return Response({"detail": "Paciente arquivado com sucesso."})
 
     @action(detail=True, methods=["post"])
     def restore(self, request, pk=None):
         patient = self.get_object()
         patient.archived = False
-        patient.save(update_fields=["archived"])
+        patient.save(update_fields=["archived", "updated_at"])
         return Response({"detail": "Paciente reativado com sucesso."})
 
+    @action(detail=False, methods=["post"], url_path="import", url_name="import")
+    def import_file(self, request):
+        mode = request.data.get("mode", "skip")
+        if mode not in PatientImporter.MODES:
+            return Response(
+                {"mode": "Utilize 'skip' ou 'update'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return run_import(request, PatientImporter(user=request.user, mode=mode))
 
-class EvaluationViewSet(viewsets.ModelViewSet):
-    queryset = EvaluationMChat.objects.select_related("patient", "professional")
+
+class EvaluationViewSet(
+    ValuesListMixin, ConditionalGetMixin, FlexFieldsViewMixin, viewsets.ModelViewSet
+):
+    queryset = EvaluationMChat.objects.select_related("patient__professional", "professional")
     serializer_class = EvaluationMChatSerializer
+    pagination_class = EvaluationCursorPagination
+    score_batch_limit = 20000
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -128,121 +344,96 @@ class EvaluationViewSet(viewsets.ModelViewSet):
     def questions(self, request):
         return Response(MCHAT_QUESTIONS)
 
-    @action(detail=True, methods=["get"], url_path="export_pdf")
-    def export_pdf(self, request, pk=None):
-        evaluation = self.get_object()
-        buffer = BytesIO()
-        pdf = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-        margin = 25 * mm
-        header_height = 28 * mm
-        y = height - margin
-
-        pdf.setFillColor(HexColor("#1d4ed8"))
-        pdf.roundRect(
-            margin - 4 * mm,
-            height - header_height - margin / 2,
-            width - 2 * (margin - 4 * mm),
-            header_height,
-            6 * mm,
-            fill=True,
-            stroke=False,
-        )
+    @action(detail=False, methods=["post"])
+    def score_batch(self, request):
+        items = request.data.get("responses") if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list):
+            return Response(
+                {"detail": "Envie uma lista de respostas em responses."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > self.score_batch_limit:
+            return Response(
+                {"detail": f"Limite de {self.score_batch_limit} avaliações por lote."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        pdf.setFillColor("#ffffff")
-        pdf.setFont("Helvetica-Bold", 15)
-        pdf.drawString(margin, height - margin, "Plataforma Diagnóstica TEA – M-CHAT")
-        pdf.setFont("Helvetica", 10)
-        pdf.drawString(
-            margin,
-            height - margin - 14,
-            "Resultado da avaliação M-CHAT conforme Protocolo TEA-SP (2013)",
-        )
+        encoded = []
+        errors = {}
+        for index, item in enumerate(items):
+            try:
+                if isinstance(item, int) and not isinstance(item, bool):
+                    if not 0 <= item <= ALL_MASK:
+                        raise ResponseError("Código de respostas fora do intervalo.")
+                    encoded.append(item)
+                else:
+                    encoded.append(encode_responses(item))
+            except ResponseError as exc:
+                errors[index] = str(exc)
+                encoded.append(0)
+
+        risk_counts, critical_counts, levels = score_batch(encoded)
+        count_scorings("batch", len(encoded) - len(errors))
+        results = []
+        for index, (score, critical, level) in enumerate(
+            zip(risk_counts.tolist(), critical_counts.tolist(), levels.tolist())
+        ):
+            if index in errors:
+                results.append({"index": index, "error": errors[index]})
+                continue
+            risk_level = RISK_LEVELS[level]
+            results.append(
+                {
+                    "index": index,
+                    "total_score": score,
+                    "critical_count": critical,
+                    "risk_level": risk_level,
+                    "risk_label": RISK_LABELS.get(risk_level, risk_level),
+                }
+            )
+        return Response({"count": len(results), "errors": len(errors), "results": results})
 
-        pdf.setFillColor("#000000")
-        y = height - margin - header_height - 15
-        block_width = width - 2 * margin
-        patient = evaluation.patient
-
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(margin, y, "Dados da avaliação")
-        y -= 16
-        pdf.setFont("Helvetica", 11)
-        y = draw_wrapped_text(
-            pdf,
-            (
-                f"Paciente: {patient.name}\n"
-                f"Profissional responsável: {evaluation.professional or 'Não atribuído'}\n"
-                f"Data da avaliação: {evaluation.created_at:%d/%m/%Y}\n"
-                f"Pontuação total: {evaluation.total_score}\n"
-                f"Classificação de risco: {RISK_LABELS.get(evaluation.risk_level)}"
-            ),
-            margin,
-            y,
-            block_width,
-            15,
-        ) - 10
-
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(margin, y, "Interpretação clínica")
-        y -= 16
-        pdf.setFont("Helvetica", 11)
-        y = draw_wrapped_text(
-            pdf,
-            evaluation.clinical_interpretation,
-            margin,
-            y,
-            block_width,
-            14,
-        ) - 8
-
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(margin, y, "Observações clínicas")
-        y -= 16
-        pdf.setFont("Helvetica", 11)
-        y = draw_wrapped_text(
-            pdf,
-            evaluation.observations or "Sem observações registradas.",
-            margin,
-            y,
-            block_width,
-            14,
-        ) - 8
-
-        if evaluation.follow_up_recommendations:
-            pdf.setFont("Helvetica-Bold", 12)
-            pdf.drawString(margin, y, "Recomendações")
-            y -= 16
-            pdf.setFont("Helvetica", 11)
-            y = draw_wrapped_text(
-                pdf,
-                evaluation.follow_up_recommendations,
-                margin,
-                y,
-                block_width,
-                14,
-            ) - 8
-
-        pdf.setFont("Helvetica", 10)
-        pdf.setFillColor(HexColor("#6b7280"))
-        pdf.drawString(
-            margin,
-            margin / 2,
-            "Documento gerado automaticamente. Utilize este relatório para apoio à tomada de decisão clínica.",
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        queryset = filter_export(request, self.get_queryset(), "created_at")
+        return export_response(
+            queryset.order_by("created_at", "id"),
+            EVALUATION_FIELDS,
+            "avaliacoes",
+            request.query_params.get("output", "csv"),
+            transform=evaluation_row,
         )
 
-        pdf.showPage()
-        pdf.save()
-        buffer.seek(0)
-
-        filename = f"avaliacao_{patient.id}_{evaluation.created_at:%Y%m%d%H%M}.pdf"
-        response = HttpResponse(buffer.getvalue(), content_type="application/pdf")
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return response
-
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        url_name="import",
+        parser_classes=[MultiPartParser, FormParser],
+    )
+    def import_file(self, request):
+        return run_import(request, EvaluationImporter(user=request.user))
 
-class ClinicalReportViewSet(viewsets.ModelViewSet):
-    queryset = ClinicalReport.objects.select_related("evaluation", "evaluation__patient")
+    @action(detail=True, methods=["get"], url_path="export_pdf")
+    def export_pdf(self, request, pk=None):
+        with span("pdf_context"):
+            context = evaluation_context(self.get_object())
+            digest = pdf_digest(PdfJob.KIND_EVALUATION, context)
+        not_modified = get_conditional_response(request, etag=f'"{digest}"')
+        if not_modified is not None:
+            not_modified["ETag"] = f'"{digest}"'
+            return not_modified
+        with span("pdf"):
+            _, content = cached_render(PdfJob.KIND_EVALUATION, context, digest)
+        return pdf_response(content, context["filename"], digest)
+
+
+class ClinicalReportViewSet(
+    ValuesListMixin, ConditionalGetMixin, FlexFieldsViewMixin, viewsets.ModelViewSet
+):
+    queryset = ClinicalReport.objects.select_related(
+        "evaluation__patient__professional", "evaluation__professional"
+    )
     serializer_class = ClinicalReportSerializer
 
     def get_queryset(self):
@@ -261,184 +452,24 @@ class ClinicalReportViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["post"])
     def generate_pdf(self, request, pk=None):
         report = self.get_object()
-        pdf_buffer = BytesIO()
-        pdf = canvas.Canvas(pdf_buffer, pagesize=A4)
-        width, height = A4
-        margin = 25 * mm
-        header_height = 28 * mm
-        y = height - margin
-
-        pdf.setFillColor(HexColor("#1d4ed8"))
-        pdf.roundRect(
-            margin - 4 * mm,
-            height - header_height - margin / 2,
-            width - 2 * (margin - 4 * mm),
-            header_height,
-            6 * mm,
-            fill=True,
-            stroke=False,
-        )
-
-        pdf.setFillColor("#ffffff")
-        pdf.setFont("Helvetica-Bold", 15)
-        pdf.drawString(margin, height - margin, "Plataforma Diagnóstica TEA – M-CHAT")
-        pdf.setFont("Helvetica", 10)
-        pdf.drawString(
-            margin,
-            height - margin - 14,
-            "Relatório clínico com base no Protocolo TEA-SP (Estado de São Paulo, 2013)",
-        )
-
-        y = height - margin - header_height - 15
-        pdf.setFillColor("#000000")
-
-        eval_obj = report.evaluation
-        patient = eval_obj.patient
-        block_width = width - 2 * margin
-
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(margin, y, "Dados do paciente")
-        y -= 16
-        pdf.setFont("Helvetica", 11)
-        y = draw_wrapped_text(
-            pdf,
-            (
-                f"Nome: {patient.name}\n"
-                f"Data de nascimento: {patient.birth_date:%d/%m/%Y}\n"
-                f"Responsável: {patient.guardian_name}\n"
-                f"Contato: {patient.contact or 'Não informado'}\n"
-                f"Profissional responsável: {eval_obj.professional or 'Não atribuído'}"
-            ),
-            margin,
-            y,
-            block_width,
-            15,
-        ) - 10
-
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(margin, y, "Avaliação M-CHAT")
-        y -= 16
-        pdf.setFont("Helvetica", 11)
-        y = draw_wrapped_text(
-            pdf,
-            (
-                f"Data da avaliação: {eval_obj.created_at:%d/%m/%Y}\n"
-                f"Pontuação total: {eval_obj.total_score}\n"
-                f"Classificação de risco: {RISK_LABELS.get(eval_obj.risk_level)}"
-            ),
-            margin,
-            y,
-            block_width,
-            15,
-        ) - 8
-
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(margin, y, "Interpretação clínica")
-        y -= 16
-        pdf.setFont("Helvetica", 11)
-        y = draw_wrapped_text(
-            pdf,
-            eval_obj.clinical_interpretation,
-            margin,
-            y,
-            block_width,
-            14,
-        ) - 8
-
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(margin, y, "Observações")
-        y -= 16
-        pdf.setFont("Helvetica", 11)
-        y = draw_wrapped_text(
-            pdf,
-            eval_obj.observations or "Sem observações adicionais.",
-            margin,
-            y,
-            block_width,
-            14,
-        ) - 8
-
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(margin, y, "Recomendações")
-        y -= 16
-        pdf.setFont("Helvetica", 11)
-        y = draw_wrapped_text(
-            pdf,
-            eval_obj.follow_up_recommendations
-            or "Acompanhar em consultas regulares.",
-            margin,
-            y,
-            block_width,
-            14,
-        ) - 8
-
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(margin, y, "Contexto clínico adicional")
-        y -= 16
-        pdf.setFont("Helvetica", 11)
-        y = draw_wrapped_text(
-            pdf,
-            report.content,
-            margin,
-            y,
-            block_width,
-            14,
-        ) - 8
-
-        if report.periodic_review_notes:
-            pdf.setFont("Helvetica-Bold", 12)
-            pdf.drawString(margin, y, "Reavaliações periódicas (Protocolo TEA-SP, seção 9)")
-            y -= 16
-            pdf.setFont("Helvetica", 11)
-            y = draw_wrapped_text(
-                pdf,
-                report.periodic_review_notes,
-                margin,
-                y,
-                block_width,
-                14,
-            ) - 8
-
-        if report.health_equipment_notes:
-            pdf.setFont("Helvetica-Bold", 12)
-            pdf.drawString(
-                margin,
-                y,
-                "Equipamentos de saúde de referência (Protocolo TEA-SP, seção 10)",
-            )
-            y -= 16
-            pdf.setFont("Helvetica", 11)
-            y = draw_wrapped_text(
-                pdf,
-                report.health_equipment_notes,
-                margin,
-                y,
-                block_width,
-                14,
-            ) - 8
-
-        footer_y = margin / 2
-        pdf.setFont("Helvetica", 9)
-        pdf.setFillColor(HexColor("#6b7280"))
-        pdf.drawString(
-            margin,
-            footer_y,
-            "Gerado automaticamente pela Plataforma Diagnóstica TEA – M-CHAT. Uso restrito a profissionais autorizados.",
-        )
-
-        pdf.showPage()
-        pdf.save()
-        pdf_buffer.seek(0)
-
-        filename = f"relatorio_{patient.id}_{timezone.now():%Y%m%d%H%M}.pdf"
-        report.pdf_file.save(filename, ContentFile(pdf_buffer.getvalue()))
-        report.save(update_fields=["pdf_file"])
+        with span("pdf_context"):
+            context = report_context(report, timezone.now())
+            digest = pdf_digest(PdfJob.KIND_REPORT, context)
+        # sem mudanças no relatório, na avaliação ou no paciente, mantém o arquivo atual
+        if report.pdf_digest != digest or not report.pdf_file:
+            with span("pdf"):
+                digest, content = cached_render(PdfJob.KIND_REPORT, context, digest)
+            report.pdf_digest = digest
+            report.pdf_file.save(context["filename"], ContentFile(content))
         return Response({"detail": "PDF gerado com sucesso.", "pdf_file": report.pdf_file.url})
 
 
-class SessionRecordViewSet(viewsets.ModelViewSet):
-    queryset = SessionRecord.objects.select_related("patient", "professional")
+class SessionRecordViewSet(
+    ValuesListMixin, ConditionalGetMixin, FlexFieldsViewMixin, viewsets.ModelViewSet
+):
+    queryset = SessionRecord.objects.select_related("patient__professional", "professional")
     serializer_class = SessionRecordSerializer
+    pagination_class = SessionCursorPagination
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -456,6 +487,83 @@ class SessionRecordViewSet(viewsets.ModelViewSet):
         professional = serializer.validated_data.get("professional") or self.request.user
         serializer.save(professional=professional)
 
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        queryset = filter_export(request, self.get_queryset(), "session_date", is_datetime=False)
+        return export_response(
+            queryset.order_by("session_date", "created_at", "id"),
+            SESSION_FIELDS,
+            "sessoes",
+            request.query_params.get("output", "csv"),
+        )
+
+
+class PdfJobViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Geração de PDFs em segundo plano: POST enfileira, GET acompanha o status."""
+
+    queryset = PdfJob.objects.all()
+    serializer_class = PdfJobSerializer
+    pagination_class = PdfJobCursorPagination
+
+    def get_queryset(self):
+        # o PDF só é lido no download
+        queryset = super().get_queryset().defer("pdf_content")
+        user = self.request.user
+        if not user.is_staff:
+            queryset = queryset.filter(requested_by=user)
+        job_status = self.request.query_params.get("status")
+        if job_status:
+            queryset = queryset.filter(status=job_status)
+        return queryset
+
+    def _target_queryset(self, kind):
+        user = self.request.user
+        if kind == PdfJob.KIND_EVALUATION:
+            queryset = EvaluationMChat.objects.all()
+            visible = Q(professional=user) | Q(patient__professional=user)
+        elif kind == PdfJob.KIND_REPORT:
+            queryset = ClinicalReport.objects.all()
+            visible = Q(evaluation__professional=user) | Q(evaluation__patient__professional=user)
+        else:
+            queryset = Patient.objects.all()
+            visible = Q(professional=user)
+        return queryset if user.is_staff else queryset.filter(visible)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        kind = serializer.validated_data["kind"]
+        object_id = serializer.validated_data["object_id"]
+        if not self._target_queryset(kind).filter(pk=object_id).exists():
+            raise ValidationError({"object_id": "Registro não encontrado."})
+        job = enqueue(kind, object_id, request.user)
+        return Response(
+            self.get_serializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": reverse("pdf-job-detail", args=[job.pk], request=request)},
+        )
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != PdfJob.STATUS_DONE:
+            return Response(
+                {"detail": "O PDF ainda não está pronto.", "status": job.status},
+                status=status.HTTP_409_CONFLICT,
+            )
+        content = job.pdf_content
+        return FileResponse(
+            job.pdf_file.open("rb") if content is None else BytesIO(content),
+            as_attachment=True,
+            filename=job.filename,
+            content_type="application/pdf",
+        )
+
 
 class GeneralReportView(APIView):
     def _get_patient(self, request, patient_id):
@@ -533,202 +641,204 @@ class GeneralReportView(APIView):
             return Response({"detail": "Informe patient_id."}, status=status.HTTP_400_BAD_REQUEST)
 
         patient = self._get_patient(request, patient_id)
-        evaluations = list(patient.evaluations.order_by("-created_at"))
-        sessions = list(patient.sessions.order_by("-session_date", "-created_at"))
-
-        buffer = BytesIO()
-        pdf = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-        margin = 25 * mm
-        header_height = 28 * mm
-        y = height - margin
-
-        pdf.setFillColor(HexColor("#1d4ed8"))
-        pdf.roundRect(
-            margin - 4 * mm,
-            height - header_height - margin / 2,
-            width - 2 * (margin - 4 * mm),
-            header_height,
-            6 * mm,
-            fill=True,
-            stroke=False,
+        # as linhas são lidas em blocos durante o hash e o desenho, sem guardar os objetos
+        context = general_report_context(
+            patient,
+            patient.evaluations.order_by("-created_at"),
+            patient.sessions.order_by("-session_date", "-created_at"),
+            timezone.now(),
         )
-
-        pdf.setFillColor("#ffffff")
-        pdf.setFont("Helvetica-Bold", 15)
-        pdf.drawString(margin, height - margin, "Relatorio geral do paciente")
-        pdf.setFont("Helvetica", 10)
-        pdf.drawString(
-            margin,
-            height - margin - 14,
-            "Sintese diagnostica e registros de acompanhamento (Protocolo TEA-SP)",
-        )
-
-        y = height - margin - header_height - 15
-        pdf.setFillColor("#000000")
-        block_width = width - 2 * margin
-
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(margin, y, "Dados do paciente")
-        y -= 16
-        pdf.setFont("Helvetica", 11)
-        y = draw_wrapped_text(
-            pdf,
-            (
-                f"Nome: {patient.name}\n"
-                f"Data de nascimento: {patient.birth_date:%d/%m/%Y}\n"
-                f"Responsavel: {patient.guardian_name}\n"
-                f"Contato: {patient.contact or 'Nao informado'}"
-            ),
-            margin,
-            y,
-            block_width,
-            15,
-        ) - 8
-
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(margin, y, "Resumo das avaliacoes M-CHAT")
-        y -= 16
-        pdf.setFont("Helvetica", 11)
-        if evaluations:
-            for evaluation in evaluations:
-                lines = (
-                    f"Data: {evaluation.created_at:%d/%m/%Y %H:%M}\n"
-                    f"Pontuacao: {evaluation.total_score} | Risco: {to_ascii(RISK_LABELS.get(evaluation.risk_level, evaluation.risk_level))}\n"
-                    f"Reavaliacao: {'Sim' if evaluation.is_follow_up else 'Nao'}\n"
-                    f"Interpretacao: {evaluation.clinical_interpretation}"
-                )
-                y = draw_wrapped_text(pdf, lines, margin, y, block_width, 14) - 10
-                if y < margin + 80:
-                    pdf.showPage()
-                    pdf.setFont("Helvetica", 11)
-                    y = height - margin
-        else:
-            y = draw_wrapped_text(pdf, "Nenhuma avaliacao registrada.", margin, y, block_width, 14) - 8
-
-        if y < margin + 80:
-            pdf.showPage()
-            pdf.setFont("Helvetica-Bold", 12)
-            pdf.setFillColor("#000000")
-            y = height - margin
-
-        pdf.drawString(margin, y, "Resumo das sessoes clinicas")
-        y -= 16
-        pdf.setFont("Helvetica", 11)
-        if sessions:
-            type_map = dict(SessionRecord.SESSION_TYPES)
-            for session in sessions:
-                lines = (
-                    f"Data: {session.session_date:%d/%m/%Y} | Tipo: {to_ascii(type_map.get(session.session_type, session.session_type))}\n"
-                    f"Objetivos: {session.objectives or 'Nao informado'}\n"
-                    f"Intervencoes: {session.interventions or 'Nao informado'}\n"
-                    f"Orientacao familiar: {session.family_guidance or 'Nao informado'}\n"
-                    f"Proximos passos: {session.next_steps or 'Nao informado'}"
+        with span("pdf_context"):
+            digest = pdf_digest(PdfJob.KIND_GENERAL, context)
+        with span("pdf"):
+            digest, handle = cached_file(PdfJob.KIND_GENERAL, context, digest)
+        return pdf_response(handle, context["filename"], digest)
+
+
+class GeneralReportBatchView(APIView):
+    """Relatórios gerais de vários pacientes num ZIP enviado em streaming."""
+
+    def _patients(self, request):
+        serializer = GeneralReportBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        queryset = Patient.objects.all()
+        if not request.user.is_staff:
+            queryset = queryset.filter(professional=request.user)
+        if "patient_ids" in data:
+            ids = set(data["patient_ids"])
+            queryset = queryset.filter(pk__in=ids)
+            missing = ids - set(queryset.values_list("pk", flat=True))
+            if missing:
+                raise ValidationError(
+                    {"patient_ids": f"Pacientes não encontrados: {sorted(missing)}."}
                 )
-                y = draw_wrapped_text(pdf, lines, margin, y, block_width, 14) - 10
-                if y < margin + 100:
-                    pdf.showPage()
-                    pdf.setFont("Helvetica", 11)
-                    y = height - margin
         else:
-            y = draw_wrapped_text(pdf, "Nenhuma sessao registrada.", margin, y, block_width, 14) - 8
-
-        footer_y = margin / 2
-        pdf.setFont("Helvetica", 9)
-        pdf.setFillColor(HexColor("#6b7280"))
-        pdf.drawString(
-            margin,
-            footer_y,
-            "Documento automatizado. Utilize este relatorio para apoiar reunioes multiprofissionais.",
+            queryset = queryset.filter(archived=data["archived"])
+            if "professional" in data:
+                queryset = queryset.filter(professional_id=data["professional"])
+
+        patients = list(queryset.order_by("name", "id")[: serializer.MAX_PATIENTS + 1])
+        if not patients:
+            raise ValidationError({"detail": "Nenhum paciente encontrado."})
+        if len(patients) > serializer.MAX_PATIENTS:
+            raise ValidationError(
+                {"detail": f"Selecione no máximo {serializer.MAX_PATIENTS} pacientes."}
+            )
+        return patients
+
+    def _entries(self, patients):
+        errors = []
+        reports = render_general_reports(patients, settings.PDF_BATCH_PROCESSES)
+        for filename, content, error in reports:
+            if error is not None:
+                errors.append(f"{filename}: {error}")
+                continue
+            yield filename, content
+        if errors:
+            yield "erros.txt", "\n".join(errors).encode("utf-8")
+
+    def post(self, request):
+        patients = self._patients(request)
+        response = StreamingHttpResponse(
+            zip_stream(self._entries(patients)), content_type="application/zip"
         )
+        stamp = timezone.localtime().strftime("%Y%m%d%H%M")
+        response["Content-Disposition"] = f'attachment; filename="relatorios-gerais_{stamp}.zip"'
+        return response
 
-        pdf.showPage()
-        pdf.save()
-        buffer.seek(0)
 
-        filename = f"relatorio-geral_{patient.id}_{timezone.now():%Y%m%d%H%M}.pdf"
-        response = HttpResponse(buffer.getvalue(), content_type="application/pdf")
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return response
+def parse_day(value):
+    if value and len(value) == 7:
+        value = f"{value}-01"
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
 
 
 class DashboardSummaryView(APIView):
+    GRANULARITIES = ("month", "week")
+    MAX_PERIODS = 260
+
+    def _period_start(self, day, granularity):
+        if granularity == "week":
+            return day - timedelta(days=day.weekday())
+        return day.replace(day=1)
+
+    def _next_period(self, start, granularity):
+        if granularity == "week":
+            return start + timedelta(days=7)
+        return next_month(start)
+
+    def _series_window(self, request):
+        granularity = request.query_params.get("granularity", "month")
+        if granularity not in self.GRANULARITIES:
+            raise ValidationError({"granularity": "Utilize 'month' ou 'week'."})
+
+        today = timezone.localdate()
+        raw_from = request.query_params.get("from")
+        raw_to = request.query_params.get("to")
+        end = parse_day(raw_to) if raw_to else today
+        if end is None:
+            raise ValidationError({"to": "Data inválida. Utilize AAAA-MM-DD."})
+        if raw_from:
+            start = parse_day(raw_from)
+            if start is None:
+                raise ValidationError({"from": "Data inválida. Utilize AAAA-MM-DD."})
+        elif granularity == "week":
+            start = end - timedelta(weeks=11)
+        else:
+            start = subtract_months(end.replace(day=1), 5)
+        if start > end:
+            raise ValidationError({"from": "A data inicial deve ser anterior à final."})
+
+        periods = []
+        current = self._period_start(start, granularity)
+        while current <= end:
+            periods.append(current)
+            if len(periods) > self.MAX_PERIODS:
+                raise ValidationError(
+                    {"from": f"Intervalo muito longo (máximo de {self.MAX_PERIODS} períodos)."}
+                )
+            current = self._next_period(current, granularity)
+        return granularity, start, end, periods
+
     def get(self, request):
+        granularity, start, end, periods = self._series_window(request)
+
         user = request.user
         if user.is_staff:
             patient_qs = Patient.objects.all()
             evaluation_qs = EvaluationMChat.objects.all()
+            rollup_qs = DashboardRollup.objects.filter(professional__isnull=True)
         else:
             patient_qs = Patient.objects.filter(professional=user)
             evaluation_qs = EvaluationMChat.objects.filter(
-                Q(professional=user) | Q(patient__professional=user)
+                Q(professional=user) | Q(patient__in=patient_qs)
             )
+            rollup_qs = DashboardRollup.objects.filter(professional=user)
 
-        total_patients = patient_qs.filter(archived=False).count()
-        archived_patients = patient_qs.filter(archived=True).count()
-        total_evaluations = evaluation_qs.count()
-        distribution = (
-            evaluation_qs.values("risk_level")
-            .annotate(total=Count("risk_level"))
-            .order_by()
+        patient_counts = patient_qs.aggregate(
+            active=Count("id", filter=Q(archived=False)),
+            archived=Count("id", filter=Q(archived=True)),
         )
-        risk_distribution = {
-            RISK_LABELS.get(item["risk_level"], item["risk_level"]): item["total"]
-            for item in distribution
-        }
 
-        three_months_ago = timezone.now() - timezone.timedelta(days=90)
+        # totais e série mensal saem do consolidado: O(meses) linhas
+        risk_levels = [level for level, _ in EvaluationMChat.RISK_CHOICES]
+        total_evaluations = follow_up_count = score_sum = 0
+        risk_totals = dict.fromkeys(risk_levels, 0)
+        monthly = {}
+        for row in rollup_qs.order_by().values_list(
+            "month", "is_follow_up", "risk_level", "evaluation_count", "score_sum"
+        ):
+            month, is_follow_up, risk_level, count, score = row
+            total_evaluations += count
+            score_sum += score
+            risk_totals[risk_level] = risk_totals.get(risk_level, 0) + count
+            follow, initial = monthly.get(month, (0, 0))
+            if is_follow_up:
+                follow_up_count += count
+                monthly[month] = (follow + count, initial)
+            else:
+                monthly[month] = (follow, initial + count)
+
+        three_months_ago = timezone.now() - timedelta(days=90)
         reevaluations = evaluation_qs.filter(
             is_follow_up=True, created_at__gte=three_months_ago
         ).count()
 
-        follow_up_count = evaluation_qs.filter(is_follow_up=True).count()
-        initial_count = evaluation_qs.filter(is_follow_up=False).count()
-        average_score = (
-            evaluation_qs.aggregate(avg=Avg("total_score")).get("avg") or 0
-        )
-
-        base_month = timezone.now().date().replace(day=1)
-
-        def subtract_months(base, months):
-            year = base.year
-            month = base.month - months
-            while month <= 0:
-                month += 12
-                year -= 1
-            return date(year, month, 1)
-
-        def next_month(start):
-            if start.month == 12:
-                return date(start.year + 1, 1, 1)
-            return date(start.year, start.month + 1, 1)
-
-        labels = []
-        follow_series = []
-        initial_series = []
-        tz = timezone.get_current_timezone()
-
-        for offset in range(5, -1, -1):
-            month_start = subtract_months(base_month, offset)
-            month_end = next_month(month_start)
-            start_dt = timezone.make_aware(datetime.combine(month_start, time.min), tz)
-            end_dt = timezone.make_aware(datetime.combine(month_end, time.min), tz)
-            labels.append(month_start.strftime("%b/%Y"))
-            follow_series.append(
-                evaluation_qs.filter(
-                    created_at__gte=start_dt,
-                    created_at__lt=end_dt,
-                    is_follow_up=True,
-                ).count()
-            )
-            initial_series.append(
-                evaluation_qs.filter(
-                    created_at__gte=start_dt,
-                    created_at__lt=end_dt,
-                    is_follow_up=False,
-                ).count()
+        if granularity == "month":
+            series = monthly
+        else:
+            window_start = timezone.make_aware(datetime.combine(periods[0], time.min))
+            window_end = timezone.make_aware(
+                datetime.combine(periods[-1] + timedelta(days=7), time.min)
             )
+            series = {
+                row["period"]: (row["follow"], row["total"] - row["follow"])
+                for row in evaluation_qs.filter(
+                    created_at__gte=window_start, created_at__lt=window_end
+                )
+                .order_by()
+                .annotate(period=TruncWeek("created_at", output_field=DateField()))
+                .values("period")
+                .annotate(
+                    total=Count("id"), follow=Count("id", filter=Q(is_follow_up=True))
+                )
+            }
 
+        risk_distribution = {
+            RISK_LABELS.get(level, level): total
+            for level, total in risk_totals.items()
+            if total
+        }
+        average_score = score_sum / total_evaluations if total_evaluations else 0
+        label_format = "%d/%m/%Y" if granularity == "week" else "%b/%Y"
+
+        total_patients = patient_counts["active"]
+        archived_patients = patient_counts["archived"]
         return Response(
             {
                 "total_patients": total_patients,
@@ -738,17 +848,87 @@ class DashboardSummaryView(APIView):
                 "risk_distribution": risk_distribution,
                 "recent_reevaluations": reevaluations,
                 "follow_up_count": follow_up_count,
-                "initial_evaluations": initial_count,
+                "initial_evaluations": total_evaluations - follow_up_count,
                 "average_score": round(average_score, 2),
                 "monthly_followups": {
-                    "labels": labels,
-                    "follow": follow_series,
-                    "initial": initial_series,
+                    "granularity": granularity,
+                    "from": start,
+                    "to": end,
+                    "labels": [period.strftime(label_format) for period in periods],
+                    "follow": [series.get(period, (0, 0))[0] for period in periods],
+                    "initial": [series.get(period, (0, 0))[1] for period in periods],
                 },
             }
         )
 
 
+class ItemAnalyticsView(APIView):
+    """Prevalência de falha por item do M-CHAT e coocorrência dos itens críticos.
+
+    Lê as contagens por item do consolidado mensal, com a mesma visibilidade
+    do painel: os períodos são meses inteiros e o custo não depende do
+    número de avaliações.
+    """
+
+    def _month(self, request, name):
+        raw = request.query_params.get(name)
+        if not raw:
+            return None
+        day = parse_day(raw)
+        if day is None:
+            raise ValidationError({name: "Data inválida. Utilize AAAA-MM ou AAAA-MM-DD."})
+        return day.replace(day=1)
+
+    def get(self, request):
+        params = request.query_params
+        group_by = [name for name in params.get("group_by", "").split(",") if name]
+        if len(set(group_by)) != len(group_by) or set(group_by) - set(GROUP_FIELDS):
+            raise ValidationError(
+                {"group_by": f"Utilize combinações de: {', '.join(GROUP_FIELDS)}."}
+            )
+        professional_id = params.get("professional")
+        if professional_id and not professional_id.isdigit():
+            raise ValidationError({"professional": "Profissional inválido."})
+        risk_level = params.get("risk_level")
+        if risk_level and risk_level not in RISK_LABELS:
+            raise ValidationError({"risk_level": "Nível de risco inválido."})
+
+        user = request.user
+        if not user.is_staff:
+            rollup_qs = DashboardRollup.objects.filter(professional=user)
+        elif professional_id or "professional" in group_by:
+            rollup_qs = DashboardRollup.objects.filter(professional__isnull=False)
+        else:
+            rollup_qs = DashboardRollup.objects.filter(professional__isnull=True)
+
+        start = self._month(request, "from")
+        end = self._month(request, "to")
+        if start:
+            rollup_qs = rollup_qs.filter(month__gte=start)
+        if end:
+            rollup_qs = rollup_qs.filter(month__lte=end)
+        if professional_id:
+            rollup_qs = rollup_qs.filter(professional_id=professional_id)
+        if risk_level:
+            rollup_qs = rollup_qs.filter(risk_level=risk_level)
+
+        buckets = rollup_qs.order_by().values_list(
+            "professional_id",
+            "month",
+            "risk_level",
+            "evaluation_count",
+            "item_failures",
+            "critical_pairs",
+        )
+        return Response(
+            {
+                "group_by": group_by,
+                "critical_items": CRITICAL_CODES,
+                "groups": item_prevalence(buckets, group_by),
+            }
+        )
+
+
 class HelpContentView(APIView):
     permission_classes = [AllowAny]
 
@@ -781,3 +961,25 @@ class HelpContentView(APIView):
                 "creditos": "Baseado no Protocolo do Estado de São Paulo, 2013.",
             }
         )
+
+
+class MetricsPermission(BasePermission):
+    def has_permission(self, request, view):
+        return request.auth == "metrics" or bool(request.user and request.user.is_staff)
+
+
+class MetricsView(APIView):
+    """Métricas no formato de texto do Prometheus (ver ``clinical.metrics``)."""
+
+    authentication_classes = [
+        MetricsTokenAuthentication,
+        *api_settings.DEFAULT_AUTHENTICATION_CLASSES,
+    ]
+    permission_classes = [MetricsPermission]
+    # uso interno (coleta do Prometheus), fora da documentação da API
+    schema = None
+
+    def get(self, request):
+        # os PDFs do worker (outro serviço) entram nas métricas deste processo
+        observe_worker_renders()
+        return HttpResponse(collect(), content_type=CONTENT_TYPE)
@@ -29,6 +29,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "clinical.middleware.MetricsMiddleware",
+    "clinical.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -97,11 +99,28 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# PDFs gerados, reaproveitados enquanto os dados do documento não mudam
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", str(BASE_DIR / "pdf_cache"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# processos usados para gerar os PDFs do ZIP de relatórios gerais (0 = sem pool);
+# o pool é um só por processo web, compartilhado pelas requisições
+PDF_BATCH_PROCESSES = int(os.getenv("PDF_BATCH_PROCESSES", 2))
+# jobs de PDF concluídos ou com falha são apagados (com o PDF) depois desse prazo
+PDF_JOB_RETENTION_HOURS = float(os.getenv("PDF_JOB_RETENTION_HOURS", 24))
+
+# cabeçalho Server-Timing e log das requisições lentas (clinical.middleware)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "False") == "True"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 1000))
+# métricas do Prometheus em /api/metrics/ (clinical.metrics); a coleta aceita
+# usuários staff ou o cabeçalho "Authorization: Bearer <METRICS_TOKEN>"
+METRICS = os.getenv("METRICS", "True") == "True"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "clinical.authentication.TimedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -1,7 +1,50 @@
 import apiClient from "./client";
 
-export const fetchDashboard = async () => {
-  const { data } = await apiClient.get("/dashboard/summary/");
+// Percorre os cursores "next" das listas paginadas e devolve todos os itens.
+const collectPages = async (url, params = {}) => {
+  const items = [];
+  let nextUrl = url;
+  let query = params;
+  while (nextUrl) {
+    const { data } = await apiClient.get(nextUrl, { params: query });
+    if (Array.isArray(data)) {
+      return data;
+    }
+    items.push(...data.results);
+    query = undefined;
+    nextUrl = null;
+    if (data.next) {
+      // o link vem absoluto; reaproveita apenas caminho e cursor sob a baseURL
+      const { pathname, search } = new URL(data.next, window.location.origin);
+      nextUrl = `${pathname.replace(/^\/api/, "")}${search}`;
+    }
+  }
+  return items;
+};
+
+const PDF_POLL_INTERVAL = 1000;
+const PDF_POLL_ATTEMPTS = 120;
+
+const wait = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Enfileira a geracao do PDF, acompanha o job e baixa o arquivo pronto.
+const renderPdfJob = async (kind, objectId) => {
+  let { data: job } = await apiClient.post("/pdf-jobs/", { kind, object_id: objectId });
+  for (let attempt = 0; job.status !== "done"; attempt += 1) {
+    if (job.status === "failed") {
+      throw new Error(job.error || "Falha ao gerar o PDF.");
+    }
+    if (attempt >= PDF_POLL_ATTEMPTS) {
+      throw new Error("Tempo esgotado aguardando a geracao do PDF.");
+    }
+    await wait(PDF_POLL_INTERVAL);
+    ({ data: job } = await apiClient.get(`/pdf-jobs/${job.id}/`));
+  }
+  return apiClient.get(`/pdf-jobs/${job.id}/download/`, { responseType: "blob" });
+};
+
+export const fetchDashboard = async (params = {}) => {
+  const { data } = await apiClient.get("/dashboard/summary/", { params });
   return data;
 };
 
@@ -15,8 +58,7 @@ export const listPatients = async (params = {}) => {
   if (typeof query.archived === "boolean") {
     query.archived = query.archived ? "true" : "false";
   }
-  const { data } = await apiClient.get("/patients/", { params: query });
-  return data;
+  return collectPages("/patients/", query);
 };
 
 export const createPatient = async (payload) => {
@@ -58,8 +100,7 @@ export const createEvaluation = async (payload) => {
 };
 
 export const listEvaluations = async (params = {}) => {
-  const { data } = await apiClient.get("/evaluations/", { params });
-  return data;
+  return collectPages("/evaluations/", params);
 };
 
 export const createReport = async (payload) => {
@@ -73,15 +114,11 @@ export const generateReportPdf = async (id) => {
 };
 
 export const downloadEvaluationPdf = async (id) => {
-  const response = await apiClient.get(`/evaluations/${id}/export_pdf/`, {
-    responseType: "blob",
-  });
-  return response;
+  return renderPdfJob("evaluation", id);
 };
 
 export const listSessions = async (params = {}) => {
-  const { data } = await apiClient.get("/sessions/", { params });
-  return data;
+  return collectPages("/sessions/", params);
 };
 
 export const createSession = async (payload) => {
@@ -97,10 +134,5 @@ export const fetchGeneralReport = async (patientId) => {
 };
 
 export const downloadGeneralReportPdf = async (patientId) => {
-  const response = await apiClient.post(
-    "/reports/general/",
-    { patient_id: patientId },
-    { responseType: "blob" }
-  );
-  return response;
+  return renderPdfJob("general", patientId);
 };
@@ -43,7 +43,7 @@ export default function Avaliacao() {
       try {
         const [questionData, patientData] = await Promise.all([
           fetchQuestions(),
-          listPatients({ archived: false }),
+          listPatients({ archived: false, fields: "id,name" }),
         ]);
         setQuestions(questionData);
         setPatients(patientData);
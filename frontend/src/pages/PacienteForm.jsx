@@ -38,8 +38,8 @@ export default function PacienteForm() {
   const loadPatients = async () => {
     try {
       const [active, archived] = await Promise.all([
-        listPatients({ archived: false }),
-        listPatients({ archived: true }),
+        listPatients({ archived: false, expand: "professional" }),
+        listPatients({ archived: true, expand: "professional" }),
       ]);
       setActivePatients(active);
       setArchivedPatients(archived);
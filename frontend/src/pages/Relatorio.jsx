@@ -33,8 +33,8 @@ export default function Relatorio() {
     const load = async () => {
       try {
         const [evaluationData, patientData] = await Promise.all([
-          listEvaluations(),
-          listPatients({ archived: false }),
+          listEvaluations({ fields: "id,risk_label,patient.name", expand: "patient" }),
+          listPatients({ archived: false, fields: "id,name" }),
         ]);
         setEvaluations(evaluationData);
         setPatients(patientData);
@@ -32,7 +32,7 @@ export default function Sessoes() {
 
   const loadPatients = async () => {
     try {
-      const data = await listPatients({ archived: false });
+      const data = await listPatients({ archived: false, fields: "id,name" });
       setPatients(data);
       if (data.length && !selectedPatient) {
         setSelectedPatient(String(data[0].id));